@@ -0,0 +1,171 @@
+"""
+Compare ECEPartitioner with the previous asyncio implementation on a synthetic graph,
+and check that both produce the same communities for min_loss / max_loss.
+
+python -m benchmarks.ece_partitioner_benchmark --nodes 100000 --edges 400000
+"""
+
+import argparse
+import asyncio
+import random
+import tempfile
+import time
+from typing import Any, Dict, List, Tuple
+
+from graphgen.bases.datatypes import Community
+from graphgen.models import ECEPartitioner, NetworkXStorage
+
+from .networkx_storage_benchmark import build_graph
+
+
+def _sort_units(units: list, unit_sampling: str) -> list:
+    if unit_sampling == "random":
+        random.shuffle(units)
+        return units
+    return sorted(
+        units, key=lambda x: x[-1]["loss"], reverse=unit_sampling == "max_loss"
+    )
+
+
+async def legacy_partition(  # pylint: disable=too-many-locals
+    nodes: List[Tuple[str, dict]],
+    edges: List[Tuple[str, str, dict]],
+    max_units_per_community: int = 10,
+    min_units_per_community: int = 1,
+    max_tokens_per_community: int = 10240,
+    unit_sampling: str = "random",
+) -> List[Community]:
+    """The ECE loop before the rewrite: asyncio.Queue, string keys, a sort per expansion."""
+    adj: Dict[str, List[str]] = {n[0]: [] for n in nodes}
+    for u, v, _ in edges:
+        adj[u].append(v)
+        adj[v].append(u)
+    node_dict = dict(nodes)
+    edge_dict = {frozenset((u, v)): d for u, v, d in edges}
+    all_units = [("n", nid, d) for nid, d in nodes] + [
+        ("e", frozenset((u, v)), d) for u, v, d in edges
+    ]
+    used_n, used_e = set(), set()
+    communities: List[Community] = []
+
+    async def _grow(seed_unit):
+        community_nodes: Dict[str, dict] = {}
+        community_edges: Dict[Any, Tuple[str, str]] = {}
+        queue: asyncio.Queue = asyncio.Queue()
+        token_sum = 0
+
+        async def _add_unit(unit):
+            nonlocal token_sum
+            t, i, d = unit
+            if t == "n":
+                if i in used_n or i in community_nodes:
+                    return False
+                community_nodes[i] = d
+                used_n.add(i)
+            else:
+                if i in used_e or i in community_edges:
+                    return False
+                community_edges[i] = d["pair"]
+                used_e.add(i)
+            token_sum += d.get("length", 0)
+            return True
+
+        def _full():
+            return (
+                len(community_nodes) + len(community_edges) >= max_units_per_community
+                or token_sum >= max_tokens_per_community
+            )
+
+        await _add_unit(seed_unit)
+        await queue.put(seed_unit)
+        while not queue.empty():
+            if _full():
+                break
+            cur_type, cur_id, cur_data = await queue.get()
+            neighbors = []
+            if cur_type == "n":
+                for nb_id in adj[cur_id]:
+                    e_key = frozenset((cur_id, nb_id))
+                    if e_key not in used_e and e_key not in community_edges:
+                        neighbors.append(("e", e_key, edge_dict[e_key]))
+            else:
+                for n_id in cur_data["pair"]:
+                    if n_id not in used_n and n_id not in community_nodes:
+                        neighbors.append(("n", n_id, node_dict[n_id]))
+            for nb in _sort_units(neighbors, unit_sampling):
+                if _full():
+                    break
+                if await _add_unit(nb):
+                    await queue.put(nb)
+
+        if len(community_nodes) + len(community_edges) < min_units_per_community:
+            return None
+        return Community(
+            id=len(communities),
+            nodes=list(community_nodes),
+            edges=list(community_edges.values()),
+        )
+
+    for unit in _sort_units(all_units, unit_sampling):
+        if (unit[0] == "n" and unit[1] in used_n) or (
+            unit[0] == "e" and unit[1] in used_e
+        ):
+            continue
+        comm = await _grow(unit)
+        if comm is not None:
+            communities.append(comm)
+    return communities
+
+
+def _as_sets(communities: List[Community]) -> List[Tuple[frozenset, frozenset]]:
+    return [
+        (frozenset(c.nodes), frozenset(frozenset(e) for e in c.edges))
+        for c in communities
+    ]
+
+
+async def run(n_nodes: int, n_edges: int, max_units: int):
+    graph = build_graph(n_nodes, n_edges)
+    rng = random.Random(0)
+    for _, data in graph.nodes(data=True):
+        data["loss"] = rng.random()
+    with tempfile.TemporaryDirectory() as workdir:
+        storage = NetworkXStorage(workdir, namespace="graph")
+        await storage.upsert_nodes(dict(graph.nodes(data=True)))
+        await storage.upsert_edges({(u, v): d for u, v, d in graph.edges(data=True)})
+        nodes = await storage.get_all_nodes()
+        # the pair keeps the (src, tgt) order of the stored edge
+        edges = [
+            (u, v, {**d, "pair": (u, v)}) for u, v, d in await storage.get_all_edges()
+        ]
+
+        for sampling in ("min_loss", "max_loss", "random"):
+            start = time.perf_counter()
+            old = await legacy_partition(
+                nodes, edges, max_units_per_community=max_units, unit_sampling=sampling
+            )
+            old_time = time.perf_counter() - start
+            start = time.perf_counter()
+            new = await ECEPartitioner().partition(
+                storage, max_units_per_community=max_units, unit_sampling=sampling
+            )
+            new_time = time.perf_counter() - start
+            same = _as_sets(old) == _as_sets(new) if sampling != "random" else "n/a"
+            print(
+                f"{sampling:>8}: legacy {old_time:7.3f}s  new {new_time:7.3f}s  "
+                f"x{old_time / new_time:.1f}  communities {len(old)}/{len(new)}  "
+                f"identical {same}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--nodes", type=int, default=10000)
+    parser.add_argument("--edges", type=int, default=40000)
+    parser.add_argument("--max-units", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(run(args.nodes, args.edges, args.max_units))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Compare load / save time of NetworkXStorage graph formats on a synthetic graph.
+
+python -m benchmarks.networkx_storage_benchmark --nodes 100000 --edges 400000
+"""
+
+import argparse
+import random
+import tempfile
+import time
+
+import networkx as nx
+
+from graphgen.models import NetworkXStorage
+
+
+def build_graph(n_nodes: int, n_edges: int, seed: int = 42) -> nx.Graph:
+    rng = random.Random(seed)
+    graph = nx.Graph()
+    types = ["PERSON", "ORGANIZATION", "LOCATION", "EVENT", "CONCEPT"]
+    for i in range(n_nodes):
+        graph.add_node(
+            f"ENTITY_{i}",
+            entity_type=rng.choice(types),
+            description=f"Description of entity {i} " * 4,
+            source_id=f"chunk-{rng.randrange(n_nodes // 4 + 1)}",
+            length=rng.randrange(10, 200),
+        )
+    while graph.number_of_edges() < n_edges:
+        u, v = rng.randrange(n_nodes), rng.randrange(n_nodes)
+        if u != v:
+            graph.add_edge(
+                f"ENTITY_{u}",
+                f"ENTITY_{v}",
+                description=f"ENTITY_{u} relates to ENTITY_{v}",
+                source_id=f"chunk-{rng.randrange(n_nodes // 4 + 1)}",
+                loss=rng.random(),
+            )
+    return graph
+
+
+def bench(graph: nx.Graph, suffix: str, workdir: str) -> tuple[float, float]:
+    file_name = f"{workdir}/graph.{suffix}"
+    start = time.perf_counter()
+    NetworkXStorage.write_nx_graph(graph, file_name)
+    save = time.perf_counter() - start
+    start = time.perf_counter()
+    loaded = NetworkXStorage.load_nx_graph(file_name)
+    load = time.perf_counter() - start
+    assert loaded.number_of_edges() == graph.number_of_edges()
+    return save, load
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--nodes", type=int, default=10000)
+    parser.add_argument("--edges", type=int, default=40000)
+    args = parser.parse_args()
+
+    graph = build_graph(args.nodes, args.edges)
+    with tempfile.TemporaryDirectory() as workdir:
+        results = {s: bench(graph, s, workdir) for s in ("graphml", "msgpack")}
+    for suffix, (save, load) in results.items():
+        print(f"{suffix:>8}: save {save:7.3f}s  load {load:7.3f}s")
+    gm, mp = results["graphml"], results["msgpack"]
+    print(f" speedup: save x{gm[0] / mp[0]:.1f}  load x{gm[1] / mp[1]:.1f}")
+
+
+if __name__ == "__main__":
+    main()
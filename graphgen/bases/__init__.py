@@ -12,3 +12,4 @@ from .base_storage import (
 )
 from .base_tokenizer import BaseTokenizer
 from .datatypes import Chunk, QAPair, Token
+from .graph_snapshot import GraphSnapshot
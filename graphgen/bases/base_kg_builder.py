@@ -1,6 +1,6 @@
 from abc import ABC, abstractmethod
 from collections import defaultdict
-from typing import Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
 from graphgen.bases.base_llm_client import BaseLLMClient
 from graphgen.bases.base_storage import BaseGraphStorage
@@ -24,16 +24,35 @@ class BaseKGBuilder(ABC):
     async def merge_nodes(
         self,
         node_data: tuple[str, List[dict]],
-        kg_instance: BaseGraphStorage,
-    ) -> None:
-        """Merge extracted nodes into the knowledge graph."""
+        existing: Optional[dict] = None,
+    ) -> dict:
+        """
+        Merge the extracted records of a node with the node already stored in the knowledge graph.
+        Reading and writing the graph is left to the caller, so it can be done in batches.
+        :return: node data to write back
+        """
         raise NotImplementedError
 
     @abstractmethod
     async def merge_edges(
         self,
         edges_data: tuple[Tuple[str, str], List[dict]],
+        existing: Optional[dict] = None,
+    ) -> dict:
+        """
+        Merge the extracted records of an edge with the edge already stored in the knowledge graph.
+        :return: edge data to write back
+        """
+        raise NotImplementedError
+
+    async def summarize_pending(
+        self,
         kg_instance: BaseGraphStorage,
+        max_in_flight: int = 256,
+        locks: Any = None,
     ) -> None:
-        """Merge extracted edges into the knowledge graph."""
-        raise NotImplementedError
+        """
+        Summarize the descriptions whose summarization was deferred by merge_nodes / merge_edges.
+        Called once the merges of an insertion are done, builders summarizing while merging do nothing.
+        :param locks: per-key locks (graphgen.utils.KeyedLock) shared with concurrent merges
+        """
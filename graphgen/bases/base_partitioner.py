@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Any, List
+from typing import Any, AsyncIterable, AsyncIterator, List
 
 from graphgen.bases.base_storage import BaseGraphStorage
 from graphgen.bases.datatypes import Community
@@ -19,6 +19,22 @@ class BasePartitioner(ABC):
         :return: List of communities
         """
 
+    async def iter_partition(
+        self,
+        g: BaseGraphStorage,
+        **kwargs: Any,
+    ) -> AsyncIterator[Community]:
+        """
+        Graph -> Communities, yielded as soon as each one is formed.
+        Partitioners that grow communities one by one override this,
+        the default waits for partition() to finish.
+        :param g: Graph storage instance
+        :param kwargs: Additional parameters for partitioning
+        :return: Async iterator of communities
+        """
+        for comm in await self.partition(g, **kwargs):
+            yield comm
+
     @staticmethod
     async def community2batch(
         communities: List[Community], g: BaseGraphStorage
@@ -33,42 +49,54 @@ class BasePartitioner(ABC):
         :param g: Graph storage instance
         :return: List of batches, each batch is a tuple of (nodes, edges)
         """
+        node_ids = [node for comm in communities for node in comm.nodes]
+        edge_ids = [tuple(edge) for comm in communities for edge in comm.edges]
+        node_data = dict(zip(node_ids, await g.get_nodes(node_ids)))
+        edge_data = dict(zip(edge_ids, await g.get_edges(edge_ids)))
+        # the storage may be directed, look up the reversed pairs of the misses
+        reversed_ids = [(v, u) for (u, v), data in edge_data.items() if not data]
+        edge_data.update(zip(reversed_ids, await g.get_edges(reversed_ids)))
+
         batches = []
         for comm in communities:
-            nodes = comm.nodes
-            edges = comm.edges
-            nodes_data = []
-            for node in nodes:
-                node_data = await g.get_node(node)
-                if node_data:
-                    nodes_data.append((node, node_data))
+            nodes_data = [
+                (node, node_data[node]) for node in comm.nodes if node_data[node]
+            ]
             edges_data = []
-            for u, v in edges:
-                edge_data = await g.get_edge(u, v)
-                if edge_data:
-                    edges_data.append((u, v, edge_data))
-                else:
-                    edge_data = await g.get_edge(v, u)
-                    if edge_data:
-                        edges_data.append((v, u, edge_data))
+            for u, v in comm.edges:
+                if edge_data[(u, v)]:
+                    edges_data.append((u, v, edge_data[(u, v)]))
+                elif edge_data.get((v, u)):
+                    edges_data.append((v, u, edge_data[(v, u)]))
             batches.append((nodes_data, edges_data))
         return batches
 
     @staticmethod
-    def _build_adjacency_list(
-        nodes: List[tuple[str, dict]], edges: List[tuple[str, str, dict]]
-    ) -> tuple[dict[str, List[str]], set[tuple[str, str]]]:
+    async def iter_community2batch(
+        communities: AsyncIterable[Community],
+        g: BaseGraphStorage,
+        group_size: int = 64,
+    ) -> AsyncIterator[
+        tuple[
+            list[tuple[str, dict]], list[tuple[Any, Any, dict] | tuple[Any, Any, Any]]
+        ]
+    ]:
         """
-        Build adjacency list and edge set from nodes and edges.
-        :param nodes
-        :param edges
-        :return: adjacency list, edge set
+        Streaming version of community2batch.
+        Communities are hydrated group_size at a time, so one batch read serves many communities
+        while the first batches are available long before the partitioning ends.
+        :param communities: async iterable of communities
+        :param g: Graph storage instance
+        :param group_size: number of communities hydrated by one batch read
+        :return: Async iterator of batches, each batch is a tuple of (nodes, edges)
         """
-        adj: dict[str, List[str]] = {n[0]: [] for n in nodes}
-        edge_set: set[tuple[str, str]] = set()
-        for e in edges:
-            adj[e[0]].append(e[1])
-            adj[e[1]].append(e[0])
-            edge_set.add((e[0], e[1]))
-            edge_set.add((e[1], e[0]))
-        return adj, edge_set
+        group: List[Community] = []
+        async for comm in communities:
+            group.append(comm)
+            if len(group) >= group_size:
+                for batch in await BasePartitioner.community2batch(group, g):
+                    yield batch
+                group = []
+        if group:
+            for batch in await BasePartitioner.community2batch(group, g):
+                yield batch
@@ -1,6 +1,6 @@
 import os
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterable, Iterator, List
 
 import requests
 
@@ -22,6 +22,38 @@ class BaseReader(ABC):
         :return: List of dictionaries containing the data.
         """
 
+    def iter_read(
+        self, file_path: str, batch_size: int = 1000
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Read data from the specified file path in batches, so that memory is bounded by the
+        batch size rather than by the file size.
+        The default slices the result of read, readers that can parse their format
+        incrementally override it.
+
+        :param file_path: Path to the input file.
+        :param batch_size: Maximum number of documents per batch (before filtering).
+        :return: Iterator over filtered lists of dictionaries.
+        """
+        data = self.read(file_path)
+        for start in range(0, len(data), batch_size):
+            yield data[start : start + batch_size]
+
+    def _filter_batches(
+        self, docs: Iterable[Dict[str, Any]], batch_size: int
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Group a stream of documents into filtered batches of at most batch_size documents.
+        """
+        batch = []
+        for doc in docs:
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                yield self.filter(batch)
+                batch = []
+        if batch:
+            yield self.filter(batch)
+
     @staticmethod
     def filter(data: List[dict]) -> List[dict]:
         """
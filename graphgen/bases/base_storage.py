@@ -1,5 +1,7 @@
 from dataclasses import dataclass
-from typing import Generic, TypeVar, Union
+from typing import AsyncIterator, Generic, TypeVar, Union
+
+from graphgen.bases.graph_snapshot import GraphSnapshot
 
 T = TypeVar("T")
 
@@ -106,3 +108,66 @@ class BaseGraphStorage(StorageNameSpace):
 
     async def delete_node(self, node_id: str):
         raise NotImplementedError
+
+    async def get_snapshot(self) -> GraphSnapshot:
+        """
+        Integer-indexed snapshot of the graph for partitioners.
+        Backends may cache it until the graph changes.
+        """
+        return GraphSnapshot.from_lists(
+            await self.get_all_nodes(), await self.get_all_edges()
+        )
+
+    # Streaming reads, in the order of get_all_nodes / get_all_edges. The defaults
+    # go through the full lists, backends keeping the graph out of memory should override them.
+
+    async def count_nodes(self) -> int:
+        return len(await self.get_all_nodes())
+
+    async def count_edges(self) -> int:
+        return len(await self.get_all_edges())
+
+    async def iter_nodes(
+        self, batch_size: int = 1000  # pylint: disable=unused-argument
+    ) -> AsyncIterator[tuple[str, dict]]:
+        """
+        :param batch_size: number of nodes read from the backend at a time
+        """
+        for node in await self.get_all_nodes():
+            yield node
+
+    async def iter_edges(
+        self, batch_size: int = 1000  # pylint: disable=unused-argument
+    ) -> AsyncIterator[tuple[str, str, dict]]:
+        """
+        :param batch_size: number of edges read from the backend at a time
+        """
+        for edge in await self.get_all_edges():
+            yield edge
+
+    # Batch operations. The defaults fall back to one call per item,
+    # backends with a per-call cost should override them.
+
+    async def get_nodes(self, node_ids: list[str]) -> list[Union[dict, None]]:
+        return [await self.get_node(node_id) for node_id in node_ids]
+
+    async def get_edges(
+        self, edge_ids: list[tuple[str, str]]
+    ) -> list[Union[dict, None]]:
+        return [await self.get_edge(src, tgt) for src, tgt in edge_ids]
+
+    async def upsert_nodes(self, nodes: dict[str, dict]):
+        for node_id, node_data in nodes.items():
+            await self.upsert_node(node_id, node_data)
+
+    async def upsert_edges(self, edges: dict[tuple[str, str], dict]):
+        for (src, tgt), edge_data in edges.items():
+            await self.upsert_edge(src, tgt, edge_data)
+
+    async def update_nodes_batch(self, nodes: dict[str, dict]):
+        for node_id, node_data in nodes.items():
+            await self.update_node(node_id, node_data)
+
+    async def update_edges_batch(self, edges: dict[tuple[str, str], dict]):
+        for (src, tgt), edge_data in edges.items():
+            await self.update_edge(src, tgt, edge_data)
@@ -1,12 +1,34 @@
 from __future__ import annotations
 
+import hashlib
+import threading
 from abc import ABC, abstractmethod
-from typing import List
+from collections import OrderedDict
+from typing import List, Sequence, Tuple
 
 
 class BaseTokenizer(ABC):
-    def __init__(self, model_name: str = "cl100k_base"):
+    def __init__(self, model_name: str = "cl100k_base", count_cache_size: int = 100000):
+        """
+        :param model_name
+        :param count_cache_size: number of token counts kept in the LRU cache of
+            count_tokens / count_tokens_batch, keyed by a hash of the text
+        """
         self.model_name = model_name
+        self.count_cache_size = count_cache_size
+        self._count_cache: "OrderedDict[bytes, int]" = OrderedDict()
+        self._count_cache_lock = threading.Lock()
+
+    def __getstate__(self) -> dict:
+        # sent to worker processes without the count cache and its lock
+        state = self.__dict__.copy()
+        state["_count_cache"] = OrderedDict()
+        del state["_count_cache_lock"]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._count_cache_lock = threading.Lock()
 
     @abstractmethod
     def encode(self, text: str) -> List[int]:
@@ -18,8 +40,63 @@ class BaseTokenizer(ABC):
         """Decode token ids -> text."""
         raise NotImplementedError
 
+    def encode_batch(self, texts: Sequence[str]) -> List[List[int]]:
+        """Encode several texts at once, implementations with a native batch encoder override it."""
+        return [self.encode(text) for text in texts]
+
+    def encode_with_offsets(self, text: str) -> Tuple[List[int], List[int]]:
+        """
+        Encode text -> (token ids, character offset where every token starts).
+        The default decodes token by token, implementations with an offset mapping override it.
+        """
+        token_ids = self.encode(text)
+        offsets, pos = [], 0
+        pieces = [self.decode([token_id]) for token_id in token_ids]
+        if "".join(pieces) == text:
+            for piece in pieces:
+                offsets.append(pos)
+                pos += len(piece)
+            return token_ids, offsets
+        # tokens splitting a character do not decode on their own, decode the prefixes instead
+        for i in range(len(token_ids)):
+            offsets.append(min(len(self.decode(token_ids[:i])), len(text)))
+        return token_ids, offsets
+
     def count_tokens(self, text: str) -> int:
-        return len(self.encode(text))
+        return self.count_tokens_batch([text])[0]
+
+    def count_tokens_batch(self, texts: Sequence[str]) -> List[int]:
+        """
+        Token count of every text. Counts are looked up in the LRU cache first,
+        the texts missing from it are encoded together with encode_batch.
+        Safe to call from several threads.
+        """
+        keys = [
+            hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+            for text in texts
+        ]
+        counts: List[int] = [0] * len(texts)
+        missing: dict = {}
+        with self._count_cache_lock:
+            for i, key in enumerate(keys):
+                count = self._count_cache.get(key)
+                if count is None:
+                    missing.setdefault(key, []).append(i)
+                else:
+                    self._count_cache.move_to_end(key)
+                    counts[i] = count
+        if not missing:
+            return counts
+
+        encoded = self.encode_batch([texts[indices[0]] for indices in missing.values()])
+        with self._count_cache_lock:
+            for (key, indices), token_ids in zip(missing.items(), encoded):
+                for i in indices:
+                    counts[i] = len(token_ids)
+                self._count_cache[key] = len(token_ids)
+            while len(self._count_cache) > self.count_cache_size:
+                self._count_cache.popitem(last=False)
+        return counts
 
     def chunk_by_token_size(
         self,
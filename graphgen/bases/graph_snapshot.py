@@ -0,0 +1,134 @@
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+
+def _unit_array(records: List[dict], key: str, default: float) -> np.ndarray:
+    values = (d.get(key) for d in records)
+    return np.fromiter(
+        (default if v is None else v for v in values),
+        dtype=np.float64,
+        count=len(records),
+    )
+
+
+@dataclass(frozen=True, eq=False)
+class GraphSnapshot:
+    """
+    Immutable, integer-indexed view of a graph for partitioners.
+    Nodes are numbered 0..n-1 and edges 0..m-1 in the order of get_all_nodes / get_all_edges.
+    The adjacency is stored in CSR form: the neighbors of node i are
+    indices[indptr[i]:indptr[i + 1]], reached through edges edge_ids[indptr[i]:indptr[i + 1]],
+    listed in the order of the edges joining them, i.e. by edge index.
+    Units (nodes and edges) share one numbering: node i is unit i, edge j is unit n + j.
+    Missing (or None) lengths are 0, missing losses are NaN.
+    """
+
+    node_ids: List[str]
+    node_index: Dict[str, int]
+    edge_src: np.ndarray
+    edge_tgt: np.ndarray
+    indptr: np.ndarray
+    indices: np.ndarray
+    edge_ids: np.ndarray
+    node_length: np.ndarray
+    node_loss: np.ndarray
+    edge_length: np.ndarray
+    edge_loss: np.ndarray
+
+    @classmethod
+    def from_lists(
+        cls, nodes: List[Tuple[str, dict]], edges: List[Tuple[str, str, dict]]
+    ) -> "GraphSnapshot":
+        node_ids = [n[0] for n in nodes]
+        node_index = {node_id: i for i, node_id in enumerate(node_ids)}
+        m = len(edges)
+        node_data = [n[1] for n in nodes]
+        edge_data = [e[2] for e in edges]
+        return cls.from_arrays(
+            node_ids,
+            node_index,
+            edge_src=np.fromiter(
+                (node_index[e[0]] for e in edges), dtype=np.int64, count=m
+            ),
+            edge_tgt=np.fromiter(
+                (node_index[e[1]] for e in edges), dtype=np.int64, count=m
+            ),
+            node_length=_unit_array(node_data, "length", 0.0),
+            node_loss=_unit_array(node_data, "loss", np.nan),
+            edge_length=_unit_array(edge_data, "length", 0.0),
+            edge_loss=_unit_array(edge_data, "loss", np.nan),
+        )
+
+    @classmethod
+    def from_arrays(  # pylint: disable=too-many-arguments
+        cls,
+        node_ids: List[str],
+        node_index: Dict[str, int],
+        *,
+        edge_src: np.ndarray,
+        edge_tgt: np.ndarray,
+        node_length: np.ndarray,
+        node_loss: np.ndarray,
+        edge_length: np.ndarray,
+        edge_loss: np.ndarray,
+    ) -> "GraphSnapshot":
+        """
+        Build the CSR adjacency from the edge endpoints, for backends that fill
+        the per-unit arrays themselves instead of materializing every attribute dict.
+        """
+        n, m = len(node_ids), len(edge_src)
+        # every edge appears in the adjacency of both endpoints
+        owners = np.concatenate([edge_src, edge_tgt])
+        neighbors = np.concatenate([edge_tgt, edge_src])
+        via = np.concatenate([np.arange(m), np.arange(m)])
+        order = np.lexsort((via, owners))
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(owners, minlength=n), out=indptr[1:])
+        return cls(
+            node_ids=node_ids,
+            node_index=node_index,
+            edge_src=edge_src,
+            edge_tgt=edge_tgt,
+            indptr=indptr,
+            indices=neighbors[order],
+            edge_ids=via[order],
+            node_length=node_length,
+            node_loss=node_loss,
+            edge_length=edge_length,
+            edge_loss=edge_loss,
+        )
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.node_ids)
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.edge_src)
+
+    @property
+    def num_units(self) -> int:
+        return self.num_nodes + self.num_edges
+
+    @property
+    def unit_length(self) -> np.ndarray:
+        return np.concatenate([self.node_length, self.edge_length])
+
+    @property
+    def unit_loss(self) -> np.ndarray:
+        return np.concatenate([self.node_loss, self.edge_loss])
+
+    def neighbors(self, node: int) -> Tuple[List[int], List[int]]:
+        """
+        :return: (neighbor nodes, edges leading to them)
+        """
+        start, end = self.indptr[node], self.indptr[node + 1]
+        return self.indices[start:end].tolist(), self.edge_ids[start:end].tolist()
+
+    def edge_pair(self, edge: int) -> Tuple[str, str]:
+        return (
+            self.node_ids[self.edge_src[edge]],
+            self.node_ids[self.edge_tgt[edge]],
+        )
@@ -68,7 +68,11 @@ def main():
 
     graph_gen = GraphGen(unique_id=unique_id, working_dir=working_dir)
 
-    graph_gen.insert(read_config=config["read"], split_config=config["split"])
+    graph_gen.insert(
+        read_config=config["read"],
+        split_config=config["split"],
+        build_config=config.get("build"),
+    )
 
     graph_gen.search(search_config=config["search"])
 
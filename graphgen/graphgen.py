@@ -6,30 +6,62 @@ from typing import Dict, cast
 
 import gradio as gr
 
-from graphgen.bases.base_storage import StorageNameSpace
+from graphgen.bases.base_storage import (
+    BaseGraphStorage,
+    BaseKVStorage,
+    StorageNameSpace,
+)
 from graphgen.bases.datatypes import Chunk
 from graphgen.models import (
     JsonKVStorage,
     JsonListStorage,
+    LLMResponseCache,
     NetworkXStorage,
     OpenAIClient,
+    SQLiteGraphStorage,
+    SQLiteKVStorage,
     Tokenizer,
 )
+from graphgen.models.llm.limitter import RPM, TPM, AdaptiveConcurrencyLimiter
 from graphgen.operators import (
     build_mm_kg,
     build_text_kg,
     chunk_documents,
+    create_chunking_executor,
     generate_qas,
+    iter_partition_kg,
+    iter_read_files,
     judge_statement,
-    partition_kg,
     quiz,
-    read_files,
     search_all,
 )
-from graphgen.utils import async_to_sync_method, compute_mm_hash, logger
+from graphgen.utils import (
+    KeyedLock,
+    async_to_sync_method,
+    compute_mm_hash,
+    logger,
+)
 
 sys_path = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 
+_KV_STORAGES = {
+    "json": lambda working_dir, namespace: JsonKVStorage(
+        working_dir, namespace=namespace, wal=True
+    ),
+    "sqlite": lambda working_dir, namespace: SQLiteKVStorage(
+        working_dir, namespace=namespace
+    ),
+}
+
+_GRAPH_STORAGES = {
+    "networkx": lambda working_dir, namespace: NetworkXStorage(
+        working_dir, namespace=namespace, wal=True
+    ),
+    "sqlite": lambda working_dir, namespace: SQLiteGraphStorage(
+        working_dir, namespace=namespace
+    ),
+}
+
 
 @dataclass
 class GraphGen:
@@ -40,6 +72,11 @@ class GraphGen:
     tokenizer_instance: Tokenizer = None
     synthesizer_llm_client: OpenAIClient = None
     trainee_llm_client: OpenAIClient = None
+    llm_cache: LLMResponseCache = None
+
+    # storage backends: "json" / "networkx" keep the data in memory, "sqlite" keeps it on disk
+    kv_backend: str = None
+    graph_backend: str = None
 
     # webui
     progress_bar: gr.Progress = None
@@ -49,6 +86,39 @@ class GraphGen:
             model_name=os.getenv("TOKENIZER_MODEL")
         )
 
+        if self.llm_cache is None and os.getenv("LLM_CACHE", "").lower() in (
+            "1",
+            "true",
+            "yes",
+        ):
+            ttl = os.getenv("LLM_CACHE_TTL")
+            max_entries = os.getenv("LLM_CACHE_MAX_ENTRIES")
+            self.llm_cache = LLMResponseCache(
+                self.working_dir,
+                ttl_seconds=float(ttl) if ttl else None,
+                max_entries=int(max_entries) if max_entries else None,
+            )
+
+        # clients pointing at the same endpoint share the concurrency limiter
+        # and the rate limit buckets
+        endpoints: Dict[str, dict] = {}
+
+        def _endpoint_kwargs(base_url: str) -> dict:
+            if base_url in endpoints:
+                return endpoints[base_url]
+            kwargs = {}
+            if os.getenv("ADAPTIVE_CONCURRENCY", "").lower() in ("1", "true", "yes"):
+                kwargs["concurrency_limiter"] = AdaptiveConcurrencyLimiter()
+            if os.getenv("RPM") or os.getenv("TPM"):
+                kwargs.update(
+                    request_limit=True,
+                    rpm=RPM(int(os.getenv("RPM", "1000"))),
+                    tpm=TPM(int(os.getenv("TPM", "20000"))),
+                    token_estimation=os.getenv("TOKEN_ESTIMATION", "exact"),
+                )
+            endpoints[base_url] = kwargs
+            return kwargs
+
         self.synthesizer_llm_client: OpenAIClient = (
             self.synthesizer_llm_client
             or OpenAIClient(
@@ -56,6 +126,8 @@ class GraphGen:
                 api_key=os.getenv("SYNTHESIZER_API_KEY"),
                 base_url=os.getenv("SYNTHESIZER_BASE_URL"),
                 tokenizer=self.tokenizer_instance,
+                cache=self.llm_cache,
+                **_endpoint_kwargs(os.getenv("SYNTHESIZER_BASE_URL")),
             )
         )
 
@@ -64,22 +136,34 @@ class GraphGen:
             api_key=os.getenv("TRAINEE_API_KEY"),
             base_url=os.getenv("TRAINEE_BASE_URL"),
             tokenizer=self.tokenizer_instance,
+            cache=self.llm_cache,
+            **_endpoint_kwargs(os.getenv("TRAINEE_BASE_URL")),
         )
 
-        self.full_docs_storage: JsonKVStorage = JsonKVStorage(
-            self.working_dir, namespace="full_docs"
-        )
-        self.chunks_storage: JsonKVStorage = JsonKVStorage(
-            self.working_dir, namespace="chunks"
+        self.kv_backend = self.kv_backend or os.getenv("KV_STORAGE", "json")
+        self.graph_backend = self.graph_backend or os.getenv(
+            "GRAPH_STORAGE", "networkx"
         )
-        self.graph_storage: NetworkXStorage = NetworkXStorage(
-            self.working_dir, namespace="graph"
+        for backend, choices in (
+            (self.kv_backend, _KV_STORAGES),
+            (self.graph_backend, _GRAPH_STORAGES),
+        ):
+            if backend not in choices:
+                raise ValueError(
+                    f"Unknown storage backend {backend}, expected one of {list(choices)}"
+                )
+        new_kv_storage = _KV_STORAGES[self.kv_backend]
+
+        self.full_docs_storage: BaseKVStorage = new_kv_storage(
+            self.working_dir, "full_docs"
         )
-        self.search_storage: JsonKVStorage = JsonKVStorage(
-            self.working_dir, namespace="search"
+        self.chunks_storage: BaseKVStorage = new_kv_storage(self.working_dir, "chunks")
+        self.graph_storage: BaseGraphStorage = _GRAPH_STORAGES[self.graph_backend](
+            self.working_dir, "graph"
         )
-        self.rephrase_storage: JsonKVStorage = JsonKVStorage(
-            self.working_dir, namespace="rephrase"
+        self.search_storage: BaseKVStorage = new_kv_storage(self.working_dir, "search")
+        self.rephrase_storage: BaseKVStorage = new_kv_storage(
+            self.working_dir, "rephrase"
         )
         self.qa_storage: JsonListStorage = JsonListStorage(
             os.path.join(self.working_dir, "data", "graphgen", f"{self.unique_id}"),
@@ -87,126 +171,170 @@ class GraphGen:
         )
 
     @async_to_sync_method
-    async def insert(self, read_config: Dict, split_config: Dict):
+    async def insert(  # pylint: disable=too-many-statements
+        self, read_config: Dict, split_config: Dict, build_config: Dict = None
+    ):
         """
         insert chunks into the graph
         """
-        # Step 1: Read files
-        data = read_files(read_config["input_file"], self.working_dir)
-        if len(data) == 0:
-            logger.warning("No data to process")
-            return
-
-        assert isinstance(data, list) and isinstance(data[0], dict)
-
+        # Step 1: Read files, a batch of documents at a time
         # TODO: configurable whether to use coreference resolution
-
-        new_docs = {compute_mm_hash(doc, prefix="doc-"): doc for doc in data}
-        _add_doc_keys = await self.full_docs_storage.filter_keys(list(new_docs.keys()))
-        new_docs = {k: v for k, v in new_docs.items() if k in _add_doc_keys}
-        new_text_docs = {k: v for k, v in new_docs.items() if v.get("type") == "text"}
-        new_mm_docs = {k: v for k, v in new_docs.items() if v.get("type") != "text"}
-
-        await self.full_docs_storage.upsert(new_docs)
-
-        async def _insert_text_docs(text_docs):
-            if len(text_docs) == 0:
-                logger.warning("All text docs are already in the storage")
-                return
-            logger.info("[New Docs] inserting %d text docs", len(text_docs))
-            # Step 2.1: Split chunks and filter existing ones
-            inserting_chunks = await chunk_documents(
-                text_docs,
-                split_config["chunk_size"],
-                split_config["chunk_overlap"],
-                self.tokenizer_instance,
-                self.progress_bar,
+        text_queue: asyncio.Queue = asyncio.Queue(maxsize=2)
+        mm_queue: asyncio.Queue = asyncio.Queue(maxsize=2)
+        # documents read and new documents, per kind
+        n_read = {"text": 0, "multi-modal": 0}
+        n_docs = {"text": 0, "multi-modal": 0}
+
+        async def _read_new_docs():
+            """
+            Read the input batch by batch, store the documents that are not in the storage yet
+            and hand them to the text and multi-modal pipelines.
+            """
+            batches = iter_read_files(
+                read_config["input_file"],
+                self.working_dir,
+                batch_size=read_config.get("batch_size", 1000),
             )
+            while True:
+                # parsing is blocking file IO, keep it off the event loop
+                data = await asyncio.to_thread(next, batches, None)
+                if data is None:
+                    break
+                n_text = sum(1 for doc in data if doc.get("type") == "text")
+                n_read["text"] += n_text
+                n_read["multi-modal"] += len(data) - n_text
+                new_docs = {compute_mm_hash(doc, prefix="doc-"): doc for doc in data}
+                _add_doc_keys = await self.full_docs_storage.filter_keys(
+                    list(new_docs.keys())
+                )
+                new_docs = {k: v for k, v in new_docs.items() if k in _add_doc_keys}
+                if not new_docs:
+                    continue
+                await self.full_docs_storage.upsert(new_docs)
+
+                text_docs = {
+                    k: v for k, v in new_docs.items() if v.get("type") == "text"
+                }
+                mm_docs = {k: v for k, v in new_docs.items() if v.get("type") != "text"}
+                n_docs["text"] += len(text_docs)
+                n_docs["multi-modal"] += len(mm_docs)
+                if text_docs:
+                    await text_queue.put(text_docs)
+                if mm_docs:
+                    await mm_queue.put(mm_docs)
+            await text_queue.put(None)
+            await mm_queue.put(None)
+
+        async def _iter_new_chunks(queue: asyncio.Queue, kind: str):
+            """
+            Chunk the documents a group at a time, store the chunks that are not in the storage yet
+            and yield them, so that extraction starts with the first group.
+            """
+            n_new = 0
+            while (docs := await queue.get()) is not None:
+                doc_items = list(docs.items())
+                for start in range(0, len(doc_items), docs_per_batch):
+                    batch = dict(doc_items[start : start + docs_per_batch])
+                    # the process pool is only worth starting for a batch of several texts
+                    if (
+                        kind == "text"
+                        and max_workers > 1
+                        and len(batch) > 1
+                        and chunking["executor"] is None
+                    ):
+                        chunking["executor"] = create_chunking_executor(
+                            max_workers, self.tokenizer_instance
+                        )
+                    inserting_chunks = await chunk_documents(
+                        batch,
+                        split_config["chunk_size"],
+                        split_config["chunk_overlap"],
+                        self.tokenizer_instance,
+                        self.progress_bar,
+                        splitter=split_config.get("splitter", "recursive"),
+                        executor=chunking["executor"],
+                    )
+                    _add_chunk_keys = await self.chunks_storage.filter_keys(
+                        list(inserting_chunks.keys())
+                    )
+                    inserting_chunks = {
+                        k: v
+                        for k, v in inserting_chunks.items()
+                        if k in _add_chunk_keys
+                    }
+                    if not inserting_chunks:
+                        continue
+                    await self.chunks_storage.upsert(inserting_chunks)
+                    n_new += len(inserting_chunks)
+                    for k, v in inserting_chunks.items():
+                        yield (
+                            Chunk(id=k, content=v["content"], type="text")
+                            if kind == "text"
+                            else Chunk.from_dict(k, v)
+                        )
+            if n_read[kind] == 0:
+                logger.warning("No %s documents to insert", kind)
+            elif n_docs[kind] == 0:
+                logger.warning("All %s docs are already in the storage", kind)
+            elif n_new == 0:
+                logger.warning("All %s chunks are already in the storage", kind)
+            else:
+                logger.info(
+                    "[New Docs] inserted %d %s docs as %d new chunks",
+                    n_docs[kind],
+                    kind,
+                    n_new,
+                )
 
-            _add_chunk_keys = await self.chunks_storage.filter_keys(
-                list(inserting_chunks.keys())
-            )
-            inserting_chunks = {
-                k: v for k, v in inserting_chunks.items() if k in _add_chunk_keys
-            }
-
-            if len(inserting_chunks) == 0:
-                logger.warning("All text chunks are already in the storage")
-                return
-
-            logger.info("[New Chunks] inserting %d text chunks", len(inserting_chunks))
-            await self.chunks_storage.upsert(inserting_chunks)
-
-            # Step 2.2: Extract entities and relations from text chunks
+        async def _insert_text_docs():
+            # Step 2: Split chunks, extract entities and relations and merge them, pipelined
             logger.info("[Text Entity and Relation Extraction] processing ...")
-            _add_entities_and_relations = await build_text_kg(
+            await build_text_kg(
                 llm_client=self.synthesizer_llm_client,
                 kg_instance=self.graph_storage,
-                chunks=[
-                    Chunk(id=k, content=v["content"], type="text")
-                    for k, v in inserting_chunks.items()
-                ],
+                chunks=_iter_new_chunks(text_queue, "text"),
                 progress_bar=self.progress_bar,
+                locks=locks,
+                build_config=build_config,
             )
-            if not _add_entities_and_relations:
-                logger.warning("No entities or relations extracted from text chunks")
-                return
-
-            await self._insert_done()
-            return _add_entities_and_relations
-
-        async def _insert_multi_modal_docs(mm_docs):
-            if len(mm_docs) == 0:
-                logger.warning("No multi-modal documents to insert")
-                return
-
-            logger.info("[New Docs] inserting %d multi-modal docs", len(mm_docs))
-
-            # Step 3.1: Transform multi-modal documents into chunks and filter existing ones
-            inserting_chunks = await chunk_documents(
-                mm_docs,
-                split_config["chunk_size"],
-                split_config["chunk_overlap"],
-                self.tokenizer_instance,
-                self.progress_bar,
-            )
-
-            _add_chunk_keys = await self.chunks_storage.filter_keys(
-                list(inserting_chunks.keys())
-            )
-            inserting_chunks = {
-                k: v for k, v in inserting_chunks.items() if k in _add_chunk_keys
-            }
-
-            if len(inserting_chunks) == 0:
-                logger.warning("All multi-modal chunks are already in the storage")
-                return
-
-            logger.info(
-                "[New Chunks] inserting %d multimodal chunks", len(inserting_chunks)
-            )
-            await self.chunks_storage.upsert(inserting_chunks)
 
-            # Step 3.2: Extract multi-modal entities and relations from chunks
+        async def _insert_multi_modal_docs():
+            # Step 3: Transform multi-modal documents into chunks, extract and merge, pipelined
             logger.info("[Multi-modal Entity and Relation Extraction] processing ...")
-            _add_entities_and_relations = await build_mm_kg(
+            await build_mm_kg(
                 llm_client=self.synthesizer_llm_client,
                 kg_instance=self.graph_storage,
-                chunks=[Chunk.from_dict(k, v) for k, v in inserting_chunks.items()],
+                chunks=_iter_new_chunks(mm_queue, "multi-modal"),
                 progress_bar=self.progress_bar,
+                locks=locks,
+                build_config=build_config,
             )
-            if not _add_entities_and_relations:
-                logger.warning(
-                    "No entities or relations extracted from multi-modal chunks"
-                )
-                return
-            await self._insert_done()
-            return _add_entities_and_relations
 
-        # Step 2: Insert text documents
-        await _insert_text_docs(new_text_docs)
-        # Step 3: Insert multi-modal documents
-        await _insert_multi_modal_docs(new_mm_docs)
+        # reading, text and multi-modal documents run concurrently,
+        # merges of the same entity from both branches take turns on its key
+        docs_per_batch = split_config.get("docs_per_batch", 100)
+        max_workers = split_config.get("max_workers", 1)
+        # created on the first text batch that needs it
+        chunking = {"executor": None}
+        locks = KeyedLock()
+        tasks = [
+            asyncio.create_task(_read_new_docs()),
+            asyncio.create_task(_insert_text_docs()),
+            asyncio.create_task(_insert_multi_modal_docs()),
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            # a failed pipeline must not leave the reader blocked on its queue
+            for task in tasks:
+                task.cancel()
+            if chunking["executor"] is not None:
+                chunking["executor"].shutdown(wait=False, cancel_futures=True)
+        if sum(n_read.values()) == 0:
+            logger.warning("No data to process")
+            return
+        logger.info("[Merge Locks] %s", locks.metrics)
+        await self._insert_done()
 
     async def _insert_done(self):
         tasks = []
@@ -284,15 +412,15 @@ class GraphGen:
 
     @async_to_sync_method
     async def generate(self, partition_config: Dict, generate_config: Dict):
-        # Step 1: partition the graph
-        batches = await partition_kg(
+        # Step 1: partition the graph, batches are streamed as communities are formed
+        batches = iter_partition_kg(
             self.graph_storage,
             self.chunks_storage,
             self.tokenizer_instance,
             partition_config,
         )
 
-        # Step 2： generate QA pairs
+        # Step 2： generate QA pairs, overlapping with the partitioning
         results = await generate_qas(
             self.synthesizer_llm_client,
             batches,
@@ -308,6 +436,10 @@ class GraphGen:
         await self.qa_storage.upsert(results)
         await self.qa_storage.index_done_callback()
 
+        if self.llm_cache is not None:
+            logger.info("[LLM Cache] %s", self.llm_cache.stats)
+        logger.info("[LLM Metrics] %s", self.synthesizer_llm_client.metrics)
+
     @async_to_sync_method
     async def clear(self):
         await self.full_docs_storage.drop()
@@ -316,5 +448,7 @@ class GraphGen:
         await self.graph_storage.clear()
         await self.rephrase_storage.drop()
         await self.qa_storage.drop()
+        if self.llm_cache is not None:
+            self.llm_cache.clear()
 
         logger.info("All caches are cleared")
@@ -8,6 +8,7 @@ from .generator import (
 )
 from .kg_builder import LightRAGKGBuilder, MMKGBuilder
 from .llm.openai_client import OpenAIClient
+from .llm.response_cache import LLMResponseCache
 from .llm.topk_token_model import TopkTokenModel
 from .partitioner import (
     AnchorBFSPartitioner,
@@ -21,6 +22,16 @@ from .search.db.uniprot_search import UniProtSearch
 from .search.kg.wiki_search import WikiSearch
 from .search.web.bing_search import BingSearch
 from .search.web.google_search import GoogleSearch
-from .splitter import ChineseRecursiveTextSplitter, RecursiveCharacterSplitter
-from .storage import JsonKVStorage, JsonListStorage, NetworkXStorage
+from .splitter import (
+    ChineseRecursiveTextSplitter,
+    RecursiveCharacterSplitter,
+    TokenSplitter,
+)
+from .storage import (
+    JsonKVStorage,
+    JsonListStorage,
+    NetworkXStorage,
+    SQLiteGraphStorage,
+    SQLiteKVStorage,
+)
 from .tokenizer import Tokenizer
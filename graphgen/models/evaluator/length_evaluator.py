@@ -10,10 +10,16 @@ class LengthEvaluator(BaseEvaluator):
         self.tokenizer_name = tokenizer_name
         self.tokenizer = Tokenizer(model_name=self.tokenizer_name)
 
+    async def async_evaluate(self, pairs: list[QAPair]) -> list[float]:
+        # all the answers are counted in one batch instead of one executor job per pair
+        loop = create_event_loop()
+        return await loop.run_in_executor(
+            None, self.tokenizer.count_tokens_batch, [pair.answer for pair in pairs]
+        )
+
     async def evaluate_single(self, pair: QAPair) -> float:
         loop = create_event_loop()
         return await loop.run_in_executor(None, self._calculate_length, pair.answer)
 
     def _calculate_length(self, text: str) -> float:
-        tokens = self.tokenizer.encode(text)
-        return len(tokens)
+        return self.tokenizer.count_tokens(text)
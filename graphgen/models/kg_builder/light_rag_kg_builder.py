@@ -1,40 +1,149 @@
+import asyncio
 import re
 from collections import Counter, defaultdict
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Set, Tuple
 
 from graphgen.bases import BaseGraphStorage, BaseKGBuilder, BaseLLMClient, Chunk
 from graphgen.templates import KG_EXTRACTION_PROMPT, KG_SUMMARIZATION_PROMPT
 from graphgen.utils import (
+    DEFAULT_MAX_IN_FLIGHT,
+    KeyedLock,
+    MicroBatcher,
+    clean_str,
     detect_main_language,
     handle_single_entity_extraction,
     handle_single_relationship_extraction,
     logger,
     pack_history_conversations,
+    run_concurrent,
     split_string_by_multi_markers,
 )
 
 
 class LightRAGKGBuilder(BaseKGBuilder):
-    def __init__(self, llm_client: BaseLLMClient, max_loop: int = 3):
+    def __init__(
+        self,
+        llm_client: BaseLLMClient,
+        max_loop: int = 3,
+        glean_mode: str = "if_loop",
+        loop_tokens: Optional[int] = None,
+        pack_tokens: Optional[int] = None,
+        summary_mode: str = "single",
+        summary_batch_tokens: int = 2048,
+        defer_summary: bool = False,
+        max_summary_tokens: int = 200,
+        resummary_tokens: int = 100,
+    ):
+        """
+        :param llm_client
+        :param max_loop: maximum number of gleaning rounds per chunk
+        :param glean_mode: how a gleaning round is run
+            - if_loop: ask YES | NO whether records were missed, then ask for them (two calls)
+            - single: ask for the missed records and a done marker in one call,
+              stop as soon as the marker comes or a round adds no new record
+        :param loop_tokens: if given, a chunk gets one gleaning round per loop_tokens tokens
+            (rounded up, at most max_loop), so short chunks are not gleaned as much as long ones
+        :param pack_tokens: if given, chunks extracted concurrently are packed into shared
+            extraction prompts of up to pack_tokens tokens of text, so that small chunks do not
+            each pay for the instructions and examples of the prompt;
+            packs of several chunks get no gleaning round
+        :param summary_mode: how long descriptions are summarized
+            - single: one LLM call per entity or relationship
+            - batch: descriptions summarized concurrently are packed into shared prompts
+        :param summary_batch_tokens: token budget of the descriptions packed into one prompt
+        :param defer_summary: merges only append new descriptions and keep their token counts,
+            summarize_pending summarizes what changed once at the end of the insertion
+        :param max_summary_tokens: descriptions of at least this many tokens are summarized
+        :param resummary_tokens: with defer_summary, a description is summarized again only
+            once this many tokens of new descriptions were appended since its last summary,
+            at most max_summary_tokens so that a new long description is always summarized
+        """
         super().__init__(llm_client)
         self.max_loop = max_loop
+        if glean_mode not in ("if_loop", "single"):
+            raise ValueError(f"Invalid glean mode: {glean_mode}")
+        self.glean_mode = glean_mode
+        self.loop_tokens = loop_tokens
+        self.pack_tokens = pack_tokens
+        self._pack_batcher: MicroBatcher[Chunk, tuple] = MicroBatcher(
+            self._extract_packed, budget=pack_tokens or 0
+        )
+        if summary_mode not in ("single", "batch"):
+            raise ValueError(f"Invalid summary mode: {summary_mode}")
+        self.summary_mode = summary_mode
+        if resummary_tokens > max_summary_tokens:
+            raise ValueError(
+                f"resummary_tokens ({resummary_tokens}) must not exceed "
+                f"max_summary_tokens ({max_summary_tokens})"
+            )
+        self.defer_summary = defer_summary
+        self.max_summary_tokens = max_summary_tokens
+        self.resummary_tokens = resummary_tokens
+        self._dirty_nodes: Set[str] = set()
+        self._dirty_edges: Set[Tuple[str, str]] = set()
+        self._sep_tokens: Optional[int] = None
+        self._summary_batcher: MicroBatcher[Tuple[str, str], str] = MicroBatcher(
+            self._summarize_batch, budget=summary_batch_tokens
+        )
 
     async def extract(
         self, chunk: Chunk
     ) -> Tuple[Dict[str, List[dict]], Dict[Tuple[str, str], List[dict]]]:
         """
         Extract entities and relationships from a single chunk using the LLM client.
+        With pack_tokens, the chunk may share its extraction prompt with concurrent chunks.
         :param chunk
         :return: (nodes_data, edges_data)
         """
-        chunk_id = chunk.id
-        content = chunk.content
-
         # step 1: language_detection
-        language = detect_main_language(content)
+        language = detect_main_language(chunk.content)
+
+        if self.pack_tokens:
+            n_tokens = self.llm_client.tokenizer.count_tokens(chunk.content)
+            return await self._pack_batcher.submit(chunk, cost=n_tokens, key=language)
+        return (await self._extract_chunks(language, [chunk]))[0]
+
+    async def _extract_packed(
+        self, language: str, chunks: List[Chunk]
+    ) -> List[Tuple[Dict[str, List[dict]], Dict[Tuple[str, str], List[dict]]]]:
+        results = await self._extract_chunks(language, chunks)
+        # a document the answer does not tag was dropped by the model, extract it alone
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            logger.debug(
+                "Packed extraction missed %d of %d chunks", len(missing), len(chunks)
+            )
+            retried = await asyncio.gather(
+                *(self._extract_chunks(language, [chunks[i]]) for i in missing)
+            )
+            for i, result in zip(missing, retried):
+                results[i] = result[0]
+        return results
+
+    async def _extract_chunks(
+        self, language: str, chunks: List[Chunk]
+    ) -> List[
+        Optional[Tuple[Dict[str, List[dict]], Dict[Tuple[str, str], List[dict]]]]
+    ]:
+        """
+        Run one extraction conversation over the chunks, several chunks are packed
+        as tagged documents into the same prompt.
+        :return: (nodes_data, edges_data) per chunk, None for a packed chunk missing from the answer
+        """
+        if len(chunks) == 1:
+            input_text = chunks[0].content
+        else:
+            input_text = KG_EXTRACTION_PROMPT[language]["PACKED_TEXT"].format(
+                **KG_EXTRACTION_PROMPT["FORMAT"],
+                n_documents=len(chunks),
+                documents="\n\n".join(
+                    f"[document {i}]\n{chunk.content}"
+                    for i, chunk in enumerate(chunks, start=1)
+                ),
+            )
 
         hint_prompt = KG_EXTRACTION_PROMPT[language]["TEMPLATE"].format(
-            **KG_EXTRACTION_PROMPT["FORMAT"], input_text=content
+            **KG_EXTRACTION_PROMPT["FORMAT"], input_text=input_text
         )
 
         # step 2: initial glean
@@ -43,25 +152,44 @@ class LightRAGKGBuilder(BaseKGBuilder):
 
         # step3: iterative refinement
         history = pack_history_conversations(hint_prompt, final_result)
-        for loop_idx in range(self.max_loop):
-            if_loop_result = await self.llm_client.generate_answer(
-                text=KG_EXTRACTION_PROMPT[language]["IF_LOOP"], history=history
-            )
-            if_loop_result = if_loop_result.strip().strip('"').strip("'").lower()
-            if if_loop_result != "yes":
-                break
+        # a pack is not gleaned: the records of a gleaning round carry no document tag,
+        # so they could not be attributed to the chunk they come from
+        max_loop = self._max_loop_for(input_text) if len(chunks) == 1 else 0
+        if self.glean_mode == "single":
+            final_result += await self._glean_single_call(language, history, max_loop)
+        else:
+            for loop_idx in range(max_loop):
+                if_loop_result = await self.llm_client.generate_answer(
+                    text=KG_EXTRACTION_PROMPT[language]["IF_LOOP"], history=history
+                )
+                if_loop_result = if_loop_result.strip().strip('"').strip("'").lower()
+                if if_loop_result != "yes":
+                    break
 
-            glean_result = await self.llm_client.generate_answer(
-                text=KG_EXTRACTION_PROMPT[language]["CONTINUE"], history=history
-            )
-            logger.debug("Loop %s glean: %s", loop_idx + 1, glean_result)
+                glean_result = await self.llm_client.generate_answer(
+                    text=KG_EXTRACTION_PROMPT[language]["CONTINUE"], history=history
+                )
+                logger.debug("Loop %s glean: %s", loop_idx + 1, glean_result)
 
-            history += pack_history_conversations(
-                KG_EXTRACTION_PROMPT[language]["CONTINUE"], glean_result
-            )
-            final_result += glean_result
+                history += pack_history_conversations(
+                    KG_EXTRACTION_PROMPT[language]["CONTINUE"], glean_result
+                )
+                final_result += glean_result
 
         # step 4: parse the final result
+        return await self._parse_result(final_result, [chunk.id for chunk in chunks])
+
+    @staticmethod
+    async def _parse_result(
+        final_result: str, chunk_ids: List[str]
+    ) -> List[
+        Optional[Tuple[Dict[str, List[dict]], Dict[Tuple[str, str], List[dict]]]]
+    ]:
+        """
+        Parse the records of an extraction answer.
+        With several chunks, every record belongs to the chunk of the last ("document"<|>i) tag,
+        records before the first tag are dropped.
+        """
         records = split_string_by_multi_markers(
             final_result,
             [
@@ -70,8 +198,10 @@ class LightRAGKGBuilder(BaseKGBuilder):
             ],
         )
 
-        nodes = defaultdict(list)
-        edges = defaultdict(list)
+        nodes = [defaultdict(list) for _ in chunk_ids]
+        edges = [defaultdict(list) for _ in chunk_ids]
+        tagged = [len(chunk_ids) == 1] * len(chunk_ids)
+        current: Optional[int] = 0 if len(chunk_ids) == 1 else None
 
         for record in records:
             match = re.search(r"\((.*)\)", record)
@@ -83,35 +213,101 @@ class LightRAGKGBuilder(BaseKGBuilder):
                 inner, [KG_EXTRACTION_PROMPT["FORMAT"]["tuple_delimiter"]]
             )
 
+            if len(chunk_ids) > 1 and attributes[0] == '"document"':
+                doc_id = attributes[1].strip('"') if len(attributes) > 1 else ""
+                current = int(doc_id) - 1 if doc_id.isdigit() else None
+                if current is not None and 0 <= current < len(chunk_ids):
+                    tagged[current] = True
+                else:
+                    current = None
+                continue
+            if current is None:
+                continue
+            chunk_id = chunk_ids[current]
+
             entity = await handle_single_entity_extraction(attributes, chunk_id)
             if entity is not None:
-                nodes[entity["entity_name"]].append(entity)
+                nodes[current][entity["entity_name"]].append(entity)
                 continue
 
             relation = await handle_single_relationship_extraction(attributes, chunk_id)
             if relation is not None:
                 key = (relation["src_id"], relation["tgt_id"])
-                edges[key].append(relation)
+                edges[current][key].append(relation)
+
+        return [
+            (dict(n), dict(e)) if is_tagged else None
+            for n, e, is_tagged in zip(nodes, edges, tagged)
+        ]
+
+    def _max_loop_for(self, content: str) -> int:
+        if not self.loop_tokens:
+            return self.max_loop
+        n_tokens = self.llm_client.tokenizer.count_tokens(content)
+        return min(self.max_loop, -(-n_tokens // self.loop_tokens))
+
+    async def _glean_single_call(
+        self, language: str, history: List[dict], max_loop: int
+    ) -> str:
+        """
+        Gleaning rounds of one call each: the answer carries the missed records
+        and a done marker once nothing is missing any more.
+        :return: the records of all rounds, appended to the first extraction
+        """
+        prompt_format = KG_EXTRACTION_PROMPT["FORMAT"]
+        continue_prompt = KG_EXTRACTION_PROMPT[language]["CONTINUE_OR_DONE"].format(
+            **prompt_format
+        )
+        markers = [
+            prompt_format["record_delimiter"],
+            prompt_format["completion_delimiter"],
+            prompt_format["done_delimiter"],
+        ]
+        seen = {
+            record
+            for turn in history
+            if turn["role"] == "assistant"
+            for record in split_string_by_multi_markers(turn["content"], markers)
+        }
 
-        return dict(nodes), dict(edges)
+        gleaned = ""
+        for loop_idx in range(max_loop):
+            glean_result = await self.llm_client.generate_answer(
+                text=continue_prompt, history=history
+            )
+            logger.debug("Loop %s glean: %s", loop_idx + 1, glean_result)
+            new_records = []
+            for record in split_string_by_multi_markers(glean_result, markers):
+                if record not in seen:
+                    seen.add(record)
+                    new_records.append(record)
+            if new_records:
+                gleaned += (
+                    prompt_format["record_delimiter"]
+                    + prompt_format["record_delimiter"].join(new_records)
+                    + prompt_format["completion_delimiter"]
+                )
+            if not new_records or prompt_format["done_delimiter"] in glean_result:
+                break
+            history += pack_history_conversations(continue_prompt, glean_result)
+        return gleaned
 
     async def merge_nodes(
         self,
         node_data: tuple[str, List[dict]],
-        kg_instance: BaseGraphStorage,
-    ) -> None:
+        existing: Optional[dict] = None,
+    ) -> dict:
         entity_name, node_data = node_data
         entity_types = []
         source_ids = []
         descriptions = []
 
-        node = await kg_instance.get_node(entity_name)
-        if node is not None:
-            entity_types.append(node["entity_type"])
+        if existing is not None:
+            entity_types.append(existing["entity_type"])
             source_ids.extend(
-                split_string_by_multi_markers(node["source_id"], ["<SEP>"])
+                split_string_by_multi_markers(existing["source_id"], ["<SEP>"])
             )
-            descriptions.append(node["description"])
+            descriptions.append(existing["description"])
 
         # take the most frequent entity_type
         entity_type = sorted(
@@ -120,65 +316,177 @@ class LightRAGKGBuilder(BaseKGBuilder):
             reverse=True,
         )[0][0]
 
-        description = "<SEP>".join(
-            sorted(set([dp["description"] for dp in node_data] + descriptions))
-        )
-        description = await self._handle_kg_summary(entity_name, description)
+        if self.defer_summary:
+            self._dirty_nodes.add(entity_name)
+            description_fields = self._append_descriptions(
+                existing, [dp["description"] for dp in node_data]
+            )
+        else:
+            description = "<SEP>".join(
+                sorted(set([dp["description"] for dp in node_data] + descriptions))
+            )
+            description_fields = {
+                "description": await self._handle_kg_summary(
+                    entity_name, description, self.max_summary_tokens
+                )
+            }
 
         source_id = "<SEP>".join(
             set([dp["source_id"] for dp in node_data] + source_ids)
         )
 
-        node_data = {
+        return {
             "entity_type": entity_type,
-            "description": description,
+            **description_fields,
             "source_id": source_id,
         }
-        await kg_instance.upsert_node(entity_name, node_data=node_data)
 
     async def merge_edges(
         self,
         edges_data: tuple[Tuple[str, str], List[dict]],
-        kg_instance: BaseGraphStorage,
-    ) -> None:
+        existing: Optional[dict] = None,
+    ) -> dict:
         (src_id, tgt_id), edge_data = edges_data
 
         source_ids = []
         descriptions = []
 
-        edge = await kg_instance.get_edge(src_id, tgt_id)
-        if edge is not None:
+        if existing is not None:
             source_ids.extend(
-                split_string_by_multi_markers(edge["source_id"], ["<SEP>"])
+                split_string_by_multi_markers(existing["source_id"], ["<SEP>"])
             )
-            descriptions.append(edge["description"])
+            descriptions.append(existing["description"])
 
-        description = "<SEP>".join(
-            sorted(set([dp["description"] for dp in edge_data] + descriptions))
-        )
         source_id = "<SEP>".join(
             set([dp["source_id"] for dp in edge_data] + source_ids)
         )
 
-        for insert_id in [src_id, tgt_id]:
-            if not await kg_instance.has_node(insert_id):
-                await kg_instance.upsert_node(
-                    insert_id,
-                    node_data={
-                        "source_id": source_id,
-                        "description": description,
-                        "entity_type": "UNKNOWN",
-                    },
-                )
+        if self.defer_summary:
+            self._dirty_edges.add((src_id, tgt_id))
+            return {
+                "source_id": source_id,
+                **self._append_descriptions(
+                    existing, [dp["description"] for dp in edge_data]
+                ),
+            }
 
+        description = "<SEP>".join(
+            sorted(set([dp["description"] for dp in edge_data] + descriptions))
+        )
         description = await self._handle_kg_summary(
-            f"({src_id}, {tgt_id})", description
+            f"({src_id}, {tgt_id})", description, self.max_summary_tokens
+        )
+
+        return {"source_id": source_id, "description": description}
+
+    def _append_descriptions(
+        self, existing: Optional[dict], new_descriptions: List[str]
+    ) -> dict:
+        """
+        Append the new descriptions to the stored one without re-tokenizing it:
+        the token count of the description and of what was appended since its last summary
+        are kept next to it (description_tokens / unsummarized_tokens).
+        """
+        tokenizer_instance = self.llm_client.tokenizer
+        if self._sep_tokens is None:
+            self._sep_tokens = tokenizer_instance.count_tokens("<SEP>")
+
+        description, tokens, unsummarized = "", 0, 0
+        if existing is not None:
+            description = existing["description"]
+            tokens = existing.get("description_tokens")
+            if tokens is None:
+                tokens = tokenizer_instance.count_tokens(description)
+            # data merged before the counters existed was already summarized
+            unsummarized = existing.get("unsummarized_tokens", 0)
+
+        known = set(split_string_by_multi_markers(description, ["<SEP>"]))
+        to_append = sorted(set(new_descriptions) - known)
+        for new_description, n_tokens in zip(
+            to_append, tokenizer_instance.count_tokens_batch(to_append)
+        ):
+            if description:
+                description += "<SEP>"
+                tokens += self._sep_tokens
+            description += new_description
+            tokens += n_tokens
+            unsummarized += n_tokens
+
+        return {
+            "description": description,
+            "description_tokens": tokens,
+            "unsummarized_tokens": unsummarized,
+        }
+
+    async def summarize_pending(
+        self,
+        kg_instance: BaseGraphStorage,
+        max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+        locks: Optional[KeyedLock] = None,
+    ) -> None:
+        """
+        Summarize the descriptions changed by the deferred merges since the last call.
+        Only descriptions of at least max_summary_tokens tokens whose appended material
+        reaches resummary_tokens are sent to the LLM, the others keep their appended text.
+        Every item is summarized and written back while holding its key in locks.
+        """
+        node_ids, self._dirty_nodes = list(self._dirty_nodes), set()
+        edge_ids, self._dirty_edges = list(self._dirty_edges), set()
+
+        def _needs_summary(data: Optional[dict]) -> bool:
+            return (
+                data is not None
+                and data.get("description_tokens", 0) >= self.max_summary_tokens
+                and data.get("unsummarized_tokens", 0) >= self.resummary_tokens
+            )
+
+        # key -> name shown to the LLM
+        todo: Dict[str | Tuple[str, str], str] = {}
+        for node_id, data in zip(node_ids, await kg_instance.get_nodes(node_ids)):
+            if _needs_summary(data):
+                todo[node_id] = node_id
+        for edge_id, data in zip(edge_ids, await kg_instance.get_edges(edge_ids)):
+            if _needs_summary(data):
+                todo[edge_id] = f"({edge_id[0]}, {edge_id[1]})"
+        if not todo:
+            return
+        logger.info(
+            "[Summarization] %d of %d changed entities and relations",
+            len(todo),
+            len(node_ids) + len(edge_ids),
         )
 
-        await kg_instance.upsert_edge(
-            src_id,
-            tgt_id,
-            edge_data={"source_id": source_id, "description": description},
+        locks = locks or KeyedLock()
+        tokenizer_instance = self.llm_client.tokenizer
+
+        async def _summarize(key):
+            # another pipeline may have merged into the item since it was selected
+            async with locks.hold(key, *(key if isinstance(key, tuple) else ())):
+                if isinstance(key, tuple):
+                    data = await kg_instance.get_edge(*key)
+                else:
+                    data = await kg_instance.get_node(key)
+                if not _needs_summary(data):
+                    return
+                summary = await self._handle_kg_summary(
+                    todo[key], data["description"], self.max_summary_tokens
+                )
+                update = {
+                    "description": summary,
+                    "description_tokens": tokenizer_instance.count_tokens(summary),
+                    "unsummarized_tokens": 0,
+                }
+                if isinstance(key, tuple):
+                    await kg_instance.update_edge(*key, update)
+                else:
+                    await kg_instance.update_node(key, update)
+
+        await run_concurrent(
+            _summarize,
+            list(todo),
+            max_in_flight=max_in_flight,
+            desc="Summarizing descriptions",
+            unit="item",
         )
 
     async def _handle_kg_summary(
@@ -199,14 +507,28 @@ class LightRAGKGBuilder(BaseKGBuilder):
         tokenizer_instance = self.llm_client.tokenizer
         language = detect_main_language(description)
 
-        tokens = tokenizer_instance.encode(description)
-        if len(tokens) < max_summary_tokens:
+        # the cached count spares encoding descriptions that are not summarized
+        if tokenizer_instance.count_tokens(description) < max_summary_tokens:
             return description
 
+        tokens = tokenizer_instance.encode(description)
         use_description = tokenizer_instance.decode(tokens[:max_summary_tokens])
+        if self.summary_mode == "batch":
+            return await self._summary_batcher.submit(
+                (entity_or_relation_name, use_description),
+                cost=max_summary_tokens,
+                key=language,
+            )
+        return await self._summarize_one(
+            entity_or_relation_name, use_description, language
+        )
+
+    async def _summarize_one(
+        self, entity_or_relation_name: str, description: str, language: str
+    ) -> str:
         prompt = KG_SUMMARIZATION_PROMPT[language]["TEMPLATE"].format(
             entity_name=entity_or_relation_name,
-            description_list=use_description.split("<SEP>"),
+            description_list=description.split("<SEP>"),
             **KG_SUMMARIZATION_PROMPT["FORMAT"],
         )
         new_description = await self.llm_client.generate_answer(prompt)
@@ -216,3 +538,65 @@ class LightRAGKGBuilder(BaseKGBuilder):
             new_description,
         )
         return new_description
+
+    async def _summarize_batch(
+        self, language: str, items: List[Tuple[str, str]]
+    ) -> List[str]:
+        """
+        Summarize several (name, description) items with one prompt.
+        Items missing from the answer, or all of them if the call fails, are summarized one by one.
+        """
+        if len(items) == 1:
+            return [await self._summarize_one(*items[0], language)]
+
+        prompt_format = KG_SUMMARIZATION_PROMPT["FORMAT"]
+        prompt = KG_SUMMARIZATION_PROMPT[language]["BATCH_TEMPLATE"].format(
+            items="\n\n".join(
+                KG_SUMMARIZATION_PROMPT[language]["BATCH_ITEM"].format(
+                    index=i + 1,
+                    entity_name=name,
+                    description_list=description.split("<SEP>"),
+                )
+                for i, (name, description) in enumerate(items)
+            ),
+            **prompt_format,
+        )
+
+        summaries: Dict[int, str] = {}
+        try:
+            result = await self.llm_client.generate_answer(prompt)
+        except Exception as e:  # pylint: disable=broad-except
+            logger.warning(
+                "Batched summarization of %d items failed: %s", len(items), e
+            )
+            result = ""
+        for record in split_string_by_multi_markers(
+            result,
+            [prompt_format["record_delimiter"], prompt_format["completion_delimiter"]],
+        ):
+            match = re.search(r"\((.*)\)", record, re.DOTALL)
+            if not match:
+                continue
+            attributes = split_string_by_multi_markers(
+                match.group(1), [prompt_format["tuple_delimiter"]]
+            )
+            if len(attributes) < 3 or attributes[0].strip('"') != "summary":
+                continue
+            index = attributes[1].strip().strip('"')
+            summary = clean_str(prompt_format["tuple_delimiter"].join(attributes[2:]))
+            if index.isdigit() and 0 < int(index) <= len(items) and summary:
+                summaries[int(index) - 1] = summary
+
+        missing = [i for i in range(len(items)) if i not in summaries]
+        if missing:
+            logger.info(
+                "Summarizing %d of %d items individually", len(missing), len(items)
+            )
+            for i, summary in zip(
+                missing,
+                await asyncio.gather(
+                    *(self._summarize_one(*items[i], language) for i in missing)
+                ),
+            ):
+                summaries[i] = summary
+        return [summaries[i] for i in range(len(items))]
@@ -1,86 +1,217 @@
 import asyncio
 import time
-from datetime import datetime, timedelta
+from collections import deque
+from typing import Optional
 
 from graphgen.utils import logger
 
 
-class RPM:
+class TokenBucket:
+    """
+    Async token bucket with continuous refill.
+    Waiters are served strictly in arrival order: the lock is held while waiting for refill,
+    so a large request cannot be starved by a stream of small ones.
+    The level may go negative after reconciliation, which is paid back before anyone else proceeds.
+
+    :param capacity: maximum number of tokens in the bucket (burst size)
+    :param refill_per_second: tokens added per second
+    """
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        if capacity <= 0 or refill_per_second <= 0:
+            raise ValueError("capacity and refill_per_second must be positive")
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self._level = capacity
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    @property
+    def level(self) -> float:
+        self._refill()
+        return self._level
+
+    def _refill(self):
+        now = time.monotonic()
+        self._level = min(
+            self.capacity,
+            self._level + (now - self._updated_at) * self.refill_per_second,
+        )
+        self._updated_at = now
+
+    async def acquire(self, amount: float = 1.0, silent: bool = True) -> float:
+        """
+        Take amount tokens from the bucket, waiting for refill if necessary.
+        Requests larger than the capacity wait for a full bucket and then overdraw it.
+
+        :return: seconds spent waiting
+        """
+        waited = 0.0
+        async with self._lock:
+            self._refill()
+            need = min(amount, self.capacity)
+            while self._level < need:
+                sleep_time = (need - self._level) / self.refill_per_second
+                if not silent:
+                    logger.info("Rate limit reached, wait %.2f seconds", sleep_time)
+                await asyncio.sleep(sleep_time)
+                waited += sleep_time
+                self._refill()
+            self._level -= amount
+        return waited
+
+    def adjust(self, delta: float):
+        """
+        Return (delta > 0) or charge (delta < 0) tokens without waiting.
+        """
+        self._refill()
+        self._level = min(self.capacity, self._level + delta)
+
+
+class RPM(TokenBucket):
+    """Requests-per-minute bucket."""
+
     def __init__(self, rpm: int = 1000):
+        super().__init__(capacity=rpm, refill_per_second=rpm / 60)
         self.rpm = rpm
-        self.record = {"rpm_slot": self.get_minute_slot(), "counter": 0}
-
-    @staticmethod
-    def get_minute_slot():
-        current_time = time.time()
-        dt_object = datetime.fromtimestamp(current_time)
-        total_minutes_since_midnight = dt_object.hour * 60 + dt_object.minute
-        return total_minutes_since_midnight
 
     async def wait(self, silent=False):
-        current = time.time()
-        dt_object = datetime.fromtimestamp(current)
-        minute_slot = self.get_minute_slot()
-
-        if self.record["rpm_slot"] == minute_slot:
-            # check RPM exceed
-            if self.record["counter"] >= self.rpm:
-                # wait until next minute
-                next_minute = dt_object.replace(second=0, microsecond=0) + timedelta(
-                    minutes=1
-                )
-                _next = next_minute.timestamp()
-                sleep_time = abs(_next - current)
-                if not silent:
-                    logger.info("RPM sleep %s", sleep_time)
-                await asyncio.sleep(sleep_time)
-
-                self.record = {"rpm_slot": self.get_minute_slot(), "counter": 0}
-        else:
-            self.record = {"rpm_slot": self.get_minute_slot(), "counter": 0}
-        self.record["counter"] += 1
+        await self.acquire(1, silent=silent)
 
-        if not silent:
-            logger.debug(self.record)
 
+class TPM(TokenBucket):
+    """Tokens-per-minute bucket."""
 
-class TPM:
     def __init__(self, tpm: int = 20000):
+        super().__init__(capacity=tpm, refill_per_second=tpm / 60)
         self.tpm = tpm
-        self.record = {"tpm_slot": self.get_minute_slot(), "counter": 0}
-
-    @staticmethod
-    def get_minute_slot():
-        current_time = time.time()
-        dt_object = datetime.fromtimestamp(current_time)
-        total_minutes_since_midnight = dt_object.hour * 60 + dt_object.minute
-        return total_minutes_since_midnight
 
     async def wait(self, token_count, silent=False):
-        current = time.time()
-        dt_object = datetime.fromtimestamp(current)
-        minute_slot = self.get_minute_slot()
-
-        # get next slot, skip
-        if self.record["tpm_slot"] != minute_slot:
-            self.record = {"tpm_slot": minute_slot, "counter": token_count}
+        await self.acquire(token_count, silent=silent)
+
+    def reconcile(self, estimated_tokens: int, actual_tokens: int):
+        """
+        Correct the bucket once the real usage of a request is known.
+        """
+        self.adjust(estimated_tokens - actual_tokens)
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD limit on the number of in-flight requests.
+    - slow start: the limit grows by one per success (doubling per round trip) until the first overload
+    - afterwards it grows by 1/limit per success (about one per round trip)
+    - growth pauses while the p95 latency of the recent window exceeds latency_tolerance x its best value
+    - an overload (rate limit / timeout) multiplies the limit by decrease_factor,
+      at most once per round of requests started before the previous cut
+
+    :param initial_limit: starting number of in-flight requests
+    :param min_limit: lower bound of the limit
+    :param max_limit: upper bound of the limit
+    :param decrease_factor: multiplicative decrease on overload
+    :param latency_window: number of recent latencies used to compute p95
+    :param latency_tolerance: growth stops while p95 > latency_tolerance * best p95
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 16,
+        min_limit: int = 1,
+        max_limit: int = 1024,
+        decrease_factor: float = 0.5,
+        latency_window: int = 100,
+        latency_tolerance: float = 1.5,
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+
+        self._limit = float(max(min_limit, min(initial_limit, max_limit)))
+        self._slow_start = True
+        self._in_flight = 0
+        self._waiting = 0
+        self._latencies: deque = deque(maxlen=latency_window)
+        self._best_p95: Optional[float] = None
+        self._last_decrease_at = 0.0
+        self._cond = asyncio.Condition()
+        self._counters = {"successes": 0, "overloads": 0, "errors": 0, "decreases": 0}
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def metrics(self) -> dict:
+        return {
+            "limit": self.limit,
+            "in_flight": self._in_flight,
+            "queue_depth": self._waiting,
+            "p95_latency": self._p95(),
+            **self._counters,
+        }
+
+    def _p95(self) -> Optional[float]:
+        if not self._latencies:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+
+    async def acquire(self) -> float:
+        """
+        Wait for a free slot.
+
+        :return: start timestamp, to be passed back to release()
+        """
+        async with self._cond:
+            self._waiting += 1
+            try:
+                await self._cond.wait_for(lambda: self._in_flight < self.limit)
+            finally:
+                self._waiting -= 1
+            self._in_flight += 1
+        return time.monotonic()
+
+    async def release(
+        self, started_at: float, *, success: bool = True, overloaded: bool = False
+    ):
+        """
+        Free the slot and adapt the limit.
+
+        :param started_at: value returned by acquire()
+        :param success: whether the request succeeded
+        :param overloaded: whether the request failed because the endpoint is saturated
+        """
+        now = time.monotonic()
+        async with self._cond:
+            self._in_flight -= 1
+            if overloaded:
+                self._counters["overloads"] += 1
+                if started_at >= self._last_decrease_at:
+                    self._limit = max(
+                        float(self.min_limit), self._limit * self.decrease_factor
+                    )
+                    self._slow_start = False
+                    self._last_decrease_at = now
+                    self._counters["decreases"] += 1
+                    logger.info("Concurrency limit decreased to %d", self.limit)
+            elif success:
+                self._counters["successes"] += 1
+                self._on_success(now - started_at)
+            else:
+                self._counters["errors"] += 1
+            self._cond.notify_all()
+
+    def _on_success(self, latency: float):
+        self._latencies.append(latency)
+        if len(self._latencies) == self._latencies.maxlen:
+            p95 = self._p95()
+            if self._best_p95 is None or p95 < self._best_p95:
+                self._best_p95 = p95
+            if p95 > self.latency_tolerance * self._best_p95:
+                return
+        # only grow when demand saturates the current limit
+        if self._in_flight + self._waiting + 1 < self.limit:
             return
-
-        # check RPM exceed
-        old_counter = self.record["counter"]
-        self.record["counter"] += token_count
-        if self.record["counter"] > self.tpm:
-            logger.info("Current TPM: %s, limit: %s", old_counter, self.tpm)
-            # wait until next minute
-            next_minute = dt_object.replace(second=0, microsecond=0) + timedelta(
-                minutes=1
-            )
-            _next = next_minute.timestamp()
-            sleep_time = abs(_next - current)
-            logger.warning("TPM limit exceeded, wait %s seconds", sleep_time)
-            await asyncio.sleep(sleep_time)
-
-            self.record = {"tpm_slot": self.get_minute_slot(), "counter": token_count}
-
-        if not silent:
-            logger.debug(self.record)
+        step = 1.0 if self._slow_start else 1.0 / self._limit
+        self._limit = min(float(self.max_limit), self._limit + step)
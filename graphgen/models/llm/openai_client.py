@@ -1,4 +1,5 @@
 import math
+from dataclasses import asdict
 from typing import Any, Dict, List, Optional
 
 import openai
@@ -12,7 +13,10 @@ from tenacity import (
 
 from graphgen.bases.base_llm_client import BaseLLMClient
 from graphgen.bases.datatypes import Token
-from graphgen.models.llm.limitter import RPM, TPM
+from graphgen.models.llm.limitter import RPM, TPM, AdaptiveConcurrencyLimiter
+from graphgen.models.llm.response_cache import LLMResponseCache
+from graphgen.models.llm.token_estimator import PromptTokenEstimator
+from graphgen.utils import logger
 
 
 def get_top_response_tokens(response: openai.ChatCompletion) -> List[Token]:
@@ -28,6 +32,29 @@ def get_top_response_tokens(response: openai.ChatCompletion) -> List[Token]:
     return tokens
 
 
+def _tokens_from_dicts(data: List[dict]) -> List[Token]:
+    return [
+        Token(
+            text=d["text"],
+            prob=d["prob"],
+            top_candidates=_tokens_from_dicts(d.get("top_candidates", [])),
+            ppl=d.get("ppl"),
+        )
+        for d in data
+    ]
+
+
+def _count_retry(retry_state) -> None:
+    client = retry_state.args[0]
+    client.retries += 1
+    logger.warning(
+        "Retrying %s (attempt %d): %s",
+        retry_state.fn.__name__,
+        retry_state.attempt_number,
+        retry_state.outcome.exception(),
+    )
+
+
 class OpenAIClient(BaseLLMClient):
     def __init__(
         self,
@@ -41,6 +68,11 @@ class OpenAIClient(BaseLLMClient):
         request_limit: bool = False,
         rpm: Optional[RPM] = None,
         tpm: Optional[TPM] = None,
+        cache: Optional[LLMResponseCache] = None,
+        adaptive_concurrency: bool = False,
+        concurrency_limiter: Optional[AdaptiveConcurrencyLimiter] = None,
+        token_estimation: str = "exact",
+        token_estimator: Optional[PromptTokenEstimator] = None,
         **kwargs: Any,
     ):
         super().__init__(**kwargs)
@@ -55,6 +87,15 @@ class OpenAIClient(BaseLLMClient):
         self.request_limit = request_limit
         self.rpm = rpm or RPM()
         self.tpm = tpm or TPM()
+        self.cache = cache
+
+        self.retries = 0
+        self.concurrency_limiter = concurrency_limiter or (
+            AdaptiveConcurrencyLimiter() if adaptive_concurrency else None
+        )
+        self.token_estimator = token_estimator or PromptTokenEstimator(
+            self.tokenizer, mode=token_estimation
+        )
 
         self.__post_init__()
 
@@ -87,12 +128,73 @@ class OpenAIClient(BaseLLMClient):
         kwargs["messages"] = messages
         return kwargs
 
+    @property
+    def metrics(self) -> dict:
+        """Current concurrency limit, queue depth and retry counters of the client."""
+        metrics = {"retries": self.retries}
+        if self.concurrency_limiter is not None:
+            metrics.update(self.concurrency_limiter.metrics)
+        return metrics
+
+    async def _create_completion(self, kwargs: Dict):
+        if self.concurrency_limiter is None:
+            return await self.client.chat.completions.create(  # pylint: disable=E1125
+                model=self.model_name, **kwargs
+            )
+
+        started_at = await self.concurrency_limiter.acquire()
+        success, overloaded = False, False
+        try:
+            completion = (
+                await self.client.chat.completions.create(  # pylint: disable=E1125
+                    model=self.model_name, **kwargs
+                )
+            )
+            success = True
+            return completion
+        except (RateLimitError, APITimeoutError):
+            overloaded = True
+            raise
+        finally:
+            await self.concurrency_limiter.release(
+                started_at, success=success, overloaded=overloaded
+            )
+
+    async def _estimate_tokens(self, kwargs: Dict) -> int:
+        if not self.request_limit:
+            # the estimate only feeds the TPM limiter
+            return 0
+        prompt_tokens = await self.token_estimator.estimate(kwargs["messages"])
+        return prompt_tokens + kwargs["max_tokens"]
+
+    async def _wait_for_limit(self, estimated_tokens: int):
+        if self.request_limit:
+            await self.rpm.wait(silent=True)
+            await self.tpm.wait(estimated_tokens, silent=True)
+
+    def _record_usage(self, completion, estimated_tokens: int, kwargs: Dict):
+        if getattr(completion, "usage", None) is None:
+            return
+        self.token_usage.append(
+            {
+                "prompt_tokens": completion.usage.prompt_tokens,
+                "completion_tokens": completion.usage.completion_tokens,
+                "total_tokens": completion.usage.total_tokens,
+            }
+        )
+        if self.request_limit:
+            self.tpm.reconcile(estimated_tokens, completion.usage.total_tokens)
+            self.token_estimator.observe(
+                kwargs["messages"], completion.usage.prompt_tokens
+            )
+
     @retry(
         stop=stop_after_attempt(5),
         wait=wait_exponential(multiplier=1, min=4, max=10),
         retry=retry_if_exception_type(
             (RateLimitError, APIConnectionError, APITimeoutError)
         ),
+        before_sleep=_count_retry,
     )
     async def generate_topk_per_token(
         self,
@@ -108,12 +210,23 @@ class OpenAIClient(BaseLLMClient):
         # Limit max_tokens to 1 to avoid long completions
         kwargs["max_tokens"] = 1
 
-        completion = await self.client.chat.completions.create(  # pylint: disable=E1125
-            model=self.model_name, **kwargs
-        )
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self.cache.make_key(self.model_name, kwargs)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return _tokens_from_dicts(cached)
+
+        estimated_tokens = await self._estimate_tokens(kwargs)
+        await self._wait_for_limit(estimated_tokens)
+
+        completion = await self._create_completion(kwargs)
+        self._record_usage(completion, estimated_tokens, kwargs)
 
         tokens = get_top_response_tokens(completion)
 
+        if cache_key is not None:
+            self.cache.set(cache_key, [asdict(t) for t in tokens])
         return tokens
 
     @retry(
@@ -122,6 +235,7 @@ class OpenAIClient(BaseLLMClient):
         retry=retry_if_exception_type(
             (RateLimitError, APIConnectionError, APITimeoutError)
         ),
+        before_sleep=_count_retry,
     )
     async def generate_answer(
         self,
@@ -131,27 +245,22 @@ class OpenAIClient(BaseLLMClient):
     ) -> str:
         kwargs = self._pre_generate(text, history)
 
-        prompt_tokens = 0
-        for message in kwargs["messages"]:
-            prompt_tokens += len(self.tokenizer.encode(message["content"]))
-        estimated_tokens = prompt_tokens + kwargs["max_tokens"]
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self.cache.make_key(self.model_name, kwargs)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
 
-        if self.request_limit:
-            await self.rpm.wait(silent=True)
-            await self.tpm.wait(estimated_tokens, silent=True)
+        estimated_tokens = await self._estimate_tokens(kwargs)
+        await self._wait_for_limit(estimated_tokens)
 
-        completion = await self.client.chat.completions.create(  # pylint: disable=E1125
-            model=self.model_name, **kwargs
-        )
-        if hasattr(completion, "usage"):
-            self.token_usage.append(
-                {
-                    "prompt_tokens": completion.usage.prompt_tokens,
-                    "completion_tokens": completion.usage.completion_tokens,
-                    "total_tokens": completion.usage.total_tokens,
-                }
-            )
-        return self.filter_think_tags(completion.choices[0].message.content)
+        completion = await self._create_completion(kwargs)
+        self._record_usage(completion, estimated_tokens, kwargs)
+        answer = self.filter_think_tags(completion.choices[0].message.content)
+        if cache_key is not None:
+            self.cache.set(cache_key, answer)
+        return answer
 
     async def generate_inputs_prob(
         self, text: str, history: Optional[List[str]] = None, **extra: Any
@@ -0,0 +1,140 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from graphgen.utils import compute_content_hash, logger
+
+# eviction scans the table, so it runs once every this many writes
+_EVICT_EVERY: int = 256
+
+
+@dataclass
+class LLMResponseCache:
+    """
+    Disk-backed cache of LLM responses stored in SQLite.
+    The key covers everything that may change a response:
+    model name, messages and the sampling params sent to the endpoint.
+
+    :param working_dir: directory of the database file
+    :param namespace: database file name (without suffix)
+    :param ttl_seconds: entries older than this are treated as misses, None means never expire
+    :param max_entries: least recently used entries are evicted above this size, None means unbounded
+    """
+
+    working_dir: str = None
+    namespace: str = "llm_response_cache"
+    ttl_seconds: Optional[float] = None
+    max_entries: Optional[int] = None
+    stats: dict = field(
+        default_factory=lambda: {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+    )
+
+    def __post_init__(self):
+        os.makedirs(self.working_dir, exist_ok=True)
+        self._file_name = os.path.join(self.working_dir, f"{self.namespace}.db")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self._file_name, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_accessed_at ON responses(accessed_at)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_created_at ON responses(created_at)"
+        )
+        self._conn.commit()
+        logger.info(
+            "Load LLM response cache %s with %d entries", self._file_name, len(self)
+        )
+
+    @staticmethod
+    def make_key(model_name: str, request_kwargs: dict) -> str:
+        """
+        Build a cache key from the model name and the kwargs of a chat completion request.
+        """
+        payload = json.dumps(
+            {"model": model_name, **request_kwargs},
+            sort_keys=True,
+            ensure_ascii=False,
+            default=str,
+        )
+        return compute_content_hash(payload, prefix="llm-")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self._expired(row[1], now):
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                self.stats["evictions"] += 1
+                row = None
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            self._conn.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+            self.stats["hits"] += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), now, now),
+            )
+            self.stats["writes"] += 1
+            if self.stats["writes"] % _EVICT_EVERY == 0:
+                self._evict(now)
+            self._conn.commit()
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_seconds is not None and now - created_at > self.ttl_seconds
+
+    def _evict(self, now: float):
+        if self.ttl_seconds is not None:
+            cur = self._conn.execute(
+                "DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,)
+            )
+            self.stats["evictions"] += cur.rowcount
+        if self.max_entries is not None:
+            cur = self._conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self.stats["evictions"] += cur.rowcount
+
+    def evict(self):
+        """Drop expired entries and shrink the cache to max_entries."""
+        with self._lock:
+            self._evict(time.time())
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
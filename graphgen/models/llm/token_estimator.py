@@ -0,0 +1,61 @@
+import asyncio
+import math
+from typing import List, Optional
+
+from graphgen.bases import BaseTokenizer
+
+
+class PromptTokenEstimator:
+    """
+    Estimate the prompt tokens of a request before it is sent, for the TPM limiter.
+    - exact: count every message with the tokenizer in a worker thread, so that long prompts
+      do not stall the event loop; counts are cached per content by the tokenizer, so history
+      turns sent again with every gleaning round are only encoded once
+    - char_ratio: len(content) / chars_per_token, without any tokenization
+    - usage: char_ratio, with chars_per_token learned from the prompt_tokens reported in usage
+    Without a tokenizer, exact falls back to char_ratio.
+
+    :param tokenizer
+    :param mode: exact, char_ratio or usage
+    :param chars_per_token: characters per token of char_ratio, initial value of usage
+    :param smoothing: weight of the latest request in the moving average of usage
+    """
+
+    def __init__(
+        self,
+        tokenizer: Optional[BaseTokenizer] = None,
+        mode: str = "exact",
+        chars_per_token: float = 4.0,
+        smoothing: float = 0.1,
+    ):
+        if mode not in ("exact", "char_ratio", "usage"):
+            raise ValueError(f"Invalid token estimation mode: {mode}")
+        if chars_per_token <= 0:
+            raise ValueError(f"chars_per_token must be positive, got {chars_per_token}")
+        self.tokenizer = tokenizer
+        self.mode = mode
+        self.chars_per_token = chars_per_token
+        self.smoothing = smoothing
+
+    async def estimate(self, messages: List[dict]) -> int:
+        contents = [message["content"] for message in messages]
+        if self.mode == "exact" and self.tokenizer is not None:
+            loop = asyncio.get_running_loop()
+            counts = await loop.run_in_executor(
+                None, self.tokenizer.count_tokens_batch, contents
+            )
+            return sum(counts)
+        return math.ceil(sum(len(c) for c in contents) / self.chars_per_token)
+
+    def observe(self, messages: List[dict], prompt_tokens: int) -> None:
+        """
+        Learn from the prompt tokens the endpoint counted for a request (usage mode only).
+        """
+        if self.mode != "usage" or not prompt_tokens:
+            return
+        n_chars = sum(len(message["content"]) for message in messages)
+        if not n_chars:
+            return
+        self.chars_per_token += self.smoothing * (
+            n_chars / prompt_tokens - self.chars_per_token
+        )
@@ -1,8 +1,8 @@
 import random
 from collections import deque
-from typing import Any, List, Literal, Set, Tuple
+from typing import Any, AsyncIterator, List, Literal, Set, Tuple
 
-from graphgen.bases import BaseGraphStorage
+from graphgen.bases import BaseGraphStorage, GraphSnapshot
 from graphgen.bases.datatypes import Community
 
 from .bfs_partitioner import BFSPartitioner
@@ -30,50 +30,44 @@ class AnchorBFSPartitioner(BFSPartitioner):
         self.anchor_type = anchor_type
         self.anchor_ids = anchor_ids
 
-    async def partition(
+    async def iter_partition(
         self,
         g: BaseGraphStorage,
         max_units_per_community: int = 1,
         **kwargs: Any,
-    ) -> List[Community]:
-        nodes = await g.get_all_nodes()  # List[tuple[id, meta]]
-        edges = await g.get_all_edges()  # List[tuple[u, v, meta]]
+    ) -> AsyncIterator[Community]:
+        snapshot = await g.get_snapshot()
 
-        adj, _ = self._build_adjacency_list(nodes, edges)
-
-        anchors: Set[str] = await self._pick_anchor_ids(nodes)
+        anchors: Set[str] = await self._pick_anchor_ids(g)
         if not anchors:
-            return []  # if no anchors, return empty list
+            return  # if no anchors, no communities
 
-        used_n: set[str] = set()
-        used_e: set[frozenset[str]] = set()
-        communities: List[Community] = []
+        used_n = bytearray(snapshot.num_nodes)
+        used_e = bytearray(snapshot.num_edges)
+        n_communities = 0
 
-        seeds = list(anchors)
+        seeds = [snapshot.node_index[a] for a in anchors if a in snapshot.node_index]
         random.shuffle(seeds)
 
         for seed_node in seeds:
-            if seed_node in used_n:
+            if used_n[seed_node]:
                 continue
             comm_n, comm_e = await self._grow_community(
-                seed_node, adj, max_units_per_community, used_n, used_e
+                seed_node, snapshot, max_units_per_community, used_n, used_e
             )
             if comm_n or comm_e:
-                communities.append(
-                    Community(id=len(communities), nodes=comm_n, edges=comm_e)
-                )
-
-        return communities
+                yield Community(id=n_communities, nodes=comm_n, edges=comm_e)
+                n_communities += 1
 
     async def _pick_anchor_ids(
         self,
-        nodes: List[tuple[str, dict]],
+        g: BaseGraphStorage,
     ) -> Set[str]:
         if self.anchor_ids is not None:
             return self.anchor_ids
 
         anchor_ids: Set[str] = set()
-        for node_id, meta in nodes:
+        for node_id, meta in await g.get_all_nodes():
             node_type = str(meta.get("entity_type", "")).lower()
             if self.anchor_type.lower() in node_type:
                 anchor_ids.add(node_id)
@@ -81,48 +75,46 @@ class AnchorBFSPartitioner(BFSPartitioner):
 
     @staticmethod
     async def _grow_community(
-        seed: str,
-        adj: dict[str, List[str]],
+        seed: int,
+        snapshot: GraphSnapshot,
         max_units: int,
-        used_n: set[str],
-        used_e: set[frozenset[str]],
+        used_n: bytearray,
+        used_e: bytearray,
     ) -> Tuple[List[str], List[Tuple[str, str]]]:
         """
         Grow a community from the seed node using BFS.
-        :param seed: seed node id
-        :param adj: adjacency list
+        :param seed: seed node index
+        :param snapshot: graph snapshot
         :param max_units: maximum number of units (nodes + edges) in the community
-        :param used_n: set of used node ids
-        :param used_e: set of used edge keys
+        :param used_n: mask of used nodes
+        :param used_e: mask of used edges
         :return: (list of node ids, list of edge tuples)
         """
         comm_n: List[str] = []
         comm_e: List[Tuple[str, str]] = []
-        queue: deque[tuple[str, Any]] = deque([(NODE_UNIT, seed)])
+        queue: deque[tuple[str, int]] = deque([(NODE_UNIT, seed)])
         cnt = 0
 
         while queue and cnt < max_units:
             k, it = queue.popleft()
 
             if k == NODE_UNIT:
-                if it in used_n:
+                if used_n[it]:
                     continue
-                used_n.add(it)
-                comm_n.append(it)
+                used_n[it] = 1
+                comm_n.append(snapshot.node_ids[it])
                 cnt += 1
-                for nei in adj[it]:
-                    e_key = frozenset((it, nei))
-                    if e_key not in used_e:
-                        queue.append((EDGE_UNIT, e_key))
+                for e in snapshot.neighbors(it)[1]:
+                    if not used_e[e]:
+                        queue.append((EDGE_UNIT, e))
             else:  # EDGE_UNIT
-                if it in used_e:
+                if used_e[it]:
                     continue
-                used_e.add(it)
-                u, v = it
-                comm_e.append((u, v))
+                used_e[it] = 1
+                comm_e.append(snapshot.edge_pair(it))
                 cnt += 1
-                for n in it:
-                    if n not in used_n:
+                for n in (int(snapshot.edge_src[it]), int(snapshot.edge_tgt[it])):
+                    if not used_n[n]:
                         queue.append((NODE_UNIT, n))
 
         return comm_n, comm_e
@@ -1,5 +1,5 @@
 import random
-from typing import Any, List
+from typing import Any, AsyncIterator, List
 
 from graphgen.bases import BaseGraphStorage, BasePartitioner
 from graphgen.bases.datatypes import Community
@@ -22,57 +22,66 @@ class DFSPartitioner(BasePartitioner):
         max_units_per_community: int = 1,
         **kwargs: Any,
     ) -> List[Community]:
-        nodes = await g.get_all_nodes()
-        edges = await g.get_all_edges()
+        return [
+            comm
+            async for comm in self.iter_partition(
+                g, max_units_per_community=max_units_per_community, **kwargs
+            )
+        ]
 
-        adj, _ = self._build_adjacency_list(nodes, edges)
+    async def iter_partition(
+        self,
+        g: BaseGraphStorage,
+        max_units_per_community: int = 1,
+        **kwargs: Any,
+    ) -> AsyncIterator[Community]:
+        snapshot = await g.get_snapshot()
+        n_nodes = snapshot.num_nodes
+        src, tgt = snapshot.edge_src.tolist(), snapshot.edge_tgt.tolist()
 
-        used_n: set[str] = set()
-        used_e: set[frozenset[str]] = set()
-        communities: List[Community] = []
+        used_n = bytearray(n_nodes)
+        used_e = bytearray(snapshot.num_edges)
+        n_communities = 0
 
-        units = [(NODE_UNIT, n[0]) for n in nodes] + [
-            (EDGE_UNIT, frozenset((u, v))) for u, v, _ in edges
-        ]
+        # unit i < n_nodes is node i, otherwise edge i - n_nodes
+        units = list(range(snapshot.num_units))
         random.shuffle(units)
 
-        for kind, seed in units:
-            if (kind == NODE_UNIT and seed in used_n) or (
-                kind == EDGE_UNIT and seed in used_e
+        for seed in units:
+            if (seed < n_nodes and used_n[seed]) or (
+                seed >= n_nodes and used_e[seed - n_nodes]
             ):
                 continue
 
             comm_n, comm_e = [], []
-            stack = [(kind, seed)]
+            stack = [
+                (NODE_UNIT, seed) if seed < n_nodes else (EDGE_UNIT, seed - n_nodes)
+            ]
             cnt = 0
 
             while stack and cnt < max_units_per_community:
                 k, it = stack.pop()
                 if k == NODE_UNIT:
-                    if it in used_n:
+                    if used_n[it]:
                         continue
-                    used_n.add(it)
-                    comm_n.append(it)
+                    used_n[it] = 1
+                    comm_n.append(snapshot.node_ids[it])
                     cnt += 1
-                    for nei in adj[it]:
-                        e_key = frozenset((it, nei))
-                        if e_key not in used_e:
-                            stack.append((EDGE_UNIT, e_key))
+                    for e in snapshot.neighbors(it)[1]:
+                        if not used_e[e]:
+                            stack.append((EDGE_UNIT, e))
                             break
                 else:
-                    if it in used_e:
+                    if used_e[it]:
                         continue
-                    used_e.add(it)
-                    comm_e.append(tuple(it))
+                    used_e[it] = 1
+                    comm_e.append(snapshot.edge_pair(it))
                     cnt += 1
                     # push neighboring nodes
-                    for n in it:
-                        if n not in used_n:
+                    for n in (src[it], tgt[it]):
+                        if not used_n[n]:
                             stack.append((NODE_UNIT, n))
 
             if comm_n or comm_e:
-                communities.append(
-                    Community(id=len(communities), nodes=comm_n, edges=comm_e)
-                )
-
-        return communities
+                yield Community(id=n_communities, nodes=comm_n, edges=comm_e)
+                n_communities += 1
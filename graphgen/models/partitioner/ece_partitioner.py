@@ -1,10 +1,10 @@
-import asyncio
-import random
-from typing import Any, Dict, List, Optional, Set, Tuple
+from collections import deque
+from typing import Any, AsyncIterator, Iterator, List
 
-from tqdm.asyncio import tqdm as tqdm_async
+import numpy as np
+from tqdm import tqdm
 
-from graphgen.bases import BaseGraphStorage
+from graphgen.bases import BaseGraphStorage, GraphSnapshot
 from graphgen.bases.datatypes import Community
 from graphgen.models.partitioner.bfs_partitioner import BFSPartitioner
 
@@ -26,30 +26,29 @@ class ECEPartitioner(BFSPartitioner):
     """
 
     @staticmethod
-    def _sort_units(units: list, edge_sampling: str) -> list:
+    def _unit_priority(loss: np.ndarray, unit_sampling: str) -> np.ndarray:
         """
-        Sort units with edge sampling strategy
+        Rank every unit once with the sampling strategy, lower rank is picked first.
+        Ties keep the unit order, as a stable sort of the units would.
 
-        :param units: total units
-        :param edge_sampling: edge sampling strategy (random, min_loss, max_loss)
-        :return: sorted units
+        :param loss: loss of every unit
+        :param unit_sampling: unit sampling strategy (random, min_loss, max_loss)
+        :return: rank of every unit
         """
-        if edge_sampling == "random":
-            random.shuffle(units)
-        elif edge_sampling == "min_loss":
-            units = sorted(
-                units,
-                key=lambda x: x[-1]["loss"],
-            )
-        elif edge_sampling == "max_loss":
-            units = sorted(
-                units,
-                key=lambda x: x[-1]["loss"],
-                reverse=True,
-            )
+        if unit_sampling == "random":
+            order = np.random.permutation(len(loss))
+        elif unit_sampling in ("min_loss", "max_loss"):
+            if np.isnan(loss).any():
+                raise ValueError(
+                    f"unit_sampling={unit_sampling} requires a loss on every node and edge"
+                )
+            key = loss if unit_sampling == "min_loss" else -loss
+            order = np.argsort(key, kind="stable")
         else:
-            raise ValueError(f"Invalid edge sampling: {edge_sampling}")
-        return units
+            raise ValueError(f"Invalid edge sampling: {unit_sampling}")
+        rank = np.empty(len(loss), dtype=np.int64)
+        rank[order] = np.arange(len(loss))
+        return rank
 
     async def partition(
         self,
@@ -60,102 +59,113 @@ class ECEPartitioner(BFSPartitioner):
         unit_sampling: str = "random",
         **kwargs: Any,
     ) -> List[Community]:
-        nodes: List[Tuple[str, dict]] = await g.get_all_nodes()
-        edges: List[Tuple[str, str, dict]] = await g.get_all_edges()
-
-        adj, _ = self._build_adjacency_list(nodes, edges)
-        node_dict = dict(nodes)
-        edge_dict = {frozenset((u, v)): d for u, v, d in edges}
-
-        all_units: List[Tuple[str, Any, dict]] = [
-            (NODE_UNIT, nid, d) for nid, d in nodes
-        ] + [(EDGE_UNIT, frozenset((u, v)), d) for u, v, d in edges]
-
-        used_n: Set[str] = set()
-        used_e: Set[frozenset[str]] = set()
-        communities: List = []
-
-        all_units = self._sort_units(all_units, unit_sampling)
-
-        async def _grow_community(
-            seed_unit: Tuple[str, Any, dict]
-        ) -> Optional[Community]:
-            nonlocal used_n, used_e
-
-            community_nodes: Dict[str, dict] = {}
-            community_edges: Dict[frozenset[str], dict] = {}
-            queue: asyncio.Queue = asyncio.Queue()
-            token_sum = 0
-
-            async def _add_unit(u):
-                nonlocal token_sum
-                t, i, d = u
-                if t == NODE_UNIT:  # node
-                    if i in used_n or i in community_nodes:
-                        return False
-                    community_nodes[i] = d
-                    used_n.add(i)
-                else:  # edge
-                    if i in used_e or i in community_edges:
-                        return False
-                    community_edges[i] = d
-                    used_e.add(i)
-                token_sum += d.get("length", 0)
-                return True
-
-            await _add_unit(seed_unit)
-            await queue.put(seed_unit)
-
-            # BFS
-            while not queue.empty():
+        return [
+            comm
+            async for comm in self.iter_partition(
+                g,
+                max_units_per_community=max_units_per_community,
+                min_units_per_community=min_units_per_community,
+                max_tokens_per_community=max_tokens_per_community,
+                unit_sampling=unit_sampling,
+            )
+        ]
+
+    async def iter_partition(
+        self,
+        g: BaseGraphStorage,
+        max_units_per_community: int = 10,
+        min_units_per_community: int = 1,
+        max_tokens_per_community: int = 10240,
+        unit_sampling: str = "random",
+        **kwargs: Any,
+    ) -> AsyncIterator[Community]:
+        snapshot = await g.get_snapshot()
+        for comm in self._iter_snapshot(
+            snapshot,
+            max_units_per_community=max_units_per_community,
+            min_units_per_community=min_units_per_community,
+            max_tokens_per_community=max_tokens_per_community,
+            unit_sampling=unit_sampling,
+        ):
+            yield comm
+
+    def _iter_snapshot(  # pylint: disable=too-many-locals,too-many-branches
+        self,
+        snapshot: GraphSnapshot,
+        max_units_per_community: int,
+        min_units_per_community: int,
+        max_tokens_per_community: int,
+        unit_sampling: str,
+    ) -> Iterator[Community]:
+        """
+        Plain synchronous BFS over the snapshot, yielding every community once it is complete.
+        The priorities are static, so the seed order and the order of every node's edges
+        are sorted once up front instead of at every expansion step.
+        """
+        n_nodes = snapshot.num_nodes
+        rank = self._unit_priority(snapshot.unit_loss, unit_sampling)
+        length = snapshot.unit_length.tolist()
+        src, tgt = snapshot.edge_src.tolist(), snapshot.edge_tgt.tolist()
+
+        # incident edges of every node (as units), sorted by priority within the CSR row
+        owners = np.repeat(np.arange(n_nodes), np.diff(snapshot.indptr))
+        edge_units = snapshot.edge_ids + n_nodes
+        adj_units = edge_units[np.lexsort((rank[edge_units], owners))].tolist()
+        indptr = snapshot.indptr.tolist()
+        # the two endpoints of an edge are compared on the key itself,
+        # so that ties keep the (src, tgt) order
+        if unit_sampling == "min_loss":
+            node_key = snapshot.node_loss.tolist()
+        elif unit_sampling == "max_loss":
+            node_key = (-snapshot.node_loss).tolist()
+        else:
+            node_key = rank[:n_nodes].tolist()
+
+        # unit i < n_nodes is node i, otherwise edge i - n_nodes
+        used = bytearray(snapshot.num_units)
+        n_communities = 0
+
+        for seed in tqdm(np.argsort(rank).tolist(), desc="ECE partition"):
+            if used[seed]:
+                continue
+            used[seed] = 1
+            members = [seed]
+            token_sum = length[seed]
+            queue = deque([seed])
+
+            while queue:
                 if (
-                    len(community_nodes) + len(community_edges)
-                    >= max_units_per_community
+                    len(members) >= max_units_per_community
                     or token_sum >= max_tokens_per_community
                 ):
                     break
-
-                cur_type, cur_id, _ = await queue.get()
-
-                neighbors: List[Tuple[str, Any, dict]] = []
-                if cur_type == NODE_UNIT:
-                    for nb_id in adj.get(cur_id, []):
-                        e_key = frozenset((cur_id, nb_id))
-                        if e_key not in used_e and e_key not in community_edges:
-                            neighbors.append((EDGE_UNIT, e_key, edge_dict[e_key]))
+                cur = queue.popleft()
+                if cur < n_nodes:
+                    neighbors = adj_units[indptr[cur] : indptr[cur + 1]]
                 else:
-                    for n_id in cur_id:
-                        if n_id not in used_n and n_id not in community_nodes:
-                            neighbors.append((NODE_UNIT, n_id, node_dict[n_id]))
+                    u, v = src[cur - n_nodes], tgt[cur - n_nodes]
+                    neighbors = (v, u) if node_key[v] < node_key[u] else (u, v)
 
-                neighbors = self._sort_units(neighbors, unit_sampling)
                 for nb in neighbors:
                     if (
-                        len(community_nodes) + len(community_edges)
-                        >= max_units_per_community
+                        len(members) >= max_units_per_community
                         or token_sum >= max_tokens_per_community
                     ):
                         break
-                    if await _add_unit(nb):
-                        await queue.put(nb)
-
-            if len(community_nodes) + len(community_edges) < min_units_per_community:
-                return None
-
-            return Community(
-                id=len(communities),
-                nodes=list(community_nodes.keys()),
-                edges=[(u, v) for (u, v), _ in community_edges.items()],
-            )
-
-        async for unit in tqdm_async(all_units, desc="ECE partition"):
-            utype, uid, _ = unit
-            if (utype == NODE_UNIT and uid in used_n) or (
-                utype == EDGE_UNIT and uid in used_e
-            ):
+                    if used[nb]:
+                        continue
+                    used[nb] = 1
+                    members.append(nb)
+                    token_sum += length[nb]
+                    queue.append(nb)
+
+            if len(members) < min_units_per_community:
                 continue
-            comm = await _grow_community(unit)
-            if comm is not None:
-                communities.append(comm)
-
-        return communities
+            yield Community(
+                id=n_communities,
+                nodes=[snapshot.node_ids[m] for m in members if m < n_nodes],
+                edges=[
+                    snapshot.edge_pair(m - n_nodes) for m in members if m >= n_nodes
+                ],
+            )
+            n_communities += 1
@@ -1,12 +1,36 @@
-from collections import defaultdict
-from typing import Any, Dict, List, Set, Tuple
+import asyncio
+import os
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
 
 import igraph as ig
+import numpy as np
 from leidenalg import ModularityVertexPartition, find_partition
 
-from graphgen.bases import BaseGraphStorage, BasePartitioner
+from graphgen.bases import BaseGraphStorage, BasePartitioner, GraphSnapshot
 from graphgen.bases.datatypes import Community
 
+# components are grouped into tasks of at least this many edges,
+# smaller graphs are partitioned in-process
+_MIN_EDGES_PER_TASK: int = 50000
+
+
+def _leiden_components(
+    components: List[Tuple[int, np.ndarray]], random_seed: int
+) -> List[List[int]]:
+    """
+    Run Leiden on each (n_vertices, local edge array) component.
+    Module level so that it can be sent to a worker process.
+    :return: membership of every vertex, per component
+    """
+    memberships = []
+    for n_vertices, edges in components:
+        graph = ig.Graph(n=n_vertices, edges=edges.tolist())
+        partition = find_partition(graph, ModularityVertexPartition, seed=random_seed)
+        memberships.append(partition.membership)
+    return memberships
+
 
 class LeidenPartitioner(BasePartitioner):
     """
@@ -19,82 +43,173 @@ class LeidenPartitioner(BasePartitioner):
         max_size: int = 20,
         use_lcc: bool = False,
         random_seed: int = 42,
+        max_workers: Optional[int] = None,
+        split_mode: str = "chunk",
+        max_tokens_per_community: Optional[int] = None,
         **kwargs: Any,
     ) -> List[Community]:
         """
         Leiden Partition follows these steps:
         1. export the graph from graph storage
         2. use the leiden algorithm to detect communities, get {node: community_id}
-        3. split large communities if max_size is given
+        3. split large communities if max_size (or max_tokens_per_community) is given
         4. convert {node: community_id} to List[Community]
         :param g
         :param max_size: maximum size of each community, if None or <=0, no limit
         :param use_lcc: whether to use the largest connected component only
         :param random_seed
+        :param max_workers: processes running Leiden on independent components, defaults to the CPU count
+        :param split_mode: how oversize communities are split
+            - chunk: cut the node list into max_size slices
+            - recursive: re-run Leiden on the induced subgraph until every piece fits
+              max_size and max_tokens_per_community
+        :param max_tokens_per_community: token budget of a community (pre-tokenized `length`
+            of its nodes and inner edges), only used by the recursive mode
         :param kwargs: other parameters for the leiden algorithm
         :return:
         """
-        nodes = await g.get_all_nodes()  # List[Tuple[str, dict]]
-        edges = await g.get_all_edges()  # List[Tuple[str, str, dict]]
+        snapshot = await g.get_snapshot()
 
         node2cid: Dict[str, int] = await self._run_leiden(
-            nodes, edges, use_lcc, random_seed
+            snapshot, use_lcc, random_seed, max_workers
         )
 
-        if max_size is not None and max_size > 0:
-            node2cid = await self._split_communities(node2cid, max_size)
+        # splitting is CPU-bound, keep it off the event loop
+        loop = asyncio.get_running_loop()
+        if split_mode == "recursive":
+            node2cid = await loop.run_in_executor(
+                None,
+                self._split_recursive,
+                snapshot,
+                node2cid,
+                max_size,
+                max_tokens_per_community,
+                random_seed,
+            )
+        elif split_mode != "chunk":
+            raise ValueError(f"Invalid split mode: {split_mode}")
+        elif max_size is not None and max_size > 0:
+            node2cid = await loop.run_in_executor(
+                None, self._split_communities, node2cid, max_size
+            )
+
+        return self._build_communities(snapshot, node2cid)
 
+    @staticmethod
+    def _build_communities(
+        snapshot: GraphSnapshot, node2cid: Dict[str, int]
+    ) -> List[Community]:
+        """
+        Group nodes by community and assign every edge to the community of its endpoints,
+        in a single pass over the edges.
+        """
         cid2nodes: Dict[int, List[str]] = defaultdict(list)
+        cids = np.full(snapshot.num_nodes, -1, dtype=np.int64)
         for n, cid in node2cid.items():
             cid2nodes[cid].append(n)
+            cids[snapshot.node_index[n]] = cid
 
-        communities: List[Community] = []
-        for cid, nodes in cid2nodes.items():
-            node_set: Set[str] = set(nodes)
-            comm_edges: List[Tuple[str, str]] = [
-                (u, v) for u, v, _ in edges if u in node_set and v in node_set
-            ]
-            communities.append(Community(id=cid, nodes=nodes, edges=comm_edges))
-        return communities
+        src_cid = cids[snapshot.edge_src]
+        inner = np.flatnonzero((src_cid >= 0) & (src_cid == cids[snapshot.edge_tgt]))
+        cid2edges: Dict[int, List[Tuple[str, str]]] = defaultdict(list)
+        for e, cid in zip(inner.tolist(), src_cid[inner].tolist()):
+            cid2edges[cid].append(snapshot.edge_pair(e))
+
+        return [
+            Community(id=cid, nodes=nodes, edges=cid2edges[cid])
+            for cid, nodes in cid2nodes.items()
+        ]
 
     @staticmethod
     async def _run_leiden(
-        nodes: List[Tuple[str, dict]],
-        edges: List[Tuple[str, str, dict]],
+        snapshot: GraphSnapshot,
         use_lcc: bool = False,
         random_seed: int = 42,
+        max_workers: Optional[int] = None,
     ) -> Dict[str, int]:
-        # build igraph
-        ig_graph = ig.Graph.TupleList(((u, v) for u, v, _ in edges), directed=False)
+        edges = np.column_stack([snapshot.edge_src, snapshot.edge_tgt])
+        ig_graph = ig.Graph(n=snapshot.num_nodes, edges=edges.tolist())
+        membership = np.asarray(
+            ig_graph.connected_components().membership, dtype=np.int64
+        )
 
-        # remove isolated nodes
-        ig_graph.delete_vertices(ig_graph.vs.select(_degree_eq=0))
+        # isolated nodes are left out
+        comp_edges = np.bincount(
+            membership[snapshot.edge_src], minlength=membership.max(initial=-1) + 1
+        )
+        comp_ids = np.flatnonzero(comp_edges)
+        if use_lcc and len(comp_ids):
+            sizes = np.bincount(membership)
+            comp_ids = comp_ids[[np.argmax(sizes[comp_ids])]]
 
-        node2cid: Dict[str, int] = {}
-        if use_lcc:
-            lcc = ig_graph.components().giant()
-            partition = find_partition(lcc, ModularityVertexPartition, seed=random_seed)
-            for part_id, cluster in enumerate(partition):
-                for v in cluster:
-                    node2cid[lcc.vs[v]["name"]] = part_id
-        else:
-            offset = 0
-            for component in ig_graph.components():
-                subgraph = ig_graph.induced_subgraph(component)
-                partition = find_partition(
-                    subgraph, ModularityVertexPartition, seed=random_seed
+        # local vertex index inside each component, vertices keep the graph order
+        order = np.argsort(membership, kind="stable")
+        starts = np.searchsorted(membership[order], np.arange(len(comp_edges) + 1))
+        local = np.empty_like(order)
+        local[order] = np.arange(len(order)) - starts[membership[order]]
+
+        edge_order = np.argsort(membership[snapshot.edge_src], kind="stable")
+        edge_starts = np.concatenate([[0], np.cumsum(comp_edges)])
+        components = []
+        for c in comp_ids.tolist():
+            e = edge_order[edge_starts[c] : edge_starts[c + 1]]
+            components.append(
+                (
+                    int(starts[c + 1] - starts[c]),
+                    np.column_stack(
+                        [local[snapshot.edge_src[e]], local[snapshot.edge_tgt[e]]]
+                    ),
                 )
-                for part_id, cluster in enumerate(partition):
-                    for v in cluster:
-                        original_node = subgraph.vs[v]["name"]
-                        node2cid[original_node] = part_id + offset
-                offset += len(partition)
+            )
+
+        memberships = await LeidenPartitioner._run_components(
+            components, random_seed, max_workers
+        )
+
+        node2cid: Dict[str, int] = {}
+        offset = 0
+        for c, comp_membership in zip(comp_ids.tolist(), memberships):
+            vertices = order[starts[c] : starts[c + 1]].tolist()
+            for v, part_id in zip(vertices, comp_membership):
+                node2cid[snapshot.node_ids[v]] = part_id + offset
+            offset += max(comp_membership) + 1
         return node2cid
 
     @staticmethod
-    async def _split_communities(
-        node2cid: Dict[str, int], max_size: int
-    ) -> Dict[str, int]:
+    async def _run_components(
+        components: List[Tuple[int, np.ndarray]],
+        random_seed: int,
+        max_workers: Optional[int],
+    ) -> List[List[int]]:
+        """
+        Run Leiden on the components, in a process pool when the graph is large enough.
+        Small components are batched into one task so that the pool is not dominated by overhead.
+        """
+        tasks: List[List[Tuple[int, np.ndarray]]] = [[]]
+        task_edges = 0
+        for comp in components:
+            if task_edges >= _MIN_EDGES_PER_TASK:
+                tasks.append([])
+                task_edges = 0
+            tasks[-1].append(comp)
+            task_edges += len(comp[1])
+
+        max_workers = min(max_workers or os.cpu_count() or 1, len(tasks))
+        if max_workers <= 1:
+            return _leiden_components(components, random_seed)
+
+        loop = asyncio.get_running_loop()
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            results = await asyncio.gather(
+                *(
+                    loop.run_in_executor(pool, _leiden_components, task, random_seed)
+                    for task in tasks
+                )
+            )
+        return [membership for result in results for membership in result]
+
+    @staticmethod
+    def _split_communities(node2cid: Dict[str, int], max_size: int) -> Dict[str, int]:
         """
         Split communities larger than max_size into smaller sub-communities.
         """
@@ -116,3 +231,101 @@ class LeidenPartitioner(BasePartitioner):
                         new_mapping[n] = new_cid
                     new_cid += 1
         return new_mapping
+
+    @staticmethod
+    def _split_recursive(
+        snapshot: GraphSnapshot,
+        node2cid: Dict[str, int],
+        max_size: Optional[int],
+        max_tokens: Optional[int],
+        random_seed: int,
+    ) -> Dict[str, int]:
+        """
+        Split communities until each one has at most max_size nodes and max_tokens tokens.
+        An oversize community is re-partitioned with Leiden on its induced subgraph;
+        if Leiden keeps it whole, it is cut in two along a BFS order. The first half is connected,
+        the second one may not be: it is only split further (by Leiden, into its components
+        among others) while it is still oversize.
+        A single node is never split, even if it exceeds the token budget.
+        """
+        max_size = max_size if max_size and max_size > 0 else None
+        max_tokens = max_tokens if max_tokens and max_tokens > 0 else None
+        node_length = snapshot.node_length
+        edge_length = snapshot.edge_length
+        member = np.zeros(snapshot.num_nodes, dtype=bool)
+
+        cid2nodes: Dict[int, List[int]] = defaultdict(list)
+        for n, cid in node2cid.items():
+            cid2nodes[cid].append(snapshot.node_index[n])
+
+        new_mapping: Dict[str, int] = {}
+        new_cid = 0
+        stack = [np.asarray(nodes) for nodes in reversed(cid2nodes.values())]
+        while stack:
+            nodes = stack.pop()
+            member[nodes] = True
+            inner = np.unique(
+                np.concatenate(
+                    [snapshot.neighbors(n)[1] for n in nodes.tolist()] + [[]]
+                ).astype(np.int64)
+            )
+            inner = inner[
+                member[snapshot.edge_src[inner]] & member[snapshot.edge_tgt[inner]]
+            ]
+            member[nodes] = False
+
+            tokens = node_length[nodes].sum() + edge_length[inner].sum()
+            if len(nodes) == 1 or (
+                (max_size is None or len(nodes) <= max_size)
+                and (max_tokens is None or tokens <= max_tokens)
+            ):
+                for n in nodes.tolist():
+                    new_mapping[snapshot.node_ids[n]] = new_cid
+                new_cid += 1
+                continue
+
+            local = {n: i for i, n in enumerate(nodes.tolist())}
+            edges = [
+                (local[u], local[v])
+                for u, v in zip(
+                    snapshot.edge_src[inner].tolist(), snapshot.edge_tgt[inner].tolist()
+                )
+            ]
+            membership = np.asarray(
+                _leiden_components([(len(nodes), np.asarray(edges))], random_seed)[0]
+            )
+            if membership.max() == 0:
+                membership = LeidenPartitioner._bisect(len(nodes), edges)
+            for part in reversed(range(membership.max() + 1)):
+                stack.append(nodes[membership == part])
+        return new_mapping
+
+    @staticmethod
+    def _bisect(n_vertices: int, edges: List[Tuple[int, int]]) -> np.ndarray:
+        """
+        Cut a graph in two halves of (about) the same number of vertices along a BFS order.
+        For a connected graph, the first half (a BFS prefix) is connected,
+        the second half is not guaranteed to be.
+        :return: membership (0 or 1) of every vertex
+        """
+        adj: List[List[int]] = [[] for _ in range(n_vertices)]
+        for u, v in edges:
+            adj[u].append(v)
+            adj[v].append(u)
+        order: List[int] = []
+        seen = bytearray(n_vertices)
+        for root in range(n_vertices):
+            if seen[root]:
+                continue
+            seen[root] = 1
+            queue = deque([root])
+            while queue:
+                u = queue.popleft()
+                order.append(u)
+                for v in adj[u]:
+                    if not seen[v]:
+                        seen[v] = 1
+                        queue.append(v)
+        membership = np.zeros(n_vertices, dtype=np.int64)
+        membership[order[n_vertices // 2 :]] = 1
+        return membership
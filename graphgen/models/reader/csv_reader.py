@@ -1,4 +1,4 @@
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterator, List
 
 import pandas as pd
 
@@ -7,11 +7,20 @@ from graphgen.bases.base_reader import BaseReader
 
 class CSVReader(BaseReader):
     def read(self, file_path: str) -> List[Dict[str, Any]]:
+        return [doc for batch in self.iter_read(file_path) for doc in batch]
 
-        df = pd.read_csv(file_path)
-        for _, row in df.iterrows():
-            if "type" in row and row["type"] == "text" and self.text_column not in row:
-                raise ValueError(
-                    f"Missing '{self.text_column}' in document: {row.to_dict()}"
-                )
-        return self.filter(df.to_dict(orient="records"))
+    def iter_read(
+        self, file_path: str, batch_size: int = 1000
+    ) -> Iterator[List[Dict[str, Any]]]:
+        with pd.read_csv(file_path, chunksize=batch_size) as reader:
+            for df in reader:
+                if (
+                    "type" in df.columns
+                    and self.text_column not in df.columns
+                    and (df["type"] == "text").any()
+                ):
+                    row = df[df["type"] == "text"].iloc[0]
+                    raise ValueError(
+                        f"Missing '{self.text_column}' in document: {row.to_dict()}"
+                    )
+                yield self.filter(df.to_dict(orient="records"))
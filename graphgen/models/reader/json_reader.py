@@ -1,18 +1,73 @@
 import json
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterator, List
 
 from graphgen.bases.base_reader import BaseReader
 
+# characters read from the file at a time while parsing the top-level array
+_READ_SIZE: int = 1 << 20
+
 
 class JSONReader(BaseReader):
     def read(self, file_path: str) -> List[Dict[str, Any]]:
+        return [doc for batch in self.iter_read(file_path) for doc in batch]
+
+    def iter_read(
+        self, file_path: str, batch_size: int = 1000
+    ) -> Iterator[List[Dict[str, Any]]]:
+        return self._filter_batches(self._iter_docs(file_path), batch_size)
+
+    def _iter_docs(self, file_path: str) -> Iterator[Dict[str, Any]]:
+        for doc in self._iter_array(file_path):
+            if doc.get("type") == "text" and self.text_column not in doc:
+                raise ValueError(f"Missing '{self.text_column}' in document: {doc}")
+            yield doc
+
+    @staticmethod
+    def _iter_array(file_path: str) -> Iterator[Any]:
+        """
+        Parse the elements of a top-level JSON array one by one,
+        only the element being parsed is kept in memory besides the read buffer.
+        """
+        decoder = json.JSONDecoder()
         with open(file_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            if isinstance(data, list):
-                for doc in data:
-                    if doc.get("type") == "text" and self.text_column not in doc:
-                        raise ValueError(
-                            f"Missing '{self.text_column}' in document: {doc}"
-                        )
-                return self.filter(data)
-            raise ValueError("JSON file must contain a list of documents.")
+            buffer, pos, eof = "", 0, False
+
+            def _next_char() -> str:
+                # skip whitespace, reading more of the file when the buffer runs out
+                nonlocal buffer, pos, eof
+                while True:
+                    while pos < len(buffer) and buffer[pos].isspace():
+                        pos += 1
+                    if pos < len(buffer) or eof:
+                        return buffer[pos] if pos < len(buffer) else ""
+                    buffer, pos = f.read(_READ_SIZE), 0
+                    eof = not buffer
+
+            if _next_char() != "[":
+                raise ValueError("JSON file must contain a list of documents.")
+            pos += 1
+            if _next_char() == "]":
+                return
+            while True:
+                while True:
+                    try:
+                        element, end = decoder.raw_decode(buffer, pos)
+                        break
+                    except json.JSONDecodeError:
+                        # the element may continue past the buffer
+                        if eof:
+                            raise
+                        more = f.read(_READ_SIZE)
+                        eof = not more
+                        buffer, pos = buffer[pos:] + more, 0
+                yield element
+                pos = end
+                char = _next_char()
+                if char == "]":
+                    return
+                if char != ",":
+                    raise ValueError(
+                        f"Expected ',' or ']' after a document in {file_path}"
+                    )
+                pos += 1
+                _next_char()
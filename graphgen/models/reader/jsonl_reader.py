@@ -1,5 +1,5 @@
 import json
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterator, List
 
 from graphgen.bases.base_reader import BaseReader
 from graphgen.utils import logger
@@ -7,7 +7,14 @@ from graphgen.utils import logger
 
 class JSONLReader(BaseReader):
     def read(self, file_path: str) -> List[Dict[str, Any]]:
-        docs = []
+        return [doc for batch in self.iter_read(file_path) for doc in batch]
+
+    def iter_read(
+        self, file_path: str, batch_size: int = 1000
+    ) -> Iterator[List[Dict[str, Any]]]:
+        return self._filter_batches(self._iter_docs(file_path), batch_size)
+
+    def _iter_docs(self, file_path: str) -> Iterator[Dict[str, Any]]:
         with open(file_path, "r", encoding="utf-8") as f:
             for line in f:
                 try:
@@ -16,7 +23,6 @@ class JSONLReader(BaseReader):
                         raise ValueError(
                             f"Missing '{self.text_column}' in document: {doc}"
                         )
-                    docs.append(doc)
+                    yield doc
                 except json.JSONDecodeError as e:
                     logger.error("Error decoding JSON line: %s. Error: %s", line, e)
-        return self.filter(docs)
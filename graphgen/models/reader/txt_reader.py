@@ -1,14 +1,20 @@
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterator, List
 
 from graphgen.bases.base_reader import BaseReader
 
 
 class TXTReader(BaseReader):
     def read(self, file_path: str) -> List[Dict[str, Any]]:
-        docs = []
+        return [doc for batch in self.iter_read(file_path) for doc in batch]
+
+    def iter_read(
+        self, file_path: str, batch_size: int = 1000
+    ) -> Iterator[List[Dict[str, Any]]]:
+        return self._filter_batches(self._iter_docs(file_path), batch_size)
+
+    def _iter_docs(self, file_path: str) -> Iterator[Dict[str, Any]]:
         with open(file_path, "r", encoding="utf-8") as f:
             for line in f:
                 line = line.strip()
                 if line:
-                    docs.append({self.text_column: line})
-        return self.filter(docs)
+                    yield {self.text_column: line}
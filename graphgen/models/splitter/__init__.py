@@ -2,3 +2,4 @@ from .recursive_character_splitter import (
     ChineseRecursiveTextSplitter,
     RecursiveCharacterSplitter,
 )
+from .token_splitter import TokenSplitter
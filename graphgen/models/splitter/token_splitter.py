@@ -0,0 +1,106 @@
+import re
+from bisect import bisect_right
+from typing import Any, List, Optional
+
+from graphgen.bases.base_splitter import BaseSplitter
+from graphgen.bases.base_tokenizer import BaseTokenizer
+
+
+class TokenSplitter(BaseSplitter):
+    """
+    Split text into chunks of at most chunk_size tokens, chunk_size and chunk_overlap are in tokens.
+    The text is encoded once: split points are token boundaries, chosen at the strongest
+    separator in the second half of every window thanks to the token offset mapping,
+    so chunks are neither re-split with regexes nor re-tokenized.
+    """
+
+    def __init__(
+        self,
+        tokenizer: BaseTokenizer,
+        separators: Optional[List[str]] = None,
+        min_chunk_ratio: float = 0.5,
+        **kwargs: Any,
+    ) -> None:
+        """
+        :param tokenizer
+        :param separators: regexes from the strongest to the weakest, a chunk ends after a match
+        :param min_chunk_ratio: a separator is only used if the chunk keeps at least this
+            share of chunk_size tokens, otherwise the weaker separators are tried
+        """
+        super().__init__(**kwargs)
+        if self.chunk_overlap >= self.chunk_size:
+            raise ValueError(
+                f"chunk_overlap ({self.chunk_overlap}) must be smaller than "
+                f"chunk_size ({self.chunk_size})"
+            )
+        self.tokenizer = tokenizer
+        self.min_chunk_ratio = min_chunk_ratio
+        self._separators = [
+            re.compile(separator)
+            for separator in separators
+            or ["\n\n", "\n", "[。！？]", r"[.!?]\s", r"[；;]\s?", r"[，,]\s?", r"\s"]
+        ]
+
+    def split_text(self, text: str) -> List[str]:
+        return [span["content"] for span in self.split_spans(text)]
+
+    def split_spans(self, text: str) -> List[dict]:
+        """
+        Split the text in one pass.
+        :return: per chunk, its content, its number of tokens and its character span
+            (start_index, end_index) in the text
+        """
+        _, starts = self.tokenizer.encode_with_offsets(text)
+        n_tokens = len(starts)
+        # token boundaries right after a separator, per separator
+        boundaries = [
+            sorted(
+                {
+                    b
+                    for b in (
+                        bisect_right(starts, match.end()) - 1
+                        for match in separator.finditer(text)
+                    )
+                    if b > 0
+                }
+            )
+            for separator in self._separators
+        ]
+
+        def _char(token_index: int) -> int:
+            return starts[token_index] if token_index < n_tokens else len(text)
+
+        min_tokens = max(
+            self.chunk_overlap + 1, int(self.chunk_size * self.min_chunk_ratio)
+        )
+        spans = []
+        start = 0
+        while start < n_tokens:
+            end = min(start + self.chunk_size, n_tokens)
+            if end < n_tokens:
+                for level in boundaries:
+                    i = bisect_right(level, end) - 1
+                    if i >= 0 and level[i] >= start + min_tokens:
+                        end = level[i]
+                        break
+
+            start_index, end_index = _char(start), _char(end)
+            content = text[start_index:end_index]
+            if self.strip_whitespace:
+                stripped = content.lstrip()
+                start_index += len(content) - len(stripped)
+                content = stripped.rstrip()
+                end_index = start_index + len(content)
+            if content:
+                spans.append(
+                    {
+                        "content": content,
+                        "tokens": end - start,
+                        "start_index": start_index,
+                        "end_index": end_index,
+                    }
+                )
+            if end >= n_tokens:
+                break
+            start = max(end - self.chunk_overlap, start + 1)
+        return spans
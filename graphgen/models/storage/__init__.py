@@ -1,2 +1,3 @@
 from .json_storage import JsonKVStorage, JsonListStorage
 from .networkx_storage import NetworkXStorage
+from .sqlite_storage import SQLiteGraphStorage, SQLiteKVStorage
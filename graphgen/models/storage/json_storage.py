@@ -4,16 +4,37 @@ from dataclasses import dataclass
 from graphgen.bases.base_storage import BaseKVStorage, BaseListStorage
 from graphgen.utils import load_json, logger, write_json
 
+from .wal import WriteAheadLog
+
 
 @dataclass
 class JsonKVStorage(BaseKVStorage):
     _data: dict[str, str] = None
+    # append upserts to <namespace>.wal instead of rewriting the whole JSON file on every commit
+    wal: bool = False
+    # rewrite the JSON snapshot once the log grows beyond this fraction of the snapshot size
+    wal_compact_ratio: float = 1.0
 
     def __post_init__(self):
         self._file_name = os.path.join(self.working_dir, f"{self.namespace}.json")
         self._data = load_json(self._file_name) or {}
+        self._wal = None
+        if self.wal:
+            self._wal = WriteAheadLog(
+                os.path.join(self.working_dir, f"{self.namespace}.wal")
+            )
+            for op, *args in self._wal.replay():
+                self._apply(op, *args)
         logger.info("Load KV %s with %d data", self.namespace, len(self._data))
 
+    def _apply(self, op: str, *args):
+        if op == "upsert":
+            self._data.update(args[0])
+        elif op == "drop":
+            self._data = {}
+        else:
+            raise ValueError(f"Unknown WAL operation: {op}")
+
     @property
     def data(self):
         return self._data
@@ -22,7 +43,21 @@ class JsonKVStorage(BaseKVStorage):
         return list(self._data.keys())
 
     async def index_done_callback(self):
+        if self._wal is None:
+            write_json(self._data, self._file_name)
+            return
+        self._wal.flush()
+        snapshot_size = (
+            os.path.getsize(self._file_name) if os.path.exists(self._file_name) else 0
+        )
+        if self._wal.size > self.wal_compact_ratio * snapshot_size:
+            self.compact()
+
+    def compact(self):
+        """Write a full snapshot and drop the log."""
         write_json(self._data, self._file_name)
+        if self._wal is not None:
+            self._wal.reset()
 
     async def get_by_id(self, id):
         return self._data.get(id, None)
@@ -45,10 +80,14 @@ class JsonKVStorage(BaseKVStorage):
     async def upsert(self, data: dict):
         left_data = {k: v for k, v in data.items() if k not in self._data}
         self._data.update(left_data)
+        if self._wal is not None and left_data:
+            self._wal.append("upsert", left_data)
         return left_data
 
     async def drop(self):
         self._data = {}
+        if self._wal is not None:
+            self._wal.append("drop")
 
 
 @dataclass
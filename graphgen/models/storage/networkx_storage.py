@@ -1,21 +1,69 @@
 import html
 import os
 from dataclasses import dataclass
-from typing import Any, Optional, Union, cast
+from typing import Any, Dict, List, Optional, Union, cast
 
+import msgpack
 import networkx as nx
 
 from graphgen.bases.base_storage import BaseGraphStorage
+from graphgen.bases.graph_snapshot import GraphSnapshot
 from graphgen.utils import logger
 
+from .wal import WriteAheadLog
+
+# bump when the layout of the msgpack graph file changes
+_MSGPACK_FORMAT_VERSION: int = 1
+
+
+def _encode_columns(records: List[dict], strings: Dict[str, int]) -> Dict[str, list]:
+    """
+    Turn a list of attribute dicts into columns.
+    Columns whose values are all strings are stored as indices into the shared string table.
+    """
+    keys = {k for r in records for k in r}
+    columns = {}
+    for key in sorted(keys):
+        values = [r.get(key) for r in records]
+        if all(v is None or isinstance(v, str) for v in values):
+            columns[key] = [
+                "s",
+                [
+                    None if v is None else strings.setdefault(v, len(strings))
+                    for v in values
+                ],
+            ]
+        else:
+            columns[key] = ["v", values]
+    return columns
+
+
+def _decode_columns(columns: Dict[str, list], n: int, strings: List[str]) -> List[dict]:
+    records: List[dict] = [{} for _ in range(n)]
+    for key, (kind, values) in columns.items():
+        for record, value in zip(records, values):
+            if value is None:
+                continue
+            record[key] = strings[value] if kind == "s" else value
+    return records
+
 
 @dataclass
 class NetworkXStorage(BaseGraphStorage):
+    # "msgpack" (columnar, string-interned) or "graphml"
+    graph_format: str = "msgpack"
+    # append mutations to <namespace>.wal instead of rewriting the whole graph on every commit
+    wal: bool = False
+    # rewrite the snapshot once the log grows beyond this fraction of the snapshot size
+    wal_compact_ratio: float = 1.0
+
     @staticmethod
     def load_nx_graph(file_name) -> Optional[nx.Graph]:
-        if os.path.exists(file_name):
+        if not os.path.exists(file_name):
+            return None
+        if file_name.endswith(".graphml"):
             return nx.read_graphml(file_name)
-        return None
+        return NetworkXStorage._read_msgpack_graph(file_name)
 
     @staticmethod
     def write_nx_graph(graph: nx.Graph, file_name):
@@ -24,7 +72,66 @@ class NetworkXStorage(BaseGraphStorage):
             graph.number_of_nodes(),
             graph.number_of_edges(),
         )
-        nx.write_graphml(graph, file_name)
+        # write to a temporary file first so a crash never leaves a truncated graph behind
+        tmp_file = f"{file_name}.tmp"
+        if file_name.endswith(".graphml"):
+            nx.write_graphml(graph, tmp_file)
+        else:
+            NetworkXStorage._write_msgpack_graph(graph, tmp_file)
+        os.replace(tmp_file, file_name)
+
+    @staticmethod
+    def _write_msgpack_graph(graph: nx.Graph, file_name):
+        strings: Dict[str, int] = {}
+        node_ids, node_attrs = [], []
+        for node_id, data in graph.nodes(data=True):
+            node_ids.append(strings.setdefault(node_id, len(strings)))
+            node_attrs.append(data)
+        src, tgt, edge_attrs = [], [], []
+        for u, v, data in graph.edges(data=True):
+            src.append(strings.setdefault(u, len(strings)))
+            tgt.append(strings.setdefault(v, len(strings)))
+            edge_attrs.append(data)
+        payload = {
+            "version": _MSGPACK_FORMAT_VERSION,
+            "directed": graph.is_directed(),
+            "nodes": node_ids,
+            "node_attrs": _encode_columns(node_attrs, strings),
+            "src": src,
+            "tgt": tgt,
+            "edge_attrs": _encode_columns(edge_attrs, strings),
+            "graph_attrs": dict(graph.graph),
+        }
+        # the string table is filled while encoding, so it goes last
+        payload["strings"] = list(strings)
+        with open(file_name, "wb") as f:
+            msgpack.pack(payload, f, use_bin_type=True)
+
+    @staticmethod
+    def _read_msgpack_graph(file_name) -> nx.Graph:
+        with open(file_name, "rb") as f:
+            payload = msgpack.unpack(f, raw=False, strict_map_key=False)
+        if payload.get("version") != _MSGPACK_FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported graph file version {payload.get('version')} in {file_name}"
+            )
+        strings = payload["strings"]
+        graph = nx.DiGraph() if payload["directed"] else nx.Graph()
+        graph.graph.update(payload.get("graph_attrs", {}))
+        node_attrs = _decode_columns(
+            payload["node_attrs"], len(payload["nodes"]), strings
+        )
+        graph.add_nodes_from(
+            (strings[i], attrs) for i, attrs in zip(payload["nodes"], node_attrs)
+        )
+        edge_attrs = _decode_columns(
+            payload["edge_attrs"], len(payload["src"]), strings
+        )
+        graph.add_edges_from(
+            (strings[u], strings[v], attrs)
+            for u, v, attrs in zip(payload["src"], payload["tgt"], edge_attrs)
+        )
+        return graph
 
     @staticmethod
     def stable_largest_connected_component(graph: nx.Graph) -> nx.Graph:
@@ -76,22 +183,106 @@ class NetworkXStorage(BaseGraphStorage):
     def __post_init__(self):
         """
         如果图文件存在，则加载图文件，否则创建一个新图
+        An existing file in the other format is loaded as well and rewritten on the next commit.
         """
+        if self.graph_format not in ("msgpack", "graphml"):
+            raise ValueError(f"Unsupported graph format: {self.graph_format}")
         self._graphml_xml_file = os.path.join(
             self.working_dir, f"{self.namespace}.graphml"
         )
-        preloaded_graph = NetworkXStorage.load_nx_graph(self._graphml_xml_file)
-        if preloaded_graph is not None:
-            logger.info(
-                "Loaded graph from %s with %d nodes, %d edges",
-                self._graphml_xml_file,
-                preloaded_graph.number_of_nodes(),
-                preloaded_graph.number_of_edges(),
-            )
+        self._msgpack_file = os.path.join(self.working_dir, f"{self.namespace}.msgpack")
+        self._graph_file = (
+            self._msgpack_file
+            if self.graph_format == "msgpack"
+            else self._graphml_xml_file
+        )
+
+        preloaded_graph = None
+        for file_name in dict.fromkeys(
+            [self._graph_file, self._msgpack_file, self._graphml_xml_file]
+        ):
+            preloaded_graph = NetworkXStorage.load_nx_graph(file_name)
+            if preloaded_graph is not None:
+                logger.info(
+                    "Loaded graph from %s with %d nodes, %d edges",
+                    file_name,
+                    preloaded_graph.number_of_nodes(),
+                    preloaded_graph.number_of_edges(),
+                )
+                break
         self._graph = preloaded_graph or nx.Graph()
+        self._snapshot: Optional[GraphSnapshot] = None
+
+        self._wal = None
+        if self.wal:
+            wal = WriteAheadLog(os.path.join(self.working_dir, f"{self.namespace}.wal"))
+            n_records = 0
+            # records up to the one the snapshot was compacted at are already in it
+            for op, *args in wal.replay(after=self._graph.graph.get("wal_seq", 0)):
+                self._apply(op, *args)
+                n_records += 1
+            if n_records:
+                logger.info(
+                    "Replayed %d WAL records, graph has %d nodes, %d edges",
+                    n_records,
+                    self._graph.number_of_nodes(),
+                    self._graph.number_of_edges(),
+                )
+            # attach the log only after the replay, so replayed records are not logged twice
+            self._wal = wal
+
+    def _apply(self, op: str, *args):
+        """Apply a mutation to the in-memory graph and record it in the WAL if enabled."""
+        if op == "upsert_node":
+            self._graph.add_node(args[0], **args[1])
+        elif op == "update_node":
+            self._graph.nodes[args[0]].update(args[1])
+        elif op == "upsert_edge":
+            self._graph.add_edge(args[0], args[1], **args[2])
+        elif op == "update_edge":
+            self._graph.edges[(args[0], args[1])].update(args[2])
+        elif op == "delete_node":
+            self._graph.remove_node(args[0])
+        elif op == "clear":
+            self._graph.clear()
+        else:
+            raise ValueError(f"Unknown WAL operation: {op}")
+        self._snapshot = None
+        if self._wal is not None:
+            self._wal.append(op, *args)
 
     async def index_done_callback(self):
-        NetworkXStorage.write_nx_graph(self._graph, self._graphml_xml_file)
+        if self._wal is None:
+            NetworkXStorage.write_nx_graph(self._graph, self._graph_file)
+            return
+        self._wal.flush()
+        snapshot_size = (
+            os.path.getsize(self._graph_file) if os.path.exists(self._graph_file) else 0
+        )
+        if self._wal.size > self.wal_compact_ratio * snapshot_size:
+            self.compact()
+
+    def compact(self):
+        """
+        Write a full snapshot and drop the log.
+        The snapshot records the last sequence number it contains, so a crash before
+        the log is dropped does not replay the same records on top of it.
+        """
+        if self._wal is not None:
+            self._graph.graph["wal_seq"] = self._wal.seq
+        NetworkXStorage.write_nx_graph(self._graph, self._graph_file)
+        if self._wal is not None:
+            self._wal.reset()
+
+    def export_graphml(self, file_name: Optional[str] = None) -> str:
+        """
+        Export the graph as GraphML, e.g. for visualization tools.
+        :param file_name: output path, defaults to <working_dir>/<namespace>.graphml
+        :return: the path written
+        """
+        file_name = file_name or self._graphml_xml_file
+        NetworkXStorage.write_nx_graph(self._graph, file_name)
+        return file_name
 
     async def has_node(self, node_id: str) -> bool:
         return self._graph.has_node(node_id)
@@ -119,6 +310,12 @@ class NetworkXStorage(BaseGraphStorage):
     async def get_all_edges(self) -> Union[list[tuple[str, str, dict]], None]:
         return list(self._graph.edges(data=True))
 
+    async def count_nodes(self) -> int:
+        return self._graph.number_of_nodes()
+
+    async def count_edges(self) -> int:
+        return self._graph.number_of_edges()
+
     async def get_node_edges(
         self, source_node_id: str
     ) -> Union[list[tuple[str, str]], None]:
@@ -126,28 +323,45 @@ class NetworkXStorage(BaseGraphStorage):
             return list(self._graph.edges(source_node_id, data=True))
         return None
 
+    async def get_nodes(self, node_ids: list[str]) -> list[Union[dict, None]]:
+        nodes = self._graph.nodes
+        return [nodes.get(node_id) for node_id in node_ids]
+
+    async def get_edges(
+        self, edge_ids: list[tuple[str, str]]
+    ) -> list[Union[dict, None]]:
+        edges = self._graph.edges
+        return [edges.get(edge_id) for edge_id in edge_ids]
+
+    async def get_snapshot(self) -> GraphSnapshot:
+        if self._snapshot is None:
+            self._snapshot = GraphSnapshot.from_lists(
+                list(self._graph.nodes(data=True)), list(self._graph.edges(data=True))
+            )
+        return self._snapshot
+
     async def get_graph(self) -> nx.Graph:
         return self._graph
 
     async def upsert_node(self, node_id: str, node_data: dict[str, str]):
-        self._graph.add_node(node_id, **node_data)
+        self._apply("upsert_node", node_id, node_data)
 
     async def update_node(self, node_id: str, node_data: dict[str, str]):
         if self._graph.has_node(node_id):
-            self._graph.nodes[node_id].update(node_data)
+            self._apply("update_node", node_id, node_data)
         else:
             logger.warning("Node %s not found in the graph for update.", node_id)
 
     async def upsert_edge(
         self, source_node_id: str, target_node_id: str, edge_data: dict[str, str]
     ):
-        self._graph.add_edge(source_node_id, target_node_id, **edge_data)
+        self._apply("upsert_edge", source_node_id, target_node_id, edge_data)
 
     async def update_edge(
         self, source_node_id: str, target_node_id: str, edge_data: dict[str, str]
     ):
         if self._graph.has_edge(source_node_id, target_node_id):
-            self._graph.edges[(source_node_id, target_node_id)].update(edge_data)
+            self._apply("update_edge", source_node_id, target_node_id, edge_data)
         else:
             logger.warning(
                 "Edge %s -> %s not found in the graph for update.",
@@ -155,6 +369,34 @@ class NetworkXStorage(BaseGraphStorage):
                 target_node_id,
             )
 
+    async def upsert_nodes(self, nodes: dict[str, dict]):
+        for node_id, node_data in nodes.items():
+            self._apply("upsert_node", node_id, node_data)
+
+    async def upsert_edges(self, edges: dict[tuple[str, str], dict]):
+        for (src, tgt), edge_data in edges.items():
+            self._apply("upsert_edge", src, tgt, edge_data)
+
+    async def update_nodes_batch(self, nodes: dict[str, dict]):
+        missing = 0
+        for node_id, node_data in nodes.items():
+            if self._graph.has_node(node_id):
+                self._apply("update_node", node_id, node_data)
+            else:
+                missing += 1
+        if missing:
+            logger.warning("%d nodes not found in the graph for update.", missing)
+
+    async def update_edges_batch(self, edges: dict[tuple[str, str], dict]):
+        missing = 0
+        for (src, tgt), edge_data in edges.items():
+            if self._graph.has_edge(src, tgt):
+                self._apply("update_edge", src, tgt, edge_data)
+            else:
+                missing += 1
+        if missing:
+            logger.warning("%d edges not found in the graph for update.", missing)
+
     async def delete_node(self, node_id: str):
         """
         Delete a node from the graph based on the specified node_id.
@@ -162,7 +404,7 @@ class NetworkXStorage(BaseGraphStorage):
         :param node_id: The node_id to delete
         """
         if self._graph.has_node(node_id):
-            self._graph.remove_node(node_id)
+            self._apply("delete_node", node_id)
             logger.info("Node %s deleted from the graph.", node_id)
         else:
             logger.warning("Node %s not found in the graph for deletion.", node_id)
@@ -171,5 +413,5 @@ class NetworkXStorage(BaseGraphStorage):
         """
         Clear the graph by removing all nodes and edges.
         """
-        self._graph.clear()
+        self._apply("clear")
         logger.info("Graph %s cleared.", self.namespace)
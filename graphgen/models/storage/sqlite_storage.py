@@ -0,0 +1,507 @@
+import json
+import os
+import sqlite3
+from dataclasses import dataclass
+from typing import AsyncIterator, Iterable, Iterator, List, Optional, Union
+
+import numpy as np
+
+from graphgen.bases.base_storage import BaseGraphStorage, BaseKVStorage
+from graphgen.bases.graph_snapshot import GraphSnapshot
+from graphgen.utils import logger
+
+# stay below SQLITE_MAX_VARIABLE_NUMBER of older SQLite builds
+_MAX_SQL_VARIABLES: int = 900
+# rows fetched at a time when a whole table is scanned
+_FETCH_SIZE: int = 10000
+
+
+def _batched(items: List, size: int) -> Iterator[List]:
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def _connect(file_name: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(file_name, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def _json_path(field: str) -> str:
+    return '$."' + field.replace('"', '\\"') + '"'
+
+
+def _merged(old: Optional[dict], new: dict) -> dict:
+    """
+    Merge like dict.update in networkx: top-level keys are replaced as a whole
+    and None values are stored, unlike json_patch which drops them and merges nested objects.
+    """
+    merged = dict(old or {})
+    merged.update(new)
+    return merged
+
+
+def _dumps(data: dict) -> str:
+    return json.dumps(data, ensure_ascii=False)
+
+
+def _fill_units(
+    length: np.ndarray, loss: np.ndarray, start: int, rows: List[tuple]
+) -> None:
+    """Copy the (length, loss) columns leading each row from start on, NULL keeps the default."""
+    for i, (row_length, row_loss, *_) in enumerate(rows, start):
+        if row_length is not None:
+            length[i] = row_length
+        if row_loss is not None:
+            loss[i] = row_loss
+
+
+@dataclass
+class SQLiteKVStorage(BaseKVStorage):
+    """
+    KV storage kept in <namespace>.db instead of memory, values are stored as JSON text.
+    Memory usage does not grow with the number of stored items.
+    """
+
+    def __post_init__(self):
+        os.makedirs(self.working_dir, exist_ok=True)
+        self._file_name = os.path.join(self.working_dir, f"{self.namespace}.db")
+        self._conn = _connect(self._file_name)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+        )
+        self._conn.commit()
+        count = self._conn.execute("SELECT COUNT(*) FROM kv").fetchone()[0]
+        logger.info("Load KV %s with %d data", self.namespace, count)
+
+    async def all_keys(self) -> list[str]:
+        return [row[0] for row in self._conn.execute("SELECT key FROM kv")]
+
+    async def index_done_callback(self):
+        self._conn.commit()
+
+    async def get_by_id(self, id):
+        row = self._conn.execute("SELECT value FROM kv WHERE key = ?", (id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    async def get_by_ids(self, ids, fields=None) -> list:
+        ids = list(ids)
+        if fields is None:
+            found = {}
+            for batch in _batched(ids, _MAX_SQL_VARIABLES):
+                rows = self._conn.execute(
+                    f"SELECT key, value FROM kv WHERE key IN ({','.join('?' * len(batch))})",
+                    batch,
+                )
+                found.update((k, json.loads(v)) for k, v in rows)
+            return [found.get(id) for id in ids]
+
+        # push the projection into SQL, so only the requested fields are decoded
+        fields = sorted(fields)
+        columns = ", ".join(
+            "json_type(value, ?), json_extract(value, ?)" for _ in fields
+        )
+        paths = [p for f in fields for p in (_json_path(f),) * 2]
+        found = {}
+        for batch in _batched(ids, _MAX_SQL_VARIABLES - len(paths)):
+            rows = self._conn.execute(
+                f"SELECT key, {columns} FROM kv "
+                f"WHERE key IN ({','.join('?' * len(batch))})",
+                paths + batch,
+            )
+            for key, *values in rows:
+                item = {}
+                for field, json_type, value in zip(fields, values[0::2], values[1::2]):
+                    if json_type is None:
+                        continue
+                    if json_type in ("object", "array"):
+                        value = json.loads(value)
+                    elif json_type in ("true", "false"):
+                        value = json_type == "true"
+                    item[field] = value
+                found[key] = item
+        return [found.get(id) for id in ids]
+
+    async def filter_keys(self, data: list[str]) -> set[str]:
+        data = list(data)
+        existing = set()
+        for batch in _batched(data, _MAX_SQL_VARIABLES):
+            rows = self._conn.execute(
+                f"SELECT key FROM kv WHERE key IN ({','.join('?' * len(batch))})",
+                batch,
+            )
+            existing.update(row[0] for row in rows)
+        return {s for s in data if s not in existing}
+
+    async def upsert(self, data: dict):
+        new_keys = await self.filter_keys(list(data.keys()))
+        left_data = {k: v for k, v in data.items() if k in new_keys}
+        self._insert(left_data.items())
+        return left_data
+
+    def _insert(self, items: Iterable):
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO kv (key, value) VALUES (?, ?)",
+                ((k, json.dumps(v, ensure_ascii=False)) for k, v in items),
+            )
+
+    async def drop(self):
+        with self._conn:
+            self._conn.execute("DELETE FROM kv")
+
+
+@dataclass
+class SQLiteGraphStorage(BaseGraphStorage):
+    """
+    Undirected graph kept in <namespace>.db instead of memory.
+    Nodes and edges are rows with JSON attributes, adjacency is served by indexes on both endpoints,
+    so graphs larger than RAM can be built and queried.
+    Like networkx, upserts and updates replace the given top-level attributes and keep the others
+    (merged in Python, so None values are stored), and upserting an edge creates its missing endpoints.
+    """
+
+    def __post_init__(self):
+        os.makedirs(self.working_dir, exist_ok=True)
+        self._file_name = os.path.join(self.working_dir, f"{self.namespace}.db")
+        self._conn = _connect(self._file_name)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS nodes (id TEXT PRIMARY KEY, data TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS edges (src TEXT NOT NULL, tgt TEXT NOT NULL, data TEXT NOT NULL);
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_edges_pair ON edges(min(src, tgt), max(src, tgt));
+            CREATE INDEX IF NOT EXISTS idx_edges_src ON edges(src);
+            CREATE INDEX IF NOT EXISTS idx_edges_tgt ON edges(tgt);
+            """)
+        self._conn.commit()
+        self._snapshot: Optional[GraphSnapshot] = None
+        n_nodes = self._conn.execute("SELECT COUNT(*) FROM nodes").fetchone()[0]
+        n_edges = self._conn.execute("SELECT COUNT(*) FROM edges").fetchone()[0]
+        logger.info(
+            "Load graph %s with %d nodes, %d edges", self._file_name, n_nodes, n_edges
+        )
+
+    async def index_done_callback(self):
+        self._conn.commit()
+
+    async def has_node(self, node_id: str) -> bool:
+        row = self._conn.execute(
+            "SELECT 1 FROM nodes WHERE id = ?", (node_id,)
+        ).fetchone()
+        return row is not None
+
+    async def has_edge(self, source_node_id: str, target_node_id: str) -> bool:
+        return self._edge_row(source_node_id, target_node_id) is not None
+
+    async def get_node(self, node_id: str) -> Union[dict, None]:
+        row = self._conn.execute(
+            "SELECT data FROM nodes WHERE id = ?", (node_id,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    async def get_all_nodes(self) -> Union[list[tuple[str, dict]], None]:
+        return [
+            (node_id, json.loads(data))
+            for node_id, data in self._conn.execute(
+                "SELECT id, data FROM nodes ORDER BY rowid"
+            )
+        ]
+
+    async def count_nodes(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM nodes").fetchone()[0]
+
+    async def count_edges(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM edges").fetchone()[0]
+
+    async def iter_nodes(
+        self, batch_size: int = 1000
+    ) -> AsyncIterator[tuple[str, dict]]:
+        # one query per batch, keyed on rowid, so writes between batches are safe
+        last = 0
+        while rows := self._conn.execute(
+            "SELECT rowid, id, data FROM nodes WHERE rowid > ? ORDER BY rowid LIMIT ?",
+            (last, batch_size),
+        ).fetchall():
+            last = rows[-1][0]
+            for _, node_id, data in rows:
+                yield node_id, json.loads(data)
+
+    async def iter_edges(
+        self, batch_size: int = 1000
+    ) -> AsyncIterator[tuple[str, str, dict]]:
+        last = 0
+        while rows := self._conn.execute(
+            "SELECT rowid, src, tgt, data FROM edges WHERE rowid > ? "
+            "ORDER BY rowid LIMIT ?",
+            (last, batch_size),
+        ).fetchall():
+            last = rows[-1][0]
+            for _, src, tgt, data in rows:
+                yield src, tgt, json.loads(data)
+
+    async def node_degree(self, node_id: str) -> int:
+        # a self loop counts twice, as in networkx
+        return self._conn.execute(
+            "SELECT (SELECT COUNT(*) FROM edges WHERE src = ?) "
+            "+ (SELECT COUNT(*) FROM edges WHERE tgt = ?)",
+            (node_id, node_id),
+        ).fetchone()[0]
+
+    async def edge_degree(self, src_id: str, tgt_id: str) -> int:
+        return await self.node_degree(src_id) + await self.node_degree(tgt_id)
+
+    def _edge_row(self, source_node_id: str, target_node_id: str):
+        lo, hi = sorted((source_node_id, target_node_id))
+        return self._conn.execute(
+            "SELECT data FROM edges WHERE min(src, tgt) = ? AND max(src, tgt) = ?",
+            (lo, hi),
+        ).fetchone()
+
+    async def get_edge(
+        self, source_node_id: str, target_node_id: str
+    ) -> Union[dict, None]:
+        row = self._edge_row(source_node_id, target_node_id)
+        return json.loads(row[0]) if row else None
+
+    async def get_all_edges(self) -> Union[list[tuple[str, str, dict]], None]:
+        return [
+            (src, tgt, json.loads(data))
+            for src, tgt, data in self._conn.execute(
+                "SELECT src, tgt, data FROM edges ORDER BY rowid"
+            )
+        ]
+
+    async def get_node_edges(
+        self, source_node_id: str
+    ) -> Union[list[tuple[str, str]], None]:
+        if not await self.has_node(source_node_id):
+            return None
+        rows = self._conn.execute(
+            "SELECT tgt, data FROM edges WHERE src = ? "
+            "UNION ALL SELECT src, data FROM edges WHERE tgt = ? AND src != tgt",
+            (source_node_id, source_node_id),
+        )
+        return [(source_node_id, other, json.loads(data)) for other, data in rows]
+
+    def _node_rows(self, node_ids: List[str]) -> dict[str, dict]:
+        """Stored attributes of the nodes among node_ids that exist."""
+        found = {}
+        for batch in _batched(node_ids, _MAX_SQL_VARIABLES):
+            rows = self._conn.execute(
+                f"SELECT id, data FROM nodes WHERE id IN ({','.join('?' * len(batch))})",
+                batch,
+            )
+            found.update((node_id, json.loads(data)) for node_id, data in rows)
+        return found
+
+    def _edge_rows(self, keys: List[tuple[str, str]]) -> dict[tuple[str, str], dict]:
+        """Stored attributes of the edges among keys (sorted pairs) that exist."""
+        found = {}
+        # join against the requested pairs, so the lookup goes through the pair index
+        for batch in _batched(keys, _MAX_SQL_VARIABLES // 2):
+            rows = self._conn.execute(
+                f"WITH q(lo, hi) AS (VALUES {','.join(['(?, ?)'] * len(batch))}) "
+                "SELECT q.lo, q.hi, edges.data FROM q JOIN edges "
+                "ON min(edges.src, edges.tgt) = q.lo AND max(edges.src, edges.tgt) = q.hi",
+                [v for key in batch for v in key],
+            )
+            found.update(((lo, hi), json.loads(data)) for lo, hi, data in rows)
+        return found
+
+    def _merged_edges(
+        self, edges: dict[tuple[str, str], dict], existing_only: bool
+    ) -> dict[tuple[str, str], tuple[str, str, dict]]:
+        """
+        Merge the new attributes into the stored ones, per sorted pair.
+        Both orientations of a pair are merged into the same edge, in order.
+        """
+        existing = self._edge_rows(list({tuple(sorted(e)) for e in edges}))
+        merged = {}
+        for (src, tgt), edge_data in edges.items():
+            key = tuple(sorted((src, tgt)))
+            if key not in merged:
+                if existing_only and key not in existing:
+                    continue
+                merged[key] = (src, tgt, dict(existing.get(key) or {}))
+            merged[key][2].update(edge_data)
+        return merged
+
+    async def upsert_node(self, node_id: str, node_data: dict[str, str]):
+        await self.upsert_nodes({node_id: node_data})
+
+    async def update_node(self, node_id: str, node_data: dict[str, str]):
+        self._snapshot = None
+        old = self._node_rows([node_id]).get(node_id)
+        if old is None:
+            logger.warning("Node %s not found in the graph for update.", node_id)
+            return
+        self._conn.execute(
+            "UPDATE nodes SET data = ? WHERE id = ?",
+            (_dumps(_merged(old, node_data)), node_id),
+        )
+
+    async def upsert_edge(
+        self, source_node_id: str, target_node_id: str, edge_data: dict[str, str]
+    ):
+        await self.upsert_edges({(source_node_id, target_node_id): edge_data})
+
+    async def update_edge(
+        self, source_node_id: str, target_node_id: str, edge_data: dict[str, str]
+    ):
+        self._snapshot = None
+        merged = self._merged_edges(
+            {(source_node_id, target_node_id): edge_data}, existing_only=True
+        )
+        if not merged:
+            logger.warning(
+                "Edge %s -> %s not found in the graph for update.",
+                source_node_id,
+                target_node_id,
+            )
+            return
+        self._update_edge_rows(merged)
+
+    async def get_nodes(self, node_ids: list[str]) -> list[Union[dict, None]]:
+        node_ids = list(node_ids)
+        found = self._node_rows(node_ids)
+        return [found.get(node_id) for node_id in node_ids]
+
+    async def get_edges(
+        self, edge_ids: list[tuple[str, str]]
+    ) -> list[Union[dict, None]]:
+        keys = [tuple(sorted(edge_id)) for edge_id in edge_ids]
+        found = self._edge_rows(keys)
+        return [found.get(key) for key in keys]
+
+    async def upsert_nodes(self, nodes: dict[str, dict]):
+        self._snapshot = None
+        existing = self._node_rows(list(nodes))
+        self._conn.executemany(
+            "INSERT INTO nodes (id, data) VALUES (?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET data = excluded.data",
+            (
+                (node_id, _dumps(_merged(existing.get(node_id), node_data)))
+                for node_id, node_data in nodes.items()
+            ),
+        )
+
+    async def upsert_edges(self, edges: dict[tuple[str, str], dict]):
+        self._snapshot = None
+        merged = self._merged_edges(edges, existing_only=False)
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO nodes (id, data) VALUES (?, '{}')",
+            ((node_id,) for edge_id in edges for node_id in edge_id),
+        )
+        self._conn.executemany(
+            "INSERT INTO edges (src, tgt, data) VALUES (?, ?, ?) "
+            "ON CONFLICT(min(src, tgt), max(src, tgt)) DO UPDATE SET data = excluded.data",
+            ((src, tgt, _dumps(edge_data)) for src, tgt, edge_data in merged.values()),
+        )
+
+    async def update_nodes_batch(self, nodes: dict[str, dict]):
+        self._snapshot = None
+        existing = self._node_rows(list(nodes))
+        self._conn.executemany(
+            "UPDATE nodes SET data = ? WHERE id = ?",
+            (
+                (_dumps(_merged(existing[node_id], node_data)), node_id)
+                for node_id, node_data in nodes.items()
+                if node_id in existing
+            ),
+        )
+        if len(existing) < len(nodes):
+            logger.warning(
+                "%d nodes not found in the graph for update.",
+                len(nodes) - len(existing),
+            )
+
+    async def update_edges_batch(self, edges: dict[tuple[str, str], dict]):
+        self._snapshot = None
+        merged = self._merged_edges(edges, existing_only=True)
+        self._update_edge_rows(merged)
+        missing = sum(1 for edge_id in edges if tuple(sorted(edge_id)) not in merged)
+        if missing:
+            logger.warning("%d edges not found in the graph for update.", missing)
+
+    def _update_edge_rows(self, merged: dict[tuple[str, str], tuple[str, str, dict]]):
+        self._conn.executemany(
+            "UPDATE edges SET data = ? WHERE min(src, tgt) = ? AND max(src, tgt) = ?",
+            ((_dumps(data), lo, hi) for (lo, hi), (_, _, data) in merged.items()),
+        )
+
+    async def get_snapshot(self) -> GraphSnapshot:
+        if self._snapshot is None:
+            self._snapshot = self._build_snapshot()
+        return self._snapshot
+
+    def _build_snapshot(self) -> GraphSnapshot:
+        """
+        Stream ids, lengths and losses straight into the snapshot arrays,
+        without decoding the attribute dicts (descriptions included) of the graph.
+        """
+        n = self._conn.execute("SELECT COUNT(*) FROM nodes").fetchone()[0]
+        m = self._conn.execute("SELECT COUNT(*) FROM edges").fetchone()[0]
+        node_ids: List[str] = []
+        node_length = np.zeros(n, dtype=np.float64)
+        node_loss = np.full(n, np.nan, dtype=np.float64)
+        cur = self._conn.execute(
+            "SELECT json_extract(data, '$.length'), json_extract(data, '$.loss'), id "
+            "FROM nodes ORDER BY rowid"
+        )
+        while rows := cur.fetchmany(_FETCH_SIZE):
+            _fill_units(node_length, node_loss, len(node_ids), rows)
+            node_ids.extend(row[2] for row in rows)
+        node_index = {node_id: i for i, node_id in enumerate(node_ids)}
+
+        edge_src = np.empty(m, dtype=np.int64)
+        edge_tgt = np.empty(m, dtype=np.int64)
+        edge_length = np.zeros(m, dtype=np.float64)
+        edge_loss = np.full(m, np.nan, dtype=np.float64)
+        cur = self._conn.execute(
+            "SELECT json_extract(data, '$.length'), json_extract(data, '$.loss'), "
+            "src, tgt FROM edges ORDER BY rowid"
+        )
+        start = 0
+        while rows := cur.fetchmany(_FETCH_SIZE):
+            end = start + len(rows)
+            edge_src[start:end] = [node_index[row[2]] for row in rows]
+            edge_tgt[start:end] = [node_index[row[3]] for row in rows]
+            _fill_units(edge_length, edge_loss, start, rows)
+            start = end
+        return GraphSnapshot.from_arrays(
+            node_ids,
+            node_index,
+            edge_src=edge_src,
+            edge_tgt=edge_tgt,
+            node_length=node_length,
+            node_loss=node_loss,
+            edge_length=edge_length,
+            edge_loss=edge_loss,
+        )
+
+    async def delete_node(self, node_id: str):
+        """
+        Delete a node and its edges from the graph.
+
+        :param node_id: The node_id to delete
+        """
+        self._snapshot = None
+        with self._conn:
+            cur = self._conn.execute("DELETE FROM nodes WHERE id = ?", (node_id,))
+            if cur.rowcount == 0:
+                logger.warning("Node %s not found in the graph for deletion.", node_id)
+                return
+            self._conn.execute(
+                "DELETE FROM edges WHERE src = ? OR tgt = ?", (node_id, node_id)
+            )
+        logger.info("Node %s deleted from the graph.", node_id)
+
+    async def clear(self):
+        """
+        Clear the graph by removing all nodes and edges.
+        """
+        self._snapshot = None
+        with self._conn:
+            self._conn.execute("DELETE FROM edges")
+            self._conn.execute("DELETE FROM nodes")
+        logger.info("Graph %s cleared.", self.namespace)
@@ -0,0 +1,89 @@
+import os
+from typing import Iterator, List
+
+import msgpack
+
+from graphgen.utils import logger
+
+
+class WriteAheadLog:
+    """
+    Append-only log of storage operations, one msgpack array [seq, op, *args] per record.
+    Records are packed on append, buffered in memory and only reach the disk (fsync'ed) on flush().
+    Sequence numbers keep growing across resets, so a snapshot that records the last one
+    it contains can skip the records it already holds on replay.
+    A record torn by a crash at the tail of the file is cut off on replay,
+    so that later appends are not hidden behind it.
+    """
+
+    def __init__(self, file_name: str):
+        self.file_name = file_name
+        self._pending: List[bytes] = []
+        self._packer = msgpack.Packer(use_bin_type=True)
+        # sequence number of the last record appended or replayed
+        self.seq = 0
+
+    @property
+    def size(self) -> int:
+        """Size of the log on disk in bytes."""
+        if not os.path.exists(self.file_name):
+            return 0
+        return os.path.getsize(self.file_name)
+
+    def append(self, op: str, *args):
+        # packed right away, so that later changes to the caller's objects are not logged
+        self.seq += 1
+        self._pending.append(self._packer.pack([self.seq, op, *args]))
+
+    def flush(self) -> int:
+        """
+        Persist the buffered records.
+        :return: number of records written
+        """
+        if not self._pending:
+            return 0
+        with open(self.file_name, "ab") as f:
+            f.write(b"".join(self._pending))
+            f.flush()
+            os.fsync(f.fileno())
+        n = len(self._pending)
+        self._pending = []
+        return n
+
+    def replay(self, after: int = 0) -> Iterator[list]:
+        """
+        :param after: sequence number already folded into the snapshot
+        :return: [op, *args] of the records logged after it
+        """
+        self.seq = max(self.seq, after)
+        if not os.path.exists(self.file_name):
+            return
+        with open(self.file_name, "rb") as f:
+            data = f.read()
+        unpacker = msgpack.Unpacker(raw=False, strict_map_key=False)
+        unpacker.feed(data)
+        consumed = 0
+        while True:
+            try:
+                record = unpacker.unpack()
+            except (msgpack.OutOfData, msgpack.UnpackException, ValueError):
+                break
+            consumed = unpacker.tell()
+            seq, *record = record
+            self.seq = max(self.seq, seq)
+            if seq > after:
+                yield record
+        if consumed < len(data):
+            logger.warning(
+                "Truncating %d trailing bytes of a torn record in %s",
+                len(data) - consumed,
+                self.file_name,
+            )
+            with open(self.file_name, "r+b") as f:
+                f.truncate(consumed)
+
+    def reset(self):
+        """Drop the log after its content has been folded into a snapshot."""
+        self._pending = []
+        if os.path.exists(self.file_name):
+            os.remove(self.file_name)
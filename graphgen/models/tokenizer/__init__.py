@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Sequence, Tuple
 
 from graphgen.bases import BaseTokenizer
 
@@ -46,5 +46,14 @@ class Tokenizer(BaseTokenizer):
     def decode(self, token_ids: List[int]) -> str:
         return self._impl.decode(token_ids)
 
+    def encode_batch(self, texts: Sequence[str]) -> List[List[int]]:
+        return self._impl.encode_batch(texts)
+
+    def encode_with_offsets(self, text: str) -> Tuple[List[int], List[int]]:
+        return self._impl.encode_with_offsets(text)
+
     def count_tokens(self, text: str) -> int:
         return self._impl.count_tokens(text)
+
+    def count_tokens_batch(self, texts: Sequence[str]) -> List[int]:
+        return self._impl.count_tokens_batch(texts)
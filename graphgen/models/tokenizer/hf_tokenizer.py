@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Sequence, Tuple
 
 from transformers import AutoTokenizer
 
@@ -15,3 +15,11 @@ class HFTokenizer(BaseTokenizer):
 
     def decode(self, token_ids: List[int]) -> str:
         return self.enc.decode(token_ids, skip_special_tokens=True)
+
+    def encode_batch(self, texts: Sequence[str]) -> List[List[int]]:
+        # fast tokenizers encode a batch in parallel in Rust
+        return self.enc(list(texts), add_special_tokens=False)["input_ids"]
+
+    def encode_with_offsets(self, text: str) -> Tuple[List[int], List[int]]:
+        encoding = self.enc(text, add_special_tokens=False, return_offsets_mapping=True)
+        return encoding["input_ids"], [start for start, _ in encoding["offset_mapping"]]
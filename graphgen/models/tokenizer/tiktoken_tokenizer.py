@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Sequence, Tuple
 
 import tiktoken
 
@@ -15,3 +15,12 @@ class TiktokenTokenizer(BaseTokenizer):
 
     def decode(self, token_ids: List[int]) -> str:
         return self.enc.decode(token_ids)
+
+    def encode_batch(self, texts: Sequence[str]) -> List[List[int]]:
+        # tiktoken encodes a batch on its own thread pool, outside of the GIL
+        return self.enc.encode_batch(list(texts))
+
+    def encode_with_offsets(self, text: str) -> Tuple[List[int], List[int]]:
+        token_ids = self.enc.encode(text)
+        _, offsets = self.enc.decode_with_offsets(token_ids)
+        return token_ids, offsets
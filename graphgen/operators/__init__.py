@@ -1,8 +1,8 @@
 from .build_kg import build_mm_kg, build_text_kg
 from .generate import generate_qas
 from .judge import judge_statement
-from .partition import partition_kg
+from .partition import iter_partition_kg, partition_kg
 from .quiz import quiz
-from .read import read_files
+from .read import iter_read_files, read_files
 from .search import search_all
-from .split import chunk_documents
+from .split import chunk_documents, create_chunking_executor
@@ -1,56 +1,79 @@
-from collections import defaultdict
-from typing import List
+from typing import AsyncIterable, Iterable, List, Optional, Union
 
 import gradio as gr
 
 from graphgen.bases.base_storage import BaseGraphStorage
 from graphgen.bases.datatypes import Chunk
 from graphgen.models import MMKGBuilder, OpenAIClient
-from graphgen.utils import run_concurrent
+from graphgen.utils import (
+    DEFAULT_MAX_IN_FLIGHT,
+    KeyedLock,
+    TaskResult,
+    iter_concurrent,
+    logger,
+    prefetch,
+)
+
+from .merge_kg import merge_extractions
+
+MM_BUILD_KEYS = (
+    "summary_mode",
+    "summary_batch_tokens",
+    "defer_summary",
+    "resummary_tokens",
+)
 
 
 async def build_mm_kg(
     llm_client: OpenAIClient,
     kg_instance: BaseGraphStorage,
-    chunks: List[Chunk],
+    chunks: Union[Iterable[Chunk], AsyncIterable[Chunk]],
     progress_bar: gr.Progress = None,
+    max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+    window_size: int = 1000,
+    locks: Optional[KeyedLock] = None,
+    build_config: Optional[dict] = None,
 ):
     """
-    Build multi-modal KG and merge into kg_instance
+    Build multi-modal KG and merge into kg_instance, pipelined like build_text_kg
     :param llm_client: Synthesizer LLM model to extract entities and relationships
     :param kg_instance
-    :param chunks
+    :param chunks: iterable or async iterable of chunks
     :param progress_bar: Gradio progress bar to show the progress of the extraction
+    :param max_in_flight: maximum number of chunks / entities processed concurrently
+    :param window_size: number of extracted chunks merged together
+    :param locks: per-key locks shared with other pipelines merging into kg_instance
+    :param build_config: optional builder settings
+        (summary_mode, summary_batch_tokens, defer_summary, resummary_tokens),
+        the missing ones keep the defaults of MMKGBuilder
     :return:
     """
-    mm_builder = MMKGBuilder(llm_client=llm_client)
+    build_config = build_config or {}
+    mm_builder = MMKGBuilder(
+        llm_client=llm_client,
+        **{key: build_config[key] for key in MM_BUILD_KEYS if key in build_config},
+    )
 
-    results = await run_concurrent(
+    extractions = iter_concurrent(
         mm_builder.extract,
         chunks,
+        max_in_flight=max_in_flight,
         desc="[2/4] Extracting entities and relationships from multi-modal chunks",
         unit="chunk",
         progress_bar=progress_bar,
     )
-
-    nodes = defaultdict(list)
-    edges = defaultdict(list)
-    for n, e in results:
-        for k, v in n.items():
-            nodes[k].extend(v)
-        for k, v in e.items():
-            edges[tuple(sorted(k))].extend(v)
-
-    await run_concurrent(
-        lambda kv: mm_builder.merge_nodes(kv, kg_instance=kg_instance),
-        list(nodes.items()),
-        desc="Inserting entities into storage",
-    )
-
-    await run_concurrent(
-        lambda kv: mm_builder.merge_edges(kv, kg_instance=kg_instance),
-        list(edges.items()),
-        desc="Inserting relationships into storage",
+    failures: List[TaskResult] = await merge_extractions(
+        mm_builder,
+        kg_instance,
+        prefetch(extractions, maxsize=max_in_flight),
+        max_in_flight=max_in_flight,
+        window_size=window_size,
+        locks=locks,
     )
+    if failures:
+        logger.warning(
+            "Extraction failed for multi-modal chunks: %s",
+            [f.item.id for f in failures],
+        )
 
     return kg_instance
@@ -0,0 +1,175 @@
+import asyncio
+from collections import defaultdict
+from typing import AsyncIterable, Dict, List, Optional, Tuple
+
+from graphgen.bases import BaseGraphStorage, BaseKGBuilder
+from graphgen.utils import (
+    DEFAULT_MAX_IN_FLIGHT,
+    KeyedLock,
+    MicroBatcher,
+    TaskResult,
+    run_concurrent,
+)
+
+
+class _BatchedGraphIO:
+    """
+    Reads and writes issued by concurrent per-item merges, gathered into batch calls.
+    """
+
+    def __init__(self, kg_instance: BaseGraphStorage, batch_size: int):
+        self.kg_instance = kg_instance
+        # max_wait=0: a batch holds what the merges running in the same loop turn submitted
+        self.get_node = MicroBatcher(
+            lambda _, ids: kg_instance.get_nodes(ids), budget=batch_size, max_wait=0
+        )
+        self.get_edge = MicroBatcher(
+            lambda _, ids: kg_instance.get_edges(ids), budget=batch_size, max_wait=0
+        )
+        self.upsert_node = MicroBatcher(
+            self._upsert_nodes, budget=batch_size, max_wait=0
+        )
+        self.upsert_edge = MicroBatcher(
+            self._upsert_edges, budget=batch_size, max_wait=0
+        )
+
+    async def _upsert_nodes(self, _, items: List[Tuple[str, dict]]) -> List[None]:
+        await self.kg_instance.upsert_nodes(dict(items))
+        return [None] * len(items)
+
+    async def _upsert_edges(
+        self, _, items: List[Tuple[Tuple[str, str], dict]]
+    ) -> List[None]:
+        await self.kg_instance.upsert_edges(dict(items))
+        return [None] * len(items)
+
+
+async def merge_kg(
+    kg_builder: BaseKGBuilder,
+    kg_instance: BaseGraphStorage,
+    nodes: Dict[str, List[dict]],
+    edges: Dict[Tuple[str, str], List[dict]],
+    max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+    batch_size: int = 1000,
+    locks: Optional[KeyedLock] = None,
+):
+    """
+    Merge extracted nodes and edges into the graph.
+    Every item is read, merged (which may call the LLM to summarize) and written back
+    while holding its key in locks, so concurrent merges of the same entity never lose an update,
+    while the reads and writes of concurrent merges are still sent to the storage in batches.
+    An edge also holds its endpoints, it creates a placeholder node for an endpoint that does not exist.
+
+    :param kg_builder: builder providing merge_nodes / merge_edges
+    :param kg_instance: graph storage
+    :param nodes: entity name -> extracted records
+    :param edges: (src, tgt) -> extracted records
+    :param max_in_flight: maximum number of merges running concurrently
+    :param batch_size: maximum number of items per storage call
+    :param locks: per-key locks shared by everything merging into kg_instance
+    """
+    locks = locks or KeyedLock()
+    io = _BatchedGraphIO(kg_instance, batch_size)
+
+    async def _merge_node(node_id: str):
+        async with locks.hold(node_id):
+            existing = await io.get_node.submit(node_id)
+            merged = await kg_builder.merge_nodes((node_id, nodes[node_id]), existing)
+            await io.upsert_node.submit((node_id, merged))
+
+    async def _merge_edge(edge_id: Tuple[str, str]):
+        async with locks.hold(edge_id, *edge_id):
+            existing = await io.get_edge.submit(edge_id)
+            merged = await kg_builder.merge_edges((edge_id, edges[edge_id]), existing)
+            # endpoints never extracted as entities get a placeholder from the edge
+            endpoints = await asyncio.gather(*(io.get_node.submit(n) for n in edge_id))
+            for node_id, data in dict(zip(edge_id, endpoints)).items():
+                if data is None:
+                    await io.upsert_node.submit(
+                        (
+                            node_id,
+                            {
+                                "source_id": merged["source_id"],
+                                "description": merged["description"],
+                                "entity_type": "UNKNOWN",
+                            },
+                        )
+                    )
+            await io.upsert_edge.submit((edge_id, merged))
+
+    await run_concurrent(
+        _merge_node,
+        list(nodes),
+        max_in_flight=max_in_flight,
+        desc="Inserting entities into storage",
+    )
+    await run_concurrent(
+        _merge_edge,
+        list(edges),
+        max_in_flight=max_in_flight,
+        desc="Inserting relationships into storage",
+    )
+
+
+async def merge_extractions(
+    kg_builder: BaseKGBuilder,
+    kg_instance: BaseGraphStorage,
+    extractions: AsyncIterable[TaskResult],
+    max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+    window_size: int = 1000,
+    locks: Optional[KeyedLock] = None,
+) -> List[TaskResult]:
+    """
+    Merge extraction results into the graph while the extraction is still running.
+    Results are grouped window_size chunks at a time and every window is merged with merge_kg,
+    so memory is bounded by the window instead of the corpus.
+    Windows are merged one after another, an entity seen in several windows is merged
+    into what the previous windows stored. Deferred summaries are made once, after the last window.
+
+    :param kg_builder: builder providing merge_nodes / merge_edges
+    :param kg_instance: graph storage
+    :param extractions: TaskResults of kg_builder.extract, as yielded by iter_concurrent
+    :param max_in_flight: maximum number of merges running concurrently
+    :param window_size: number of extracted chunks merged together
+    :param locks: per-key locks shared by everything merging into kg_instance
+    :return: the failed extractions
+    """
+    failures: List[TaskResult] = []
+    nodes: Dict[str, List[dict]] = defaultdict(list)
+    edges: Dict[Tuple[str, str], List[dict]] = defaultdict(list)
+    n_window = 0
+
+    locks = locks or KeyedLock()
+
+    async def _merge_window():
+        await merge_kg(
+            kg_builder,
+            kg_instance,
+            nodes,
+            edges,
+            max_in_flight=max_in_flight,
+            locks=locks,
+        )
+
+    async for res in extractions:
+        if not res.ok:
+            failures.append(res)
+            continue
+        n, e = res.result
+        for k, v in n.items():
+            nodes[k].extend(v)
+        for k, v in e.items():
+            edges[tuple(sorted(k))].extend(v)
+        n_window += 1
+        if n_window >= window_size:
+            await _merge_window()
+            nodes, edges = defaultdict(list), defaultdict(list)
+            n_window = 0
+
+    if n_window:
+        await _merge_window()
+    # one summarization pass over everything the windows changed
+    await kg_builder.summarize_pending(
+        kg_instance, max_in_flight=max_in_flight, locks=locks
+    )
+    return failures
@@ -1,4 +1,4 @@
-from typing import Any
+from typing import Any, AsyncIterable, Union
 
 from graphgen.bases import BaseLLMClient
 from graphgen.models import (
@@ -8,15 +8,19 @@ from graphgen.models import (
     MultiHopGenerator,
     VQAGenerator,
 )
-from graphgen.utils import logger, run_concurrent
+from graphgen.utils import DEFAULT_MAX_IN_FLIGHT, logger, prefetch, run_concurrent
 
 
 async def generate_qas(
     llm_client: BaseLLMClient,
-    batches: list[
-        tuple[
-            list[tuple[str, dict]], list[tuple[Any, Any, dict] | tuple[Any, Any, Any]]
-        ]
+    batches: Union[
+        list[
+            tuple[
+                list[tuple[str, dict]],
+                list[tuple[Any, Any, dict] | tuple[Any, Any, Any]],
+            ]
+        ],
+        AsyncIterable[tuple[list[tuple[str, dict]], list]],
     ],
     generation_config: dict,
     progress_bar=None,
@@ -24,13 +28,19 @@ async def generate_qas(
     """
     Generate question-answer pairs based on nodes and edges.
     :param llm_client: LLM client
-    :param batches
+    :param batches: list of batches, or an async iterable of batches (e.g. from iter_partition_kg)
+        which is consumed through a bounded queue of max_in_flight batches while it is produced
     :param generation_config
     :param progress_bar
     :return: QA pairs
     """
     mode = generation_config["mode"]
-    logger.info("[Generation] mode: %s, batches: %d", mode, len(batches))
+    max_in_flight = generation_config.get("max_in_flight", DEFAULT_MAX_IN_FLIGHT)
+    if hasattr(batches, "__len__"):
+        logger.info("[Generation] mode: %s, batches: %d", mode, len(batches))
+    else:
+        logger.info("[Generation] mode: %s, streaming batches", mode)
+        batches = prefetch(batches, maxsize=max_in_flight)
 
     if mode == "atomic":
         generator = AtomicGenerator(llm_client)
@@ -48,6 +58,7 @@ async def generate_qas(
     results = await run_concurrent(
         generator.generate,
         batches,
+        max_in_flight=max_in_flight,
         desc="[4/4]Generating QAs",
         unit="batch",
         progress_bar=progress_bar,
@@ -1,22 +1,21 @@
-import asyncio
 import math
 
-from tqdm.asyncio import tqdm as tqdm_async
-
-from graphgen.models import JsonKVStorage, NetworkXStorage, OpenAIClient
+from graphgen.bases import BaseGraphStorage, BaseKVStorage
+from graphgen.models import OpenAIClient
 from graphgen.templates import STATEMENT_JUDGEMENT_PROMPT
-from graphgen.utils import logger, yes_no_loss_entropy
+from graphgen.utils import iter_concurrent, logger, yes_no_loss_entropy
 
 
 async def judge_statement(  # pylint: disable=too-many-statements
     trainee_llm_client: OpenAIClient,
-    graph_storage: NetworkXStorage,
-    rephrase_storage: JsonKVStorage,
+    graph_storage: BaseGraphStorage,
+    rephrase_storage: BaseKVStorage,
     re_judge: bool = False,
     max_concurrent: int = 1000,
-) -> NetworkXStorage:
+) -> BaseGraphStorage:
     """
-    Get all edges and nodes and judge them
+    Stream the edges and nodes from the storage and judge them,
+    at most max_concurrent at a time
 
     :param trainee_llm_client: judge the statements to get comprehension loss
     :param graph_storage: graph storage instance
@@ -26,124 +25,114 @@ async def judge_statement(  # pylint: disable=too-many-statements
     :return:
     """
 
-    semaphore = asyncio.Semaphore(max_concurrent)
-
     async def _judge_single_relation(
         edge: tuple,
     ):
-        async with semaphore:
-            source_id = edge[0]
-            target_id = edge[1]
-            edge_data = edge[2]
-
-            if (not re_judge) and "loss" in edge_data and edge_data["loss"] is not None:
-                logger.debug(
-                    "Edge %s -> %s already judged, loss: %s, skip",
-                    source_id,
-                    target_id,
-                    edge_data["loss"],
-                )
-                return source_id, target_id, edge_data
-
-            description = edge_data["description"]
-
-            try:
-                descriptions = await rephrase_storage.get_by_id(description)
-                assert descriptions is not None
-
-                judgements = []
-                gts = [gt for _, gt in descriptions]
-                for description, gt in descriptions:
-                    judgement = await trainee_llm_client.generate_topk_per_token(
-                        STATEMENT_JUDGEMENT_PROMPT["TEMPLATE"].format(
-                            statement=description
-                        )
-                    )
-                    judgements.append(judgement[0].top_candidates)
-
-                loss = yes_no_loss_entropy(judgements, gts)
-
-                logger.debug(
-                    "Edge %s -> %s description: %s loss: %s",
-                    source_id,
-                    target_id,
-                    description,
-                    loss,
-                )
-
-                edge_data["loss"] = loss
-            except Exception as e:  # pylint: disable=broad-except
-                logger.error(
-                    "Error in judging relation %s -> %s: %s", source_id, target_id, e
-                )
-                logger.info("Use default loss 0.1")
-                edge_data["loss"] = -math.log(0.1)
-
-            await graph_storage.update_edge(source_id, target_id, edge_data)
+        source_id = edge[0]
+        target_id = edge[1]
+        edge_data = edge[2]
+
+        if (not re_judge) and "loss" in edge_data and edge_data["loss"] is not None:
+            logger.debug(
+                "Edge %s -> %s already judged, loss: %s, skip",
+                source_id,
+                target_id,
+                edge_data["loss"],
+            )
             return source_id, target_id, edge_data
 
-    edges = await graph_storage.get_all_edges()
+        description = edge_data["description"]
+
+        try:
+            descriptions = await rephrase_storage.get_by_id(description)
+            assert descriptions is not None
 
-    results = []
-    for result in tqdm_async(
-        asyncio.as_completed([_judge_single_relation(edge) for edge in edges]),
-        total=len(edges),
+            judgements = []
+            gts = [gt for _, gt in descriptions]
+            for description, gt in descriptions:
+                judgement = await trainee_llm_client.generate_topk_per_token(
+                    STATEMENT_JUDGEMENT_PROMPT["TEMPLATE"].format(statement=description)
+                )
+                judgements.append(judgement[0].top_candidates)
+
+            loss = yes_no_loss_entropy(judgements, gts)
+
+            logger.debug(
+                "Edge %s -> %s description: %s loss: %s",
+                source_id,
+                target_id,
+                description,
+                loss,
+            )
+
+            edge_data["loss"] = loss
+        except Exception as e:  # pylint: disable=broad-except
+            logger.error(
+                "Error in judging relation %s -> %s: %s", source_id, target_id, e
+            )
+            logger.info("Use default loss 0.1")
+            edge_data["loss"] = -math.log(0.1)
+
+        await graph_storage.update_edge(source_id, target_id, edge_data)
+        return source_id, target_id, edge_data
+
+    async for _ in iter_concurrent(
+        _judge_single_relation,
+        graph_storage.iter_edges(),
+        max_in_flight=max_concurrent,
+        total=await graph_storage.count_edges(),
         desc="Judging relations",
+        unit="relation",
     ):
-        results.append(await result)
+        pass
 
     async def _judge_single_entity(
         node: tuple,
     ):
-        async with semaphore:
-            node_id = node[0]
-            node_data = node[1]
-
-            if (not re_judge) and "loss" in node_data and node_data["loss"] is not None:
-                logger.debug(
-                    "Node %s already judged, loss: %s, skip", node_id, node_data["loss"]
-                )
-                return node_id, node_data
-
-            description = node_data["description"]
+        node_id = node[0]
+        node_data = node[1]
 
-            try:
-                descriptions = await rephrase_storage.get_by_id(description)
-                assert descriptions is not None
+        if (not re_judge) and "loss" in node_data and node_data["loss"] is not None:
+            logger.debug(
+                "Node %s already judged, loss: %s, skip", node_id, node_data["loss"]
+            )
+            return node_id, node_data
 
-                judgements = []
-                gts = [gt for _, gt in descriptions]
-                for description, gt in descriptions:
-                    judgement = await trainee_llm_client.generate_topk_per_token(
-                        STATEMENT_JUDGEMENT_PROMPT["TEMPLATE"].format(
-                            statement=description
-                        )
-                    )
-                    judgements.append(judgement[0].top_candidates)
+        description = node_data["description"]
 
-                loss = yes_no_loss_entropy(judgements, gts)
+        try:
+            descriptions = await rephrase_storage.get_by_id(description)
+            assert descriptions is not None
 
-                logger.debug(
-                    "Node %s description: %s loss: %s", node_id, description, loss
+            judgements = []
+            gts = [gt for _, gt in descriptions]
+            for description, gt in descriptions:
+                judgement = await trainee_llm_client.generate_topk_per_token(
+                    STATEMENT_JUDGEMENT_PROMPT["TEMPLATE"].format(statement=description)
                 )
+                judgements.append(judgement[0].top_candidates)
 
-                node_data["loss"] = loss
-            except Exception as e:  # pylint: disable=broad-except
-                logger.error("Error in judging entity %s: %s", node_id, e)
-                logger.error("Use default loss 0.1")
-                node_data["loss"] = -math.log(0.1)
+            loss = yes_no_loss_entropy(judgements, gts)
 
-            await graph_storage.update_node(node_id, node_data)
-            return node_id, node_data
+            logger.debug("Node %s description: %s loss: %s", node_id, description, loss)
+
+            node_data["loss"] = loss
+        except Exception as e:  # pylint: disable=broad-except
+            logger.error("Error in judging entity %s: %s", node_id, e)
+            logger.error("Use default loss 0.1")
+            node_data["loss"] = -math.log(0.1)
 
-    nodes = await graph_storage.get_all_nodes()
+        await graph_storage.update_node(node_id, node_data)
+        return node_id, node_data
 
-    results = []
-    for result in tqdm_async(
-        asyncio.as_completed([_judge_single_entity(node) for node in nodes]),
-        total=len(nodes),
+    async for _ in iter_concurrent(
+        _judge_single_entity,
+        graph_storage.iter_nodes(),
+        max_in_flight=max_concurrent,
+        total=await graph_storage.count_nodes(),
         desc="Judging entities",
+        unit="entity",
     ):
-        results.append(await result)
+        pass
 
     return graph_storage
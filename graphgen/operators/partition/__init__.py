@@ -1 +1 @@
-from .partition_kg import partition_kg
+from .partition_kg import iter_partition_kg, partition_kg
@@ -1,6 +1,11 @@
-from typing import Any
+from typing import Any, AsyncIterator
 
-from graphgen.bases import BaseGraphStorage, BaseKVStorage, BaseTokenizer
+from graphgen.bases import (
+    BaseGraphStorage,
+    BaseKVStorage,
+    BasePartitioner,
+    BaseTokenizer,
+)
 from graphgen.models import (
     AnchorBFSPartitioner,
     BFSPartitioner,
@@ -13,14 +18,11 @@ from graphgen.utils import logger
 from .pre_tokenize import pre_tokenize
 
 
-async def partition_kg(
+async def _get_partitioner(
     kg_instance: BaseGraphStorage,
-    chunk_storage: BaseKVStorage,
-    tokenizer: Any = BaseTokenizer,
-    partition_config: dict = None,
-) -> list[
-    tuple[list[tuple[str, dict]], list[tuple[Any, Any, dict] | tuple[Any, Any, Any]]]
-]:
+    tokenizer: Any,
+    partition_config: dict,
+) -> BasePartitioner:
     method = partition_config["method"]
     method_params = partition_config["method_params"]
     if method == "bfs":
@@ -40,29 +42,78 @@ async def partition_kg(
         partitioner = ECEPartitioner()
     elif method == "leiden":
         logger.info("Partitioning knowledge graph using Leiden method.")
+        if method_params.get("split_mode") == "recursive" and method_params.get(
+            "max_tokens_per_community"
+        ):
+            # the token budget of the recursive split needs the token length of every unit
+            edges = await kg_instance.get_all_edges()
+            nodes = await kg_instance.get_all_nodes()
+            await pre_tokenize(kg_instance, tokenizer, edges, nodes)
         partitioner = LeidenPartitioner()
     elif method == "anchor_bfs":
         logger.info("Partitioning knowledge graph using Anchor BFS method.")
         partitioner = AnchorBFSPartitioner(
             anchor_type=method_params.get("anchor_type"),
-            anchor_ids=set(method_params.get("anchor_ids", []))
-            if method_params.get("anchor_ids")
-            else None,
+            anchor_ids=(
+                set(method_params.get("anchor_ids", []))
+                if method_params.get("anchor_ids")
+                else None
+            ),
         )
     else:
         raise ValueError(f"Unsupported partition method: {method}")
 
-    communities = await partitioner.partition(g=kg_instance, **method_params)
-    logger.info("Partitioned the graph into %d communities.", len(communities))
-    batches = await partitioner.community2batch(communities, g=kg_instance)
+    return partitioner
+
+
+async def _attach_images(
+    batch: tuple[list[tuple[str, dict]], list], chunk_storage: BaseKVStorage
+) -> None:
+    nodes, _ = batch
+    for node_id, node_data in nodes:
+        entity_type = node_data.get("entity_type")
+        if entity_type and "image" in entity_type.lower():
+            node_id = node_id.strip('"').lower()
+            image_data = await chunk_storage.get_by_id(node_id)
+            if image_data:
+                node_data["images"] = image_data
+
+
+async def iter_partition_kg(
+    kg_instance: BaseGraphStorage,
+    chunk_storage: BaseKVStorage,
+    tokenizer: Any = BaseTokenizer,
+    partition_config: dict = None,
+) -> AsyncIterator[
+    tuple[list[tuple[str, dict]], list[tuple[Any, Any, dict] | tuple[Any, Any, Any]]]
+]:
+    """
+    Partition the graph and yield every batch as soon as its community is formed and hydrated,
+    so that generation can start before the partitioning ends.
+    """
+    partitioner = await _get_partitioner(kg_instance, tokenizer, partition_config)
+    communities = partitioner.iter_partition(
+        g=kg_instance, **partition_config["method_params"]
+    )
+    n_batches = 0
+    async for batch in partitioner.iter_community2batch(communities, g=kg_instance):
+        await _attach_images(batch, chunk_storage)
+        n_batches += 1
+        yield batch
+    logger.info("Partitioned the graph into %d communities.", n_batches)
+
 
-    for _, batch in enumerate(batches):
-        nodes, edges = batch
-        for node_id, node_data in nodes:
-            entity_type = node_data.get("entity_type")
-            if entity_type and "image" in entity_type.lower():
-                node_id = node_id.strip('"').lower()
-                image_data = await chunk_storage.get_by_id(node_id)
-                if image_data:
-                    node_data["images"] = image_data
-    return batches
+async def partition_kg(
+    kg_instance: BaseGraphStorage,
+    chunk_storage: BaseKVStorage,
+    tokenizer: Any = BaseTokenizer,
+    partition_config: dict = None,
+) -> list[
+    tuple[list[tuple[str, dict]], list[tuple[Any, Any, dict] | tuple[Any, Any, Any]]]
+]:
+    return [
+        batch
+        async for batch in iter_partition_kg(
+            kg_instance, chunk_storage, tokenizer, partition_config
+        )
+    ]
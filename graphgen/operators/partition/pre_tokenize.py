@@ -10,38 +10,46 @@ async def pre_tokenize(
     tokenizer: BaseTokenizer,
     edges: List[Tuple],
     nodes: List[Tuple],
+    max_in_flight: int = 1000,
+    batch_size: int = 1024,
 ) -> Tuple[List, List]:
-    """为 edges/nodes 补 token-length 并回写存储，并发 1000，带进度条。"""
-    sem = asyncio.Semaphore(1000)
-
-    async def _patch_and_write(obj: Tuple, *, is_node: bool) -> Tuple:
-        async with sem:
-            data = obj[1] if is_node else obj[2]
-            if "length" not in data:
-                loop = asyncio.get_event_loop()
-                data["length"] = len(
-                    await loop.run_in_executor(
-                        None, tokenizer.encode, data["description"]
-                    )
-                )
-            if is_node:
-                await graph_storage.update_node(obj[0], obj[1])
-            else:
-                await graph_storage.update_edge(obj[0], obj[1], obj[2])
-            return obj
-
-    new_edges, new_nodes = await asyncio.gather(
-        run_concurrent(
-            lambda e: _patch_and_write(e, is_node=False),
-            edges,
-            desc="Pre-tokenizing edges",
-        ),
-        run_concurrent(
-            lambda n: _patch_and_write(n, is_node=True),
-            nodes,
-            desc="Pre-tokenizing nodes",
-        ),
+    """为 edges/nodes 补 token-length 并批量回写存储，每 batch_size 条描述一起分词，并发 max_in_flight 批，带进度条。"""
+
+    async def _patch(objs: List[Tuple], *, is_node: bool, desc: str) -> List[Tuple]:
+        """补齐缺少 length 的条目，只返回被补齐的条目。"""
+        todo = [obj for obj in objs if "length" not in (obj[1] if is_node else obj[2])]
+
+        async def _patch_batch(batch: List[Tuple]) -> None:
+            loop = asyncio.get_running_loop()
+            lengths = await loop.run_in_executor(
+                None,
+                tokenizer.count_tokens_batch,
+                [(obj[1] if is_node else obj[2])["description"] for obj in batch],
+            )
+            for obj, length in zip(batch, lengths):
+                (obj[1] if is_node else obj[2])["length"] = length
+
+        await run_concurrent(
+            _patch_batch,
+            [todo[i : i + batch_size] for i in range(0, len(todo), batch_size)],
+            max_in_flight=max_in_flight,
+            desc=desc,
+            unit="batch",
+        )
+        return todo
+
+    patched_edges, patched_nodes = await asyncio.gather(
+        _patch(edges, is_node=False, desc="Pre-tokenizing edges"),
+        _patch(nodes, is_node=True, desc="Pre-tokenizing nodes"),
     )
 
-    await graph_storage.index_done_callback()
-    return new_edges, new_nodes
+    # 只回写补齐过的条目，什么都没补齐时不写也不提交
+    if patched_edges:
+        await graph_storage.update_edges_batch(
+            {(e[0], e[1]): e[2] for e in patched_edges}
+        )
+    if patched_nodes:
+        await graph_storage.update_nodes_batch({n[0]: n[1] for n in patched_nodes})
+    if patched_edges or patched_nodes:
+        await graph_storage.index_done_callback()
+    return edges, nodes
@@ -1,22 +1,21 @@
 import asyncio
-from collections import defaultdict
 
-from tqdm.asyncio import tqdm as tqdm_async
-
-from graphgen.models import JsonKVStorage, NetworkXStorage, OpenAIClient
+from graphgen.bases import BaseGraphStorage, BaseKVStorage
+from graphgen.models import OpenAIClient
 from graphgen.templates import DESCRIPTION_REPHRASING_PROMPT
-from graphgen.utils import detect_main_language, logger
+from graphgen.utils import detect_main_language, iter_concurrent, logger
 
 
 async def quiz(
     synth_llm_client: OpenAIClient,
-    graph_storage: NetworkXStorage,
-    rephrase_storage: JsonKVStorage,
+    graph_storage: BaseGraphStorage,
+    rephrase_storage: BaseKVStorage,
     max_samples: int = 1,
     max_concurrent: int = 1000,
-) -> JsonKVStorage:
+) -> BaseKVStorage:
     """
-    Get all edges and quiz them
+    Stream the descriptions of the edges and nodes from the storage and quiz them,
+    each one stored as soon as its rephrasings are done
 
     :param synth_llm_client: generate statements
     :param graph_storage: graph storage instance
@@ -26,97 +25,61 @@ async def quiz(
     :return:
     """
 
-    semaphore = asyncio.Semaphore(max_concurrent)
-
-    async def _process_single_quiz(des: str, prompt: str, gt: str):
-        async with semaphore:
-            try:
-                # 如果在rephrase_storage中已经存在，直接取出
-                descriptions = await rephrase_storage.get_by_id(des)
-                if descriptions:
-                    return None
-
-                new_description = await synth_llm_client.generate_answer(
-                    prompt, temperature=1
-                )
-                return {des: [(new_description, gt)]}
-
-            except Exception as e:  # pylint: disable=broad-except
-                logger.error("Error when quizzing description %s: %s", des, e)
-                return None
-
-    edges = await graph_storage.get_all_edges()
-    nodes = await graph_storage.get_all_nodes()
-
-    results = defaultdict(list)
-    tasks = []
-    for edge in edges:
-        edge_data = edge[2]
-
-        description = edge_data["description"]
-        language = "English" if detect_main_language(description) == "en" else "Chinese"
-
-        results[description] = [(description, "yes")]
-
-        for i in range(max_samples):
-            if i > 0:
-                tasks.append(
-                    _process_single_quiz(
-                        description,
-                        DESCRIPTION_REPHRASING_PROMPT[language]["TEMPLATE"].format(
-                            input_sentence=description
-                        ),
-                        "yes",
-                    )
-                )
-            tasks.append(
-                _process_single_quiz(
-                    description,
-                    DESCRIPTION_REPHRASING_PROMPT[language]["ANTI_TEMPLATE"].format(
-                        input_sentence=description
-                    ),
-                    "no",
-                )
+    async def _rephrase(des: str, prompt: str, gt: str):
+        try:
+            new_description = await synth_llm_client.generate_answer(
+                prompt, temperature=1
             )
-
-    for node in nodes:
-        node_data = node[1]
-        description = node_data["description"]
+            return new_description, gt
+        except Exception as e:  # pylint: disable=broad-except
+            logger.error("Error when quizzing description %s: %s", des, e)
+            return None
+
+    async def _quiz_description(description: str):
+        # 如果在rephrase_storage中已经存在，直接跳过
+        if await rephrase_storage.get_by_id(description):
+            return
         language = "English" if detect_main_language(description) == "en" else "Chinese"
-
-        results[description] = [(description, "yes")]
-
+        prompts = []
         for i in range(max_samples):
             if i > 0:
-                tasks.append(
-                    _process_single_quiz(
-                        description,
+                prompts.append(
+                    (
                         DESCRIPTION_REPHRASING_PROMPT[language]["TEMPLATE"].format(
                             input_sentence=description
                         ),
                         "yes",
                     )
                 )
-            tasks.append(
-                _process_single_quiz(
-                    description,
+            prompts.append(
+                (
                     DESCRIPTION_REPHRASING_PROMPT[language]["ANTI_TEMPLATE"].format(
                         input_sentence=description
                     ),
                     "no",
                 )
             )
-
-    for result in tqdm_async(
-        asyncio.as_completed(tasks), total=len(tasks), desc="Quizzing descriptions"
+        samples = await asyncio.gather(
+            *(_rephrase(description, prompt, gt) for prompt, gt in prompts)
+        )
+        result = [(description, "yes")] + [s for s in samples if s is not None]
+        await rephrase_storage.upsert({description: list(set(result))})
+
+    async def _descriptions():
+        async for _, _, edge_data in graph_storage.iter_edges():
+            yield edge_data["description"]
+        async for _, node_data in graph_storage.iter_nodes():
+            yield node_data["description"]
+
+    async for _ in iter_concurrent(
+        _quiz_description,
+        _descriptions(),
+        # every description sends up to 2 * max_samples - 1 requests at once
+        max_in_flight=max(1, max_concurrent // (2 * max_samples - 1)),
+        total=await graph_storage.count_edges() + await graph_storage.count_nodes(),
+        desc="Quizzing descriptions",
+        unit="description",
     ):
-        new_result = await result
-        if new_result:
-            for key, value in new_result.items():
-                results[key].extend(value)
-
-    for key, value in results.items():
-        results[key] = list(set(value))
-        await rephrase_storage.upsert({key: results[key]})
+        pass
 
     return rephrase_storage
@@ -1,3 +1,5 @@
+from typing import Iterator
+
 from graphgen.models import CSVReader, JSONLReader, JSONReader, PDFReader, TXTReader
 
 _MAPPING = {
@@ -9,7 +11,7 @@ _MAPPING = {
 }
 
 
-def read_files(file_path: str, cache_dir: str | None = None) -> list[dict]:
+def _get_reader(file_path: str, cache_dir: str | None = None):
     suffix = file_path.split(".")[-1].lower()
     if suffix == "pdf":
         if cache_dir is not None:
@@ -22,4 +24,17 @@ def read_files(file_path: str, cache_dir: str | None = None) -> list[dict]:
         raise ValueError(
             f"Unsupported file format: {suffix}. Supported formats are: {list(_MAPPING.keys())}"
         )
-    return reader.read(file_path)
+    return reader
+
+
+def read_files(file_path: str, cache_dir: str | None = None) -> list[dict]:
+    return _get_reader(file_path, cache_dir).read(file_path)
+
+
+def iter_read_files(
+    file_path: str, cache_dir: str | None = None, batch_size: int = 1000
+) -> Iterator[list[dict]]:
+    """
+    Read the file in batches of at most batch_size documents.
+    """
+    return _get_reader(file_path, cache_dir).iter_read(file_path, batch_size)
@@ -1 +1 @@
-from .split_chunks import chunk_documents
+from .split_chunks import chunk_documents, create_chunking_executor
@@ -1,5 +1,7 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
 from functools import lru_cache
-from typing import Union
+from typing import List, Optional, Tuple, Union
 
 from tqdm.asyncio import tqdm as tqdm_async
 
@@ -7,6 +9,7 @@ from graphgen.models import (
     ChineseRecursiveTextSplitter,
     RecursiveCharacterSplitter,
     Tokenizer,
+    TokenSplitter,
 )
 from graphgen.utils import compute_content_hash, detect_main_language
 
@@ -35,48 +38,210 @@ def split_chunks(text: str, language: str = "en", **kwargs) -> list:
     return splitter.split_text(text)
 
 
+@lru_cache(maxsize=None)
+def _get_token_splitter(
+    tokenizer_instance: Tokenizer, chunk_size: int, chunk_overlap: int
+) -> TokenSplitter:
+    return TokenSplitter(
+        tokenizer_instance, chunk_size=chunk_size, chunk_overlap=chunk_overlap
+    )
+
+
+def _chunk_text_document(
+    doc_key: str,
+    content: str,
+    chunk_size: int,
+    chunk_overlap: int,
+    tokenizer_instance: Optional[Tokenizer],
+    splitter: str,
+) -> dict:
+    doc_language = detect_main_language(content)
+    if splitter == "token":
+        spans = _get_token_splitter(
+            tokenizer_instance, chunk_size, chunk_overlap
+        ).split_spans(content)
+    else:
+        text_chunks = split_chunks(
+            content,
+            language=doc_language,
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+        )
+        lengths = (
+            tokenizer_instance.count_tokens_batch(text_chunks)
+            if tokenizer_instance
+            else [len(txt) for txt in text_chunks]
+        )
+        spans = [
+            {"content": txt, "tokens": length}
+            for txt, length in zip(text_chunks, lengths)
+        ]
+
+    return {
+        compute_content_hash(span["content"], prefix="chunk-"): {
+            "content": span["content"],
+            "type": "text",
+            "full_doc_id": doc_key,
+            "length": span["tokens"],
+            "language": doc_language,
+            **{k: span[k] for k in ("start_index", "end_index") if k in span},
+        }
+        for span in spans
+    }
+
+
+# tokenizer of a chunking worker process, sent once by the pool initializer
+_WORKER_TOKENIZER: List[Optional[Tokenizer]] = [None]
+
+
+def _init_chunking_worker(tokenizer_instance: Optional[Tokenizer]) -> None:
+    _WORKER_TOKENIZER[0] = tokenizer_instance
+
+
+def _chunk_shard(
+    docs: List[Tuple[str, str]], chunk_size: int, chunk_overlap: int, splitter: str
+) -> List[dict]:
+    return [
+        _chunk_text_document(
+            doc_key, content, chunk_size, chunk_overlap, _WORKER_TOKENIZER[0], splitter
+        )
+        for doc_key, content in docs
+    ]
+
+
+def create_chunking_executor(
+    max_workers: int, tokenizer_instance: Optional[Tokenizer] = None
+) -> ProcessPoolExecutor:
+    """
+    Process pool for chunk_documents, the tokenizer is sent to every worker once.
+    It can be reused across calls, the caller shuts it down.
+    """
+    return ProcessPoolExecutor(
+        max_workers=max_workers,
+        initializer=_init_chunking_worker,
+        initargs=(tokenizer_instance,),
+    )
+
+
 async def chunk_documents(
     new_docs: dict,
     chunk_size: int = 1024,
     chunk_overlap: int = 100,
     tokenizer_instance: Tokenizer = None,
     progress_bar=None,
+    splitter: str = "recursive",
+    max_workers: int = 1,
+    executor: Optional[ProcessPoolExecutor] = None,
+    docs_per_shard: int = 16,
 ) -> dict:
+    """
+    :param splitter: how text documents are split
+        - recursive: regex splitting per language, chunk_size and chunk_overlap in characters
+        - token: TokenSplitter, the document is encoded once and chunk_size and chunk_overlap
+          are in tokens of tokenizer_instance, chunks also keep their character span
+    :param max_workers: if greater than 1, text documents are chunked in that many processes
+    :param executor: pool made by create_chunking_executor, used instead of a pool per call
+    :param docs_per_shard: number of documents sent to a worker process at a time
+    :return: chunks of all the documents, in the order of the documents
+    """
+    if splitter not in ("recursive", "token"):
+        raise ValueError(f"Invalid splitter: {splitter}")
+    if splitter == "token" and tokenizer_instance is None:
+        raise ValueError("The token splitter requires a tokenizer")
+
+    text_docs = [
+        (doc_key, doc["content"])
+        for doc_key, doc in new_docs.items()
+        if doc.get("type") == "text"
+    ]
+    if executor is not None or (max_workers > 1 and len(text_docs) > 1):
+        text_chunks = await _chunk_in_processes(
+            text_docs,
+            chunk_size,
+            chunk_overlap,
+            tokenizer_instance,
+            progress_bar,
+            splitter,
+            max_workers,
+            executor,
+            docs_per_shard,
+        )
+    else:
+        text_chunks = {}
+        cur_index = 1
+        async for doc_key, content in tqdm_async(
+            text_docs, desc="[1/4]Chunking documents", unit="doc"
+        ):
+            text_chunks[doc_key] = _chunk_text_document(
+                doc_key,
+                content,
+                chunk_size,
+                chunk_overlap,
+                tokenizer_instance,
+                splitter,
+            )
+            if progress_bar is not None:
+                progress_bar(cur_index / len(text_docs), f"Chunking {doc_key}")
+                cur_index += 1
+
     inserting_chunks = {}
-    cur_index = 1
-    doc_number = len(new_docs)
-    async for doc_key, doc in tqdm_async(
-        new_docs.items(), desc="[1/4]Chunking documents", unit="doc"
-    ):
+    for doc_key, doc in new_docs.items():
         doc_type = doc.get("type")
         if doc_type == "text":
-            doc_language = detect_main_language(doc["content"])
-            text_chunks = split_chunks(
-                doc["content"],
-                language=doc_language,
-                chunk_size=chunk_size,
-                chunk_overlap=chunk_overlap,
-            )
-
-            chunks = {
-                compute_content_hash(txt, prefix="chunk-"): {
-                    "content": txt,
-                    "type": "text",
-                    "full_doc_id": doc_key,
-                    "length": len(tokenizer_instance.encode(txt))
-                    if tokenizer_instance
-                    else len(txt),
-                    "language": doc_language,
-                }
-                for txt in text_chunks
-            }
+            inserting_chunks.update(text_chunks[doc_key])
         else:
-            chunks = {doc_key.replace("doc-", f"{doc_type}-"): {**doc}}
+            inserting_chunks[doc_key.replace("doc-", f"{doc_type}-")] = {**doc}
+    return inserting_chunks
 
-        inserting_chunks.update(chunks)
 
-        if progress_bar is not None:
-            progress_bar(cur_index / doc_number, f"Chunking {doc_key}")
-            cur_index += 1
+async def _chunk_in_processes(
+    text_docs: List[Tuple[str, str]],
+    chunk_size: int,
+    chunk_overlap: int,
+    tokenizer_instance: Optional[Tokenizer],
+    progress_bar,
+    splitter: str,
+    max_workers: int,
+    executor: Optional[ProcessPoolExecutor],
+    docs_per_shard: int,
+) -> dict:
+    """
+    Shard the documents across worker processes, shards are merged back in document order.
+    :return: {doc_key: chunks of the document}
+    """
+    own_executor = executor is None
+    if own_executor:
+        executor = create_chunking_executor(max_workers, tokenizer_instance)
+    shards = [
+        text_docs[start : start + docs_per_shard]
+        for start in range(0, len(text_docs), docs_per_shard)
+    ]
+    try:
+        loop = asyncio.get_running_loop()
+        futures = [
+            loop.run_in_executor(
+                executor, _chunk_shard, shard, chunk_size, chunk_overlap, splitter
+            )
+            for shard in shards
+        ]
+        n_done = 0
+        with tqdm_async(
+            total=len(text_docs), desc="[1/4]Chunking documents", unit="doc"
+        ) as pbar:
+            for future in asyncio.as_completed(futures):
+                n_done += len(await future)
+                pbar.update(n_done - pbar.n)
+                if progress_bar is not None:
+                    progress_bar(
+                        n_done / len(text_docs),
+                        f"Chunking {n_done}/{len(text_docs)} documents",
+                    )
+    finally:
+        if own_executor:
+            executor.shutdown(wait=False, cancel_futures=True)
 
-    return inserting_chunks
+    return {
+        doc_key: chunks
+        for shard, future in zip(shards, futures)
+        for (doc_key, _), chunks in zip(shard, future.result())
+    }
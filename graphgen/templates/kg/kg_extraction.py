@@ -179,29 +179,58 @@ CONTINUE_EN: str = """MANY entities and relationships were missed in the last ex
 Add them below using the same format:
 """
 
-CONTINUE_ZH: str = """很多实体和关系在上一次的提取中可能被遗漏了。请在下面使用相同的格式添加它们："""
+CONTINUE_ZH: str = (
+    """很多实体和关系在上一次的提取中可能被遗漏了。请在下面使用相同的格式添加它们："""
+)
 
 IF_LOOP_EN: str = """It appears some entities and relationships may have still been missed.  \
 Answer YES | NO if there are still entities and relationships that need to be added.
 """
 
-IF_LOOP_ZH: str = """看起来可能仍然遗漏了一些实体和关系。如果仍有实体和关系需要添加，请回答YES | NO。"""
+IF_LOOP_ZH: str = (
+    """看起来可能仍然遗漏了一些实体和关系。如果仍有实体和关系需要添加，请回答YES | NO。"""
+)
+
+CONTINUE_OR_DONE_EN: str = """MANY entities and relationships may have been missed in the last extraction.  \
+Add them below using the same format. If no entities or relationships are missing any more, \
+output {done_delimiter} after the last record you add, or only {done_delimiter} if nothing was missed.
+"""
+
+CONTINUE_OR_DONE_ZH: str = """很多实体和关系在上一次的提取中可能被遗漏了。请在下面使用相同的格式添加它们。\
+如果已经没有遗漏的实体和关系，请在添加的最后一条记录之后输出{done_delimiter}；如果没有任何遗漏，只输出{done_delimiter}。"""
+
+PACKED_TEXT_EN: str = """The text packs {n_documents} independent documents, each one starting with a line "[document <document_id>]".
+Extract the entities and relationships of every document separately, a relationship never links entities of two different documents.
+Before the records of a document, output ("document"{tuple_delimiter}<document_id>){record_delimiter}, also for a document without any record.
+
+{documents}"""
+
+PACKED_TEXT_ZH: str = """该文本包含{n_documents}篇相互独立的文档，每篇文档以一行"[document <document_id>]"开头。
+请分别提取每篇文档中的实体和关系，关系不能连接不同文档中的实体。
+在每篇文档的记录之前输出("document"{tuple_delimiter}<document_id>){record_delimiter}，没有任何记录的文档也要输出。
+
+{documents}"""
 
 KG_EXTRACTION_PROMPT: dict = {
     "en": {
         "TEMPLATE": TEMPLATE_EN,
         "CONTINUE": CONTINUE_EN,
         "IF_LOOP": IF_LOOP_EN,
+        "CONTINUE_OR_DONE": CONTINUE_OR_DONE_EN,
+        "PACKED_TEXT": PACKED_TEXT_EN,
     },
     "zh": {
         "TEMPLATE": TEMPLATE_ZH,
         "CONTINUE": CONTINUE_ZH,
         "IF_LOOP": IF_LOOP_ZH,
+        "CONTINUE_OR_DONE": CONTINUE_OR_DONE_ZH,
+        "PACKED_TEXT": PACKED_TEXT_ZH,
     },
     "FORMAT": {
         "tuple_delimiter": "<|>",
         "record_delimiter": "##",
         "completion_delimiter": "<|COMPLETE|>",
+        "done_delimiter": "<|DONE|>",
         "entity_types": "concept, date, location, keyword, organization, person, event, work, nature, artificial, \
 science, technology, mission, gene",
     },
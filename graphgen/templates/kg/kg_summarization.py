@@ -1,3 +1,4 @@
+# pylint: disable=C0301
 TEMPLATE_EN = """You are an NLP expert responsible for generating a comprehensive summary of the data provided below.
 Given one entity or relationship, and a list of descriptions, all related to the same entity or relationship.
 Please concatenate all of these into a single, comprehensive description. Make sure to include information collected from all the descriptions.
@@ -28,10 +29,58 @@ TEMPLATE_ZH = """你是一个NLP专家，负责根据以下提供的数据生成
 输出：
 """
 
+BATCH_TEMPLATE_EN = """You are an NLP expert responsible for generating comprehensive summaries of the data provided below.
+Given several numbered items, each one is an entity or relationship with a list of descriptions, all related to that same entity or relationship.
+For every item, please concatenate all of its descriptions into a single, comprehensive description. Make sure to include information collected from all the descriptions of the item.
+If the provided descriptions are contradictory, please resolve the contradictions and provide a single, coherent summary.
+Make sure it is written in third person, and include the entity names so we the have full context.
+Use English as output language.
+Summarize every item independently, and format each summary as ("summary"{tuple_delimiter}<item number>{tuple_delimiter}<summary>).
+Use **{record_delimiter}** as the list delimiter, and output {completion_delimiter} when finished.
+
+#######
+-Data-
+{items}
+#######
+Output:
+"""
+
+BATCH_TEMPLATE_ZH = """你是一个NLP专家，负责根据以下提供的数据生成综合摘要。
+给定若干个编号的条目，每个条目是一个实体或关系，以及一系列描述，这些描述都与该实体或关系相关。
+请将每个条目的所有描述整合成一个综合描述。确保包含该条目所有描述中收集的信息。
+如果提供的描述是矛盾的，请解决这些矛盾并提供一个连贯的总结。
+确保以第三人称写作，并包含实体名称，以便我们有完整的上下文。
+使用中文作为输出语言。
+请独立总结每个条目，每个摘要的格式为("summary"{tuple_delimiter}<条目编号>{tuple_delimiter}<摘要>)。
+使用**{record_delimiter}**作为列表分隔符，完成后输出{completion_delimiter}。
+
+#######
+-数据-
+{items}
+#######
+输出：
+"""
+
+BATCH_ITEM_EN = """[{index}]
+Entities: {entity_name}
+Description List: {description_list}"""
+
+BATCH_ITEM_ZH = """[{index}]
+实体：{entity_name}
+描述列表：{description_list}"""
+
 
 KG_SUMMARIZATION_PROMPT = {
-    "zh": {"TEMPLATE": TEMPLATE_ZH},
-    "en": {"TEMPLATE": TEMPLATE_EN},
+    "zh": {
+        "TEMPLATE": TEMPLATE_ZH,
+        "BATCH_TEMPLATE": BATCH_TEMPLATE_ZH,
+        "BATCH_ITEM": BATCH_ITEM_ZH,
+    },
+    "en": {
+        "TEMPLATE": TEMPLATE_EN,
+        "BATCH_TEMPLATE": BATCH_TEMPLATE_EN,
+        "BATCH_ITEM": BATCH_ITEM_EN,
+    },
     "FORMAT": {
         "tuple_delimiter": "<|>",
         "record_delimiter": "##",
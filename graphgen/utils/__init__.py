@@ -2,6 +2,7 @@ from .calculate_confidence import yes_no_loss_entropy
 from .detect_lang import detect_if_chinese, detect_main_language
 from .device import pick_device
 from .format import (
+    clean_str,
     handle_single_entity_extraction,
     handle_single_relationship_extraction,
     load_json,
@@ -11,7 +12,15 @@ from .format import (
 )
 from .hash import compute_args_hash, compute_content_hash, compute_mm_hash
 from .help_nltk import NLTKHelper
+from .keyed_lock import KeyedLock
 from .log import logger, parse_log, set_logger
 from .loop import create_event_loop
-from .run_concurrent import run_concurrent
+from .micro_batch import MicroBatcher
+from .run_concurrent import (
+    DEFAULT_MAX_IN_FLIGHT,
+    TaskResult,
+    iter_concurrent,
+    prefetch,
+    run_concurrent,
+)
 from .wrap import async_to_sync_method
@@ -88,5 +88,8 @@ def load_json(file_name):
 def write_json(json_obj, file_name):
     if not os.path.exists(os.path.dirname(file_name)):
         os.makedirs(os.path.dirname(file_name), exist_ok=True)
-    with open(file_name, "w", encoding="utf-8") as f:
+    # write to a temporary file first so a crash never leaves a truncated file behind
+    tmp_file_name = f"{file_name}.tmp"
+    with open(tmp_file_name, "w", encoding="utf-8") as f:
         json.dump(json_obj, f, indent=4, ensure_ascii=False)
+    os.replace(tmp_file_name, file_name)
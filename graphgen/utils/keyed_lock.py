@@ -0,0 +1,69 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Hashable, List
+
+
+class KeyedLock:
+    """
+    Striped per-key async locks.
+    Coroutines holding distinct keys run in parallel unless their keys share a stripe,
+    coroutines holding the same key are serialized.
+    Several keys are acquired in stripe order, so that holders of overlapping key sets
+    cannot deadlock.
+
+    :param n_stripes: number of locks the keys are hashed onto
+    """
+
+    def __init__(self, n_stripes: int = 4096):
+        if n_stripes < 1:
+            raise ValueError(f"n_stripes must be positive, got {n_stripes}")
+        self.n_stripes = n_stripes
+        self._locks: List[asyncio.Lock] = [asyncio.Lock() for _ in range(n_stripes)]
+        self._counters = {"acquisitions": 0, "contended": 0}
+        self._wait_seconds = 0.0
+        self._max_wait_seconds = 0.0
+        self._held = 0
+
+    @property
+    def metrics(self) -> dict:
+        acquisitions = self._counters["acquisitions"]
+        return {
+            **self._counters,
+            "contention_rate": (
+                self._counters["contended"] / acquisitions if acquisitions else 0.0
+            ),
+            "wait_seconds": self._wait_seconds,
+            "max_wait_seconds": self._max_wait_seconds,
+            "held": self._held,
+        }
+
+    def _stripe(self, key: Hashable) -> int:
+        return hash(key) % self.n_stripes
+
+    @asynccontextmanager
+    async def hold(self, *keys: Hashable) -> AsyncIterator[None]:
+        """
+        Hold the locks of all the keys for the duration of the block.
+        """
+        acquired: List[asyncio.Lock] = []
+        try:
+            for stripe in sorted({self._stripe(key) for key in keys}):
+                lock = self._locks[stripe]
+                self._counters["acquisitions"] += 1
+                if lock.locked():
+                    self._counters["contended"] += 1
+                    start = time.perf_counter()
+                    await lock.acquire()
+                    waited = time.perf_counter() - start
+                    self._wait_seconds += waited
+                    self._max_wait_seconds = max(self._max_wait_seconds, waited)
+                else:
+                    await lock.acquire()
+                acquired.append(lock)
+                self._held += 1
+            yield
+        finally:
+            for lock in reversed(acquired):
+                lock.release()
+                self._held -= 1
@@ -0,0 +1,82 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Generic, Hashable, List, Set, TypeVar
+
+from graphgen.utils.log import logger
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class MicroBatcher(Generic[T, R]):
+    """
+    Pack items submitted by concurrent coroutines into batches.
+    Every caller awaits the result of its own item, while flush_fn processes a whole batch at once.
+    Items are grouped per key; a group is flushed as soon as adding an item would exceed the
+    budget, or once no item has been added for max_wait seconds.
+    """
+
+    def __init__(
+        self,
+        flush_fn: Callable[[Hashable, List[T]], Awaitable[List[R]]],
+        budget: int,
+        max_wait: float = 0.05,
+    ):
+        """
+        :param flush_fn: (key, items) -> one result per item, in the same order
+        :param budget: maximum total cost of a batch, an item costlier than the budget is sent alone
+        :param max_wait: seconds a non-full batch waits for more items
+        """
+        self.flush_fn = flush_fn
+        self.budget = budget
+        self.max_wait = max_wait
+        self._pending: Dict[Hashable, List[tuple[T, asyncio.Future]]] = {}
+        self._cost: Dict[Hashable, int] = {}
+        self._timers: Dict[Hashable, asyncio.TimerHandle] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def submit(self, item: T, cost: int = 1, key: Hashable = None) -> R:
+        """
+        Add an item to the batch of its key and wait for its result.
+        """
+        loop = asyncio.get_running_loop()
+        if self._pending.get(key) and self._cost[key] + cost > self.budget:
+            self._flush(key)
+
+        future = loop.create_future()
+        self._pending.setdefault(key, []).append((item, future))
+        self._cost[key] = self._cost.get(key, 0) + cost
+
+        if self._cost[key] >= self.budget:
+            self._flush(key)
+        elif key not in self._timers:
+            self._timers[key] = loop.call_later(self.max_wait, self._flush, key)
+        return await future
+
+    def _flush(self, key: Hashable) -> None:
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        entries = self._pending.pop(key, [])
+        self._cost.pop(key, None)
+        if not entries:
+            return
+        task = asyncio.get_running_loop().create_task(self._run(key, entries))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, key: Hashable, entries: List[tuple[T, asyncio.Future]]):
+        try:
+            results = await self.flush_fn(key, [item for item, _ in entries])
+            if len(results) != len(entries):
+                raise ValueError(
+                    f"flush_fn returned {len(results)} results for {len(entries)} items"
+                )
+        except Exception as e:  # pylint: disable=broad-except
+            logger.exception("Batch of %d items failed: %s", len(entries), e)
+            for _, future in entries:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(entries, results):
+            if not future.done():
+                future.set_result(result)
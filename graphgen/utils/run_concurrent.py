@@ -1,5 +1,20 @@
 import asyncio
-from typing import Awaitable, Callable, List, Optional, TypeVar
+from dataclasses import dataclass
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Generic,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    TypeVar,
+    Union,
+)
 
 import gradio as gr
 from tqdm.asyncio import tqdm as tqdm_async
@@ -9,118 +24,209 @@ from graphgen.utils.log import logger
 T = TypeVar("T")
 R = TypeVar("R")
 
-
-# async def run_concurrent(
-#     coro_fn: Callable[[T], Awaitable[R]],
-#     items: List[T],
-#     *,
-#     desc: str = "processing",
-#     unit: str = "item",
-#     progress_bar: Optional[gr.Progress] = None,
-# ) -> List[R]:
-#     tasks = [asyncio.create_task(coro_fn(it)) for it in items]
-#
-#     results = []
-#     async for future in tqdm_async(
-#         tasks, desc=desc, unit=unit
-#     ):
-#         try:
-#             result = await future
-#             results.append(result)
-#         except Exception as e: # pylint: disable=broad-except
-#             logger.exception("Task failed: %s", e)
-#
-#         if progress_bar is not None:
-#             progress_bar((len(results)) / len(items), desc=desc)
-#
-#     if progress_bar is not None:
-#         progress_bar(1.0, desc=desc)
-#     return results
-
-#     results = await tqdm_async.gather(*tasks, desc=desc, unit=unit)
-#
-#     ok_results = []
-#     for idx, res in enumerate(results):
-#         if isinstance(res, Exception):
-#             logger.exception("Task failed: %s", res)
-#             if progress_bar:
-#                 progress_bar((idx + 1) / len(items), desc=desc)
-#             continue
-#         ok_results.append(res)
-#         if progress_bar:
-#             progress_bar((idx + 1) / len(items), desc=desc)
-#
-#     if progress_bar:
-#         progress_bar(1.0, desc=desc)
-#     return ok_results
-
-# async def run_concurrent(
-#         coro_fn: Callable[[T], Awaitable[R]],
-#         items: List[T],
-#         *,
-#         desc: str = "processing",
-#         unit: str = "item",
-#         progress_bar: Optional[gr.Progress] = None,
-# ) -> List[R]:
-#     tasks = [asyncio.create_task(coro_fn(it)) for it in items]
-#
-#     results = []
-#     # 使用同步方式更新进度条，避免异步冲突
-#     for i, task in enumerate(asyncio.as_completed(tasks)):
-#         try:
-#             result = await task
-#             results.append(result)
-#             # 同步更新进度条
-#             if progress_bar is not None:
-#                 # 在同步上下文中更新进度
-#                 progress_bar((i + 1) / len(items), desc=desc)
-#         except Exception as e:
-#             logger.exception("Task failed: %s", e)
-#             results.append(e)
-#
-#     return results
-
-
-async def run_concurrent(
+# Upper bound of coroutines alive at the same time, unless the caller overrides it.
+DEFAULT_MAX_IN_FLIGHT: int = 256
+
+
+@dataclass
+class TaskResult(Generic[T, R]):
+    """
+    Outcome of a single item processed by iter_concurrent.
+    Exactly one of `result` and `error` is meaningful, check `ok` to tell them apart.
+    """
+
+    index: int
+    item: T
+    result: Optional[R] = None
+    error: Optional[BaseException] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+async def _as_async_iter(
+    items: Union[Iterable[T], AsyncIterable[T]],
+) -> AsyncIterator[T]:
+    if hasattr(items, "__aiter__"):
+        async for it in items:
+            yield it
+    else:
+        for it in items:
+            yield it
+
+
+async def prefetch(
+    items: Union[Iterable[T], AsyncIterable[T]], maxsize: int
+) -> AsyncIterator[T]:
+    """
+    Pull items from the (async) iterable in a background task into a bounded queue.
+    The producer runs ahead of the consumer by at most maxsize items,
+    so a slow producer (e.g. a partitioner) overlaps with a slow consumer (e.g. LLM calls).
+    An exception raised by the producer is re-raised to the consumer.
+
+    :param items: iterable or async iterable of items
+    :param maxsize: maximum number of items buffered ahead of the consumer
+    :return: async iterator over the same items, in the same order
+    """
+    if maxsize < 1:
+        raise ValueError(f"maxsize must be positive, got {maxsize}")
+    queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+    done = object()
+
+    async def _produce():
+        try:
+            async for it in _as_async_iter(items):
+                await queue.put((it, None))
+            await queue.put((done, None))
+        except Exception as e:  # pylint: disable=broad-except
+            await queue.put((done, e))
+
+    producer = asyncio.create_task(_produce())
+    try:
+        while True:
+            it, error = await queue.get()
+            if it is done:
+                if error is not None:
+                    raise error
+                break
+            yield it
+    finally:
+        producer.cancel()
+
+
+async def iter_concurrent(  # pylint: disable=too-many-branches
     coro_fn: Callable[[T], Awaitable[R]],
-    items: List[T],
+    items: Union[Iterable[T], AsyncIterable[T]],
     *,
+    max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+    ordered: bool = False,
+    total: Optional[int] = None,
     desc: str = "processing",
     unit: str = "item",
     progress_bar: Optional[gr.Progress] = None,
-) -> List[R]:
-    tasks = [asyncio.create_task(coro_fn(it)) for it in items]
-
-    completed_count = 0
-    results = []
-
-    pbar = tqdm_async(total=len(items), desc=desc, unit=unit)
-
-    if progress_bar is not None:
-        progress_bar(0.0, desc=f"{desc} (0/{len(items)})")
-
-    for future in asyncio.as_completed(tasks):
+) -> AsyncIterator[TaskResult[T, R]]:
+    """
+    Run coro_fn over items with at most max_in_flight coroutines alive at once.
+    Items are pulled lazily from the (async) iterable, so only the current window is materialized.
+    A slot is refilled only after its result has been handed to the consumer,
+    which back-pressures the producer when the consumer is slow.
+
+    :param coro_fn: coroutine function applied to each item
+    :param items: iterable or async iterable of items
+    :param max_in_flight: maximum number of items being processed or buffered at the same time
+    :param ordered: yield results in input order instead of completion order
+    :param total: number of items, used for progress reporting (inferred from len() if possible)
+    :param desc: description of the progress bar
+    :param unit: unit of the progress bar
+    :param progress_bar: gradio progress bar
+    :return: async iterator of TaskResult, failed items carry the raised exception in `error`
+    """
+    if max_in_flight < 1:
+        raise ValueError(f"max_in_flight must be positive, got {max_in_flight}")
+    if total is None and hasattr(items, "__len__"):
+        total = len(items)
+
+    async def _run(index: int, item: T) -> TaskResult[T, R]:
         try:
-            result = await future
-            results.append(result)
+            return TaskResult(index=index, item=item, result=await coro_fn(item))
         except Exception as e:  # pylint: disable=broad-except
-            logger.exception("Task failed: %s", e)
-            # even if failed, record it to keep results consistent with tasks
-            results.append(e)
-
-        completed_count += 1
-        pbar.update(1)
-
-        if progress_bar is not None:
-            progress = completed_count / len(items)
-            progress_bar(progress, desc=f"{desc} ({completed_count}/{len(items)})")
-
-    pbar.close()
+            logger.exception("Task %d failed: %s", index, e)
+            return TaskResult(index=index, item=item, error=e)
+
+    source = _as_async_iter(items)
+    pending: Set[asyncio.Task] = set()
+    reorder_buffer: Dict[int, TaskResult[T, R]] = {}
+    submitted = 0
+    next_to_yield = 0
+    completed = 0
+    exhausted = False
+
+    pbar = tqdm_async(total=total, desc=desc, unit=unit)
+    if progress_bar is not None:
+        progress_bar(0.0, desc=f"{desc} (0/{total or '?'})")
+
+    try:
+        while True:
+            while not exhausted and len(pending) + len(reorder_buffer) < max_in_flight:
+                try:
+                    item = await source.__anext__()
+                except StopAsyncIteration:
+                    exhausted = True
+                    break
+                pending.add(asyncio.create_task(_run(submitted, item)))
+                submitted += 1
+
+            if not pending:
+                break
+
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in sorted(done, key=lambda t: t.result().index):
+                res = task.result()
+                completed += 1
+                pbar.update(1)
+                if progress_bar is not None and total:
+                    progress_bar(
+                        completed / total, desc=f"{desc} ({completed}/{total})"
+                    )
+
+                if not ordered:
+                    yield res
+                    continue
+                reorder_buffer[res.index] = res
+                while next_to_yield in reorder_buffer:
+                    yield reorder_buffer.pop(next_to_yield)
+                    next_to_yield += 1
+    finally:
+        for task in pending:
+            task.cancel()
+        pbar.close()
 
     if progress_bar is not None:
         progress_bar(1.0, desc=f"{desc} (completed)")
 
-    # filter out exceptions
-    results = [res for res in results if not isinstance(res, Exception)]
 
+async def run_concurrent(
+    coro_fn: Callable[[T], Awaitable[R]],
+    items: Union[Iterable[T], AsyncIterable[T]],
+    *,
+    max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+    ordered: bool = False,
+    total: Optional[int] = None,
+    desc: str = "processing",
+    unit: str = "item",
+    progress_bar: Optional[gr.Progress] = None,
+    failures: Optional[List[TaskResult[T, Any]]] = None,
+) -> List[R]:
+    """
+    Collect the successful results of iter_concurrent into a list.
+
+    :param failures: if given, failed TaskResults are appended to it
+    :return: results of the items that succeeded
+    """
+    results = []
+    n_failed = 0
+    async for res in iter_concurrent(
+        coro_fn,
+        items,
+        max_in_flight=max_in_flight,
+        ordered=ordered,
+        total=total,
+        desc=desc,
+        unit=unit,
+        progress_bar=progress_bar,
+    ):
+        if res.ok:
+            results.append(res.result)
+            continue
+        n_failed += 1
+        if failures is not None:
+            failures.append(res)
+
+    if n_failed:
+        logger.warning(
+            "%s: %d of %d tasks failed", desc, n_failed, n_failed + len(results)
+        )
     return results
@@ -0,0 +1,226 @@
+import asyncio
+import re
+import tempfile
+
+import pytest
+
+from graphgen.bases import BaseTokenizer, Chunk
+from graphgen.models import LightRAGKGBuilder, NetworkXStorage
+
+
+class _CharTokenizer(BaseTokenizer):
+    def encode(self, text):
+        return [ord(c) for c in text]
+
+    def decode(self, token_ids):
+        return "".join(chr(t) for t in token_ids)
+
+
+class _FakeLLM:
+    def __init__(self):
+        self.tokenizer = _CharTokenizer()
+        self.prompts = []
+        self.answer = "single"
+
+    async def generate_answer(self, text, history=None):
+        self.prompts.append(text)
+        if "numbered items" in text:
+            # answer every item but the second one
+            indices = [int(i) for i in re.findall(r"^\[(\d+)\]$", text, re.M)]
+            return "##".join(
+                f'("summary"<|>{i}<|>batched {i})' for i in indices if i != 2
+            )
+        return self.answer
+
+
+@pytest.mark.asyncio
+async def test_batched_summary_falls_back_for_unparsed_items():
+    llm = _FakeLLM()
+    builder = LightRAGKGBuilder(llm, summary_mode="batch", summary_batch_tokens=1000)
+    names = ["A", "B", "C"]
+    summaries = await asyncio.gather(
+        *(
+            builder._handle_kg_summary(  # pylint: disable=protected-access
+                name, "<SEP>".join([f"{name} is long"] * 30), max_summary_tokens=100
+            )
+            for name in names
+        )
+    )
+
+    assert summaries == ["batched 1", "single", "batched 3"]
+    # one packed prompt, one individual fallback
+    assert len(llm.prompts) == 2
+
+
+@pytest.mark.asyncio
+async def test_short_description_is_not_summarized():
+    llm = _FakeLLM()
+    builder = LightRAGKGBuilder(llm, summary_mode="batch")
+    assert (
+        await builder._handle_kg_summary(  # pylint: disable=protected-access
+            "A", "short"
+        )
+        == "short"
+    )
+    assert not llm.prompts
+
+
+@pytest.mark.asyncio
+async def test_deferred_summary_only_resummarizes_after_enough_new_material():
+    llm = _FakeLLM()
+    llm.answer = "s" * 48
+    builder = LightRAGKGBuilder(
+        llm, defer_summary=True, max_summary_tokens=50, resummary_tokens=20
+    )
+
+    async def _merge(descriptions):
+        existing = await storage.get_node("A")
+        merged = await builder.merge_nodes(
+            (
+                "A",
+                [
+                    {"entity_type": "T", "description": d, "source_id": "c"}
+                    for d in descriptions
+                ],
+            ),
+            existing,
+        )
+        await storage.upsert_node("A", merged)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        storage = NetworkXStorage(tmpdir, namespace="graph")
+        await _merge(["x" * 30])
+        await _merge(["y" * 30])
+        # merging only appends and counts tokens, no LLM call yet
+        assert not llm.prompts
+        node = await storage.get_node("A")
+        assert node["description"] == "x" * 30 + "<SEP>" + "y" * 30
+        assert node["description_tokens"] == 65
+        assert node["unsummarized_tokens"] == 60
+
+        await builder.summarize_pending(storage)
+        assert len(llm.prompts) == 1
+        node = await storage.get_node("A")
+        assert node["description"] == "s" * 48
+        assert node["unsummarized_tokens"] == 0
+
+        # a small new mention is appended without summarizing again
+        await _merge(["z" * 10])
+        await builder.summarize_pending(storage)
+        assert len(llm.prompts) == 1
+        node = await storage.get_node("A")
+        assert node["description_tokens"] == 48 + 5 + 10
+        assert node["unsummarized_tokens"] == 10
+
+        # enough new material triggers a new summary
+        await _merge(["w" * 10])
+        await builder.summarize_pending(storage)
+        assert len(llm.prompts) == 2
+
+
+class _ScriptedLLM:
+    def __init__(self, answers):
+        self.tokenizer = _CharTokenizer()
+        self.answers = list(answers)
+        self.prompts = []
+
+    async def generate_answer(self, text, history=None):
+        self.prompts.append(text)
+        return self.answers.pop(0)
+
+
+def _entity(name):
+    return f'("entity"<|>{name}<|>concept<|>{name} is a concept)'
+
+
+@pytest.mark.asyncio
+async def test_single_call_gleaning_stops_on_done_marker():
+    llm = _ScriptedLLM(
+        [
+            _entity("A") + "<|COMPLETE|>",
+            _entity("B") + "##" + _entity("A") + "<|DONE|>",
+        ]
+    )
+    builder = LightRAGKGBuilder(llm, max_loop=3, glean_mode="single")
+    nodes, _ = await builder.extract(Chunk(id="c1", content="A and B.", type="text"))
+
+    assert set(nodes) == {"A", "B"}
+    assert len(nodes["A"]) == 1
+    assert len(llm.prompts) == 2
+
+
+@pytest.mark.asyncio
+async def test_single_call_gleaning_stops_when_nothing_new():
+    llm = _ScriptedLLM(
+        [_entity("A") + "<|COMPLETE|>", _entity("A") + "<|COMPLETE|>", "unused"]
+    )
+    builder = LightRAGKGBuilder(llm, max_loop=3, glean_mode="single")
+    nodes, _ = await builder.extract(Chunk(id="c1", content="A.", type="text"))
+
+    assert list(nodes) == ["A"]
+    assert len(llm.prompts) == 2
+
+
+@pytest.mark.asyncio
+async def test_gleaning_rounds_scale_with_chunk_tokens():
+    llm = _ScriptedLLM(
+        [_entity("A") + "<|COMPLETE|>"]
+        + [_entity(name) + "<|COMPLETE|>" for name in "BCDE"]
+    )
+    builder = LightRAGKGBuilder(llm, max_loop=3, glean_mode="single", loop_tokens=10)
+    nodes, _ = await builder.extract(Chunk(id="c1", content="A, B and C.", type="text"))
+
+    # 11 characters, so two gleaning rounds
+    assert set(nodes) == {"A", "B", "C"}
+    assert len(llm.prompts) == 3
+
+
+@pytest.mark.asyncio
+async def test_packed_extraction_attributes_records_to_their_chunks():
+    llm = _ScriptedLLM(
+        [
+            '("document"<|>1)##'
+            + _entity("A")
+            + '##("document"<|>3)##'
+            + _entity("C")
+            + "##"
+            + _entity("A")
+            + "<|COMPLETE|>",
+            _entity("B") + "<|COMPLETE|>",
+        ]
+    )
+    builder = LightRAGKGBuilder(llm, max_loop=0, pack_tokens=1000)
+    results = await asyncio.gather(
+        *(
+            builder.extract(Chunk(id=f"c{i}", content=f"{name}.", type="text"))
+            for i, name in enumerate("ABC", start=1)
+        )
+    )
+
+    assert [sorted(nodes) for nodes, _ in results] == [["A"], ["B"], ["A", "C"]]
+    assert results[2][0]["A"][0]["source_id"] == "c3"
+    # one packed prompt, one fallback for the chunk missing from the answer
+    assert len(llm.prompts) == 2
+    assert "[document 2]" in llm.prompts[0]
+
+
+@pytest.mark.asyncio
+async def test_packed_extraction_is_not_gleaned():
+    llm = _ScriptedLLM(
+        [
+            '("document"<|>1)##'
+            + _entity("A")
+            + '##("document"<|>2)##'
+            + _entity("A")
+            + "<|COMPLETE|>",
+        ]
+    )
+    builder = LightRAGKGBuilder(llm, max_loop=3, glean_mode="single", pack_tokens=1000)
+    results = await asyncio.gather(
+        builder.extract(Chunk(id="c1", content="A.", type="text")),
+        builder.extract(Chunk(id="c2", content="A again.", type="text")),
+    )
+
+    # the same record in two documents is kept for both of them
+    assert [nodes["A"][0]["source_id"] for nodes, _ in results] == ["c1", "c2"]
+    assert len(llm.prompts) == 1
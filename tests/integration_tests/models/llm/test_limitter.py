@@ -0,0 +1,66 @@
+import asyncio
+import time
+
+import pytest
+
+from graphgen.models.llm.limitter import TPM, AdaptiveConcurrencyLimiter, TokenBucket
+
+
+@pytest.mark.asyncio
+async def test_bucket_refills_continuously():
+    bucket = TokenBucket(capacity=10, refill_per_second=100)
+    start = time.monotonic()
+    for _ in range(30):
+        await bucket.acquire(1)
+    elapsed = time.monotonic() - start
+    # 10 tokens come from the initial burst, the other 20 need ~0.2s of refill
+    assert 0.15 <= elapsed < 1.0
+
+
+@pytest.mark.asyncio
+async def test_waiters_are_served_in_fifo_order():
+    bucket = TokenBucket(capacity=5, refill_per_second=50)
+    await bucket.acquire(5)
+    order = []
+
+    async def _take(name: str, amount: int):
+        await bucket.acquire(amount)
+        order.append(name)
+
+    await asyncio.gather(_take("big", 5), _take("small-1", 1), _take("small-2", 1))
+    assert order == ["big", "small-1", "small-2"]
+
+
+@pytest.mark.asyncio
+async def test_tpm_reconcile_returns_unused_tokens():
+    tpm = TPM(6000)
+    await tpm.wait(5000)
+    assert tpm.level == pytest.approx(1000, abs=50)
+    tpm.reconcile(estimated_tokens=5000, actual_tokens=1000)
+    assert tpm.level == pytest.approx(5000, abs=50)
+    tpm.reconcile(estimated_tokens=1000, actual_tokens=3000)
+    assert tpm.level == pytest.approx(3000, abs=50)
+
+
+@pytest.mark.asyncio
+async def test_adaptive_limiter_grows_and_backs_off():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=2, max_limit=64)
+    peak = 0
+
+    async def _request(overload: bool = False):
+        nonlocal peak
+        started_at = await limiter.acquire()
+        peak = max(peak, limiter.metrics["in_flight"])
+        await asyncio.sleep(0.001)
+        await limiter.release(started_at, success=not overload, overloaded=overload)
+
+    await asyncio.gather(*[_request() for _ in range(200)])
+    grown = limiter.limit
+    assert grown > 2
+    assert peak <= grown
+
+    # a burst of overloads from the same round only cuts the limit once
+    await asyncio.gather(*[_request(overload=True) for _ in range(min(grown, 8))])
+    assert limiter.limit == max(1, int(grown * 0.5))
+    assert limiter.metrics["decreases"] == 1
+    assert limiter.metrics["queue_depth"] == 0
@@ -0,0 +1,56 @@
+import time
+
+from graphgen.models import LLMResponseCache
+
+
+def _request(content: str, temperature: float = 0.0) -> dict:
+    return {
+        "messages": [{"role": "user", "content": content}],
+        "temperature": temperature,
+        "top_p": 0.95,
+        "max_tokens": 16,
+    }
+
+
+def test_hit_and_miss_persist_across_instances(tmp_path):
+    cache = LLMResponseCache(str(tmp_path))
+    key = cache.make_key("gpt-4o-mini", _request("hello"))
+    assert cache.get(key) is None
+    cache.set(key, "world")
+    assert cache.get(key) == "world"
+    assert cache.stats["hits"] == 1 and cache.stats["misses"] == 1
+    cache.close()
+
+    reopened = LLMResponseCache(str(tmp_path))
+    assert reopened.get(key) == "world"
+    reopened.close()
+
+
+def test_key_depends_on_model_and_sampling_params():
+    base = LLMResponseCache.make_key("m1", _request("hello"))
+    assert base == LLMResponseCache.make_key("m1", _request("hello"))
+    assert base != LLMResponseCache.make_key("m2", _request("hello"))
+    assert base != LLMResponseCache.make_key("m1", _request("hello", 1.0))
+    assert base != LLMResponseCache.make_key("m1", _request("hello!"))
+
+
+def test_ttl_eviction(tmp_path):
+    cache = LLMResponseCache(str(tmp_path), ttl_seconds=0.05)
+    cache.set("a", 1)
+    time.sleep(0.1)
+    assert cache.get("a") is None
+    assert cache.stats["evictions"] == 1
+    cache.close()
+
+
+def test_size_eviction_keeps_recently_used(tmp_path):
+    cache = LLMResponseCache(str(tmp_path), max_entries=2)
+    for key in ("b", "c", "d"):
+        cache.set(key, key)
+        time.sleep(0.01)
+    cache.get("b")
+    cache.evict()
+    assert len(cache) == 2
+    assert cache.get("b") == "b"
+    assert cache.get("c") is None
+    cache.close()
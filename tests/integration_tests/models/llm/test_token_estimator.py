@@ -0,0 +1,53 @@
+import pytest
+
+from graphgen.bases import BaseTokenizer
+from graphgen.models.llm.token_estimator import PromptTokenEstimator
+
+
+class _WordTokenizer(BaseTokenizer):
+    def __init__(self):
+        super().__init__()
+        self.encoded = []
+
+    def encode(self, text):
+        self.encoded.append(text)
+        return text.split()
+
+    def decode(self, token_ids):
+        return " ".join(token_ids)
+
+
+def _messages(*contents):
+    return [{"role": "user", "content": content} for content in contents]
+
+
+@pytest.mark.asyncio
+async def test_exact_estimation_encodes_history_turns_once():
+    tokenizer = _WordTokenizer()
+    estimator = PromptTokenEstimator(tokenizer, mode="exact")
+    history = _messages("a b c", "d e")
+
+    assert await estimator.estimate(history + _messages("f")) == 6
+    assert await estimator.estimate(history + _messages("g h")) == 7
+    assert tokenizer.encoded == ["a b c", "d e", "f", "g h"]
+
+
+@pytest.mark.asyncio
+async def test_char_ratio_estimation_does_not_tokenize():
+    tokenizer = _WordTokenizer()
+    estimator = PromptTokenEstimator(tokenizer, mode="char_ratio", chars_per_token=4)
+
+    assert await estimator.estimate(_messages("x" * 10, "y" * 7)) == 5
+    assert not tokenizer.encoded
+
+
+@pytest.mark.asyncio
+async def test_usage_estimation_learns_the_char_ratio():
+    estimator = PromptTokenEstimator(mode="usage", chars_per_token=4, smoothing=0.5)
+    messages = _messages("x" * 100)
+
+    for _ in range(20):
+        estimator.observe(messages, prompt_tokens=50)
+
+    assert estimator.chars_per_token == pytest.approx(2, rel=1e-3)
+    assert await estimator.estimate(messages) == 50
@@ -200,3 +200,40 @@ async def test_ece_max_tokens_limit():
             node_tokens = sum(node_data[n]["length"] for n in c.nodes)
             edge_tokens = sum(edge_lens[e] for e in c.edges)
             assert node_tokens + edge_tokens <= 5000
+
+
+@pytest.mark.asyncio
+async def test_ece_streaming_matches_partition():
+    """iter_partition + iter_community2batch yield the same batches as the eager API."""
+    nodes = [
+        (str(i), {"desc": f"node{i}", "length": 10, "loss": i * 0.1}) for i in range(6)
+    ]
+    edges = [
+        ("0", "1", {"desc": "e01", "loss": 0.05, "length": 5}),
+        ("1", "2", {"desc": "e12", "loss": 0.10, "length": 5}),
+        ("0", "3", {"desc": "e03", "loss": 0.15, "length": 5}),
+        ("1", "4", {"desc": "e14", "loss": 0.20, "length": 5}),
+        ("2", "5", {"desc": "e25", "loss": 0.25, "length": 5}),
+        ("3", "4", {"desc": "e34", "loss": 0.30, "length": 5}),
+        ("4", "5", {"desc": "e45", "loss": 0.35, "length": 5}),
+    ]
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        storage = NetworkXStorage(working_dir=tmpdir, namespace="streaming")
+        for nid, ndata in nodes:
+            await storage.upsert_node(nid, ndata)
+        for src, tgt, edata in edges:
+            await storage.upsert_edge(src, tgt, edata)
+
+        partitioner = ECEPartitioner()
+        params = {"max_units_per_community": 3, "unit_sampling": "min_loss"}
+        communities = await partitioner.partition(storage, **params)
+        batches = await partitioner.community2batch(communities, storage)
+
+        streamed = [
+            batch
+            async for batch in partitioner.iter_community2batch(
+                partitioner.iter_partition(storage, **params), storage, group_size=2
+            )
+        ]
+        assert streamed == batches
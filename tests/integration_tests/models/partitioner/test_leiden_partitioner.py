@@ -0,0 +1,74 @@
+import tempfile
+
+import pytest
+
+from graphgen.models import LeidenPartitioner, NetworkXStorage
+from graphgen.models.partitioner import leiden_partitioner
+
+
+async def _cliques(storage: NetworkXStorage, n_cliques: int, size: int):
+    for c in range(n_cliques):
+        members = [f"c{c}_{i}" for i in range(size)]
+        for i, u in enumerate(members):
+            for v in members[i + 1 :]:
+                await storage.upsert_edge(u, v, {"description": f"{u}-{v}"})
+    await storage.upsert_node("isolated", {"description": "no edges"})
+
+
+@pytest.mark.asyncio
+async def test_leiden_assigns_inner_edges_to_communities():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        storage = NetworkXStorage(working_dir=tmpdir, namespace="cliques")
+        await _cliques(storage, n_cliques=3, size=4)
+
+        communities = await LeidenPartitioner().partition(storage, max_size=None)
+
+        assert sorted(sorted(c.nodes) for c in communities) == [
+            [f"c{c}_{i}" for i in range(4)] for c in range(3)
+        ]
+        for c in communities:
+            assert len(c.edges) == 6
+            assert all(u in c.nodes and v in c.nodes for u, v in c.edges)
+
+
+@pytest.mark.asyncio
+async def test_leiden_process_pool_matches_in_process(monkeypatch):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        storage = NetworkXStorage(working_dir=tmpdir, namespace="cliques")
+        await _cliques(storage, n_cliques=6, size=5)
+
+        inline = await LeidenPartitioner().partition(storage, max_workers=1)
+        monkeypatch.setattr(leiden_partitioner, "_MIN_EDGES_PER_TASK", 10)
+        pooled = await LeidenPartitioner().partition(storage, max_workers=2)
+
+        assert [(c.id, c.nodes, c.edges) for c in inline] == [
+            (c.id, c.nodes, c.edges) for c in pooled
+        ]
+        assert len(inline) == 6
+
+
+@pytest.mark.asyncio
+async def test_leiden_recursive_split_respects_token_budget():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        storage = NetworkXStorage(working_dir=tmpdir, namespace="chain")
+        # a single dense cluster, which Leiden keeps whole
+        members = [f"n{i}" for i in range(12)]
+        for i, u in enumerate(members):
+            await storage.upsert_node(u, {"length": 10})
+            for v in members[i + 1 :]:
+                await storage.upsert_edge(u, v, {"length": 1})
+
+        communities = await LeidenPartitioner().partition(
+            storage,
+            max_size=8,
+            split_mode="recursive",
+            max_tokens_per_community=40,
+        )
+
+        assert sorted(n for c in communities for n in c.nodes) == sorted(members)
+        for c in communities:
+            tokens = 10 * len(c.nodes) + len(c.edges)
+            assert len(c.nodes) <= 8
+            assert tokens <= 40
+            # pieces of a clique keep all their inner edges
+            assert len(c.edges) == len(c.nodes) * (len(c.nodes) - 1) // 2
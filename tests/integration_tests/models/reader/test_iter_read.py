@@ -0,0 +1,64 @@
+import json
+
+import pytest
+
+from graphgen.models import CSVReader, JSONLReader, JSONReader, TXTReader
+from graphgen.models.reader import json_reader
+
+DOCS = [
+    {
+        "type": "text",
+        "content": f'document {i} with "quotes", [brackets] and {{braces}}',
+    }
+    for i in range(7)
+] + [{"type": "text", "content": "   "}]
+
+
+def test_json_reader_parses_the_array_incrementally(tmp_path, monkeypatch):
+    monkeypatch.setattr(json_reader, "_READ_SIZE", 16)
+    path = tmp_path / "docs.json"
+    path.write_text(json.dumps(DOCS, indent=2), encoding="utf-8")
+
+    batches = list(JSONReader().iter_read(str(path), batch_size=3))
+
+    assert [len(batch) for batch in batches] == [3, 3, 1]
+    assert [doc for batch in batches for doc in batch] == DOCS[:7]
+    assert JSONReader().read(str(path)) == DOCS[:7]
+
+
+@pytest.mark.parametrize("content", ["[]", "  [ ]  "])
+def test_json_reader_reads_an_empty_array(tmp_path, content):
+    path = tmp_path / "docs.json"
+    path.write_text(content, encoding="utf-8")
+    assert not list(JSONReader().iter_read(str(path)))
+
+
+def test_json_reader_rejects_a_top_level_object(tmp_path):
+    path = tmp_path / "docs.json"
+    path.write_text(json.dumps({"docs": DOCS}), encoding="utf-8")
+    with pytest.raises(ValueError):
+        JSONReader().read(str(path))
+
+
+def test_line_readers_yield_batches(tmp_path):
+    jsonl_path = tmp_path / "docs.jsonl"
+    jsonl_path.write_text(
+        "\n".join(json.dumps(doc) for doc in DOCS) + "\n", encoding="utf-8"
+    )
+    txt_path = tmp_path / "docs.txt"
+    txt_path.write_text(
+        "\n".join(doc["content"] for doc in DOCS) + "\n", encoding="utf-8"
+    )
+    csv_path = tmp_path / "docs.csv"
+    csv_path.write_text(
+        "type,content\n" + "".join(f"text,doc {i}\n" for i in range(7)),
+        encoding="utf-8",
+    )
+
+    jsonl_batches = list(JSONLReader().iter_read(str(jsonl_path), batch_size=4))
+    assert [len(batch) for batch in jsonl_batches] == [4, 3]
+    txt_batches = list(TXTReader().iter_read(str(txt_path), batch_size=4))
+    assert [len(batch) for batch in txt_batches] == [4, 3]
+    csv_batches = list(CSVReader().iter_read(str(csv_path), batch_size=4))
+    assert [len(batch) for batch in csv_batches] == [4, 3]
+    assert csv_batches[1][-1] == {"type": "text", "content": "doc 6"}
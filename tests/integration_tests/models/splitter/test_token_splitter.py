@@ -0,0 +1,64 @@
+import re
+
+from graphgen.bases import BaseTokenizer
+from graphgen.models.splitter.token_splitter import TokenSplitter
+
+
+class _WordTokenizer(BaseTokenizer):
+    """One token per word, with the whitespace before it."""
+
+    def __init__(self):
+        super().__init__()
+        self.vocab = []
+
+    def encode(self, text):
+        ids = []
+        for piece in re.findall(r"\s*\S+|\s+", text):
+            if piece not in self.vocab:
+                self.vocab.append(piece)
+            ids.append(self.vocab.index(piece))
+        return ids
+
+    def decode(self, token_ids):
+        return "".join(self.vocab[i] for i in token_ids)
+
+
+TEXT = (
+    "GraphGen builds a knowledge graph. It then finds the knowledge gaps of a model. "
+    "Questions are generated for them.\n\n"
+    "Each community of the graph becomes a batch of units, and every batch is sent "
+    "to the model."
+)
+
+
+def test_chunks_end_at_separators_and_map_back_to_the_text():
+    tokenizer = _WordTokenizer()
+    splitter = TokenSplitter(
+        tokenizer, chunk_size=12, chunk_overlap=0, min_chunk_ratio=0.25
+    )
+    spans = splitter.split_spans(TEXT)
+
+    assert [span["content"] for span in spans] == [
+        "GraphGen builds a knowledge graph.",
+        "It then finds the knowledge gaps of a model.",
+        "Questions are generated for them.",
+        "Each community of the graph becomes a batch of units,",
+        "and every batch is sent to the model.",
+    ]
+    for span in spans:
+        assert TEXT[span["start_index"] : span["end_index"]] == span["content"]
+        assert span["tokens"] == len(tokenizer.encode(span["content"]))
+        assert span["tokens"] <= 12
+
+
+def test_overlap_repeats_the_last_tokens():
+    splitter = TokenSplitter(
+        _WordTokenizer(), chunk_size=10, chunk_overlap=3, separators=[]
+    )
+    chunks = splitter.split_text(" ".join(str(i) for i in range(20)))
+
+    assert chunks == [
+        "0 1 2 3 4 5 6 7 8 9",
+        "7 8 9 10 11 12 13 14 15 16",
+        "14 15 16 17 18 19",
+    ]
@@ -0,0 +1,42 @@
+import os
+import tempfile
+
+import pytest
+
+from graphgen.models import JsonKVStorage
+
+
+@pytest.mark.asyncio
+async def test_wal_commit_appends_only_the_delta():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        storage = JsonKVStorage(tmpdir, namespace="chunks", wal=True)
+        await storage.upsert({f"chunk-{i}": {"content": "x" * 100} for i in range(50)})
+        await storage.index_done_callback()
+        snapshot = os.path.join(tmpdir, "chunks.json")
+        wal = os.path.join(tmpdir, "chunks.wal")
+        assert os.path.exists(snapshot) and not os.path.exists(wal)
+
+        snapshot_mtime = os.path.getmtime(snapshot)
+        await storage.upsert({"chunk-new": {"content": "y"}})
+        await storage.index_done_callback()
+        assert os.path.getmtime(snapshot) == snapshot_mtime
+        assert 0 < os.path.getsize(wal) < os.path.getsize(snapshot)
+
+        reloaded = JsonKVStorage(tmpdir, namespace="chunks", wal=True)
+        assert len(await reloaded.all_keys()) == 51
+        assert await reloaded.get_by_id("chunk-new") == {"content": "y"}
+
+
+@pytest.mark.asyncio
+async def test_wal_replays_drop():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        storage = JsonKVStorage(tmpdir, namespace="docs", wal=True)
+        await storage.upsert({"a": {"content": "a"}})
+        await storage.index_done_callback()
+        storage.wal_compact_ratio = 100.0
+        await storage.drop()
+        await storage.upsert({"b": {"content": "b"}})
+        await storage.index_done_callback()
+
+        reloaded = JsonKVStorage(tmpdir, namespace="docs", wal=True)
+        assert await reloaded.all_keys() == ["b"]
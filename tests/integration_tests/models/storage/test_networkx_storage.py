@@ -0,0 +1,150 @@
+import os
+import tempfile
+
+import networkx as nx
+import numpy as np
+import pytest
+
+from graphgen.models import NetworkXStorage
+
+
+async def _fill(storage: NetworkXStorage):
+    await storage.upsert_node(
+        "A", {"entity_type": "PERSON", "description": "a", "source_id": "chunk-1"}
+    )
+    await storage.upsert_node(
+        "B", {"entity_type": "PERSON", "description": "b", "length": 3, "loss": 0.5}
+    )
+    await storage.upsert_edge("A", "B", {"description": "a-b", "loss": 1.25})
+
+
+@pytest.mark.asyncio
+async def test_msgpack_roundtrip():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        storage = NetworkXStorage(working_dir=tmpdir, namespace="graph")
+        await _fill(storage)
+        await storage.index_done_callback()
+        assert os.path.exists(os.path.join(tmpdir, "graph.msgpack"))
+        assert not os.path.exists(os.path.join(tmpdir, "graph.graphml"))
+
+        reloaded = NetworkXStorage(working_dir=tmpdir, namespace="graph")
+        assert await reloaded.get_node("A") == await storage.get_node("A")
+        assert await reloaded.get_node("B") == {
+            "entity_type": "PERSON",
+            "description": "b",
+            "length": 3,
+            "loss": 0.5,
+        }
+        assert await reloaded.get_edge("B", "A") == {
+            "description": "a-b",
+            "loss": 1.25,
+        }
+
+
+@pytest.mark.asyncio
+async def test_legacy_graphml_is_loaded_and_exported():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        graph = nx.Graph()
+        graph.add_node("A", description="a")
+        graph.add_edge("A", "B", description="a-b")
+        nx.write_graphml(graph, os.path.join(tmpdir, "graph.graphml"))
+
+        storage = NetworkXStorage(working_dir=tmpdir, namespace="graph")
+        assert await storage.has_edge("A", "B")
+
+        await storage.index_done_callback()
+        assert os.path.exists(os.path.join(tmpdir, "graph.msgpack"))
+
+        exported = storage.export_graphml(os.path.join(tmpdir, "export.graphml"))
+        assert nx.read_graphml(exported).has_edge("A", "B")
+
+
+@pytest.mark.asyncio
+async def test_wal_replays_uncompacted_mutations():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        storage = NetworkXStorage(working_dir=tmpdir, namespace="graph", wal=True)
+        await _fill(storage)
+        await storage.index_done_callback()  # first commit writes the snapshot
+
+        storage.wal_compact_ratio = 100.0
+        await storage.update_edge("A", "B", {"loss": 2.0})
+        await storage.upsert_node("C", {"description": "c"})
+        await storage.delete_node("A")
+        await storage.index_done_callback()
+        assert os.path.getsize(os.path.join(tmpdir, "graph.wal")) > 0
+
+        # simulate a crash in the middle of the next append
+        with open(os.path.join(tmpdir, "graph.wal"), "ab") as f:
+            f.write(b"\x93\xabupsert_node")
+
+        reloaded = NetworkXStorage(working_dir=tmpdir, namespace="graph", wal=True)
+        assert not await reloaded.has_node("A")
+        assert await reloaded.get_node("C") == {"description": "c"}
+
+        await reloaded.upsert_edge("B", "C", {"description": "b-c"})
+        reloaded.compact()
+        assert not os.path.exists(os.path.join(tmpdir, "graph.wal"))
+        final = NetworkXStorage(working_dir=tmpdir, namespace="graph", wal=True)
+        assert await final.get_edge("C", "B") == {"description": "b-c"}
+
+
+@pytest.mark.asyncio
+async def test_wal_is_not_replayed_over_a_snapshot_that_contains_it():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        storage = NetworkXStorage(working_dir=tmpdir, namespace="graph", wal=True)
+        await _fill(storage)
+        storage.compact()
+
+        storage.wal_compact_ratio = 100.0
+        node_data = {"description": "c"}
+        await storage.upsert_node("C", node_data)
+        node_data["description"] = "changed after the call"
+        await storage.update_node("B", {"loss": 2.0})
+        await storage.delete_node("A")
+        await storage.index_done_callback()
+        wal_file = os.path.join(tmpdir, "graph.wal")
+        with open(wal_file, "rb") as f:
+            log = f.read()
+        # the log holds the data as it was when the mutation was applied
+        replayed = NetworkXStorage(working_dir=tmpdir, namespace="graph", wal=True)
+        assert await replayed.get_node("C") == {"description": "c"}
+
+        # crash after the snapshot was replaced but before the log was dropped
+        storage.compact()
+        with open(wal_file, "wb") as f:
+            f.write(log)
+
+        reloaded = NetworkXStorage(working_dir=tmpdir, namespace="graph", wal=True)
+        assert not await reloaded.has_node("A")
+        assert (await reloaded.get_node("B"))["loss"] == 2.0
+        assert await reloaded.get_node("C") == {"description": "c"}
+
+        # later records still replay after the stale ones
+        await reloaded.upsert_node("D", {"description": "d"})
+        await reloaded.index_done_callback()
+        final = NetworkXStorage(working_dir=tmpdir, namespace="graph", wal=True)
+        assert await final.get_node("D") == {"description": "d"}
+        assert not await final.has_node("A")
+
+
+@pytest.mark.asyncio
+async def test_snapshot_is_cached_until_the_graph_changes():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        storage = NetworkXStorage(tmpdir, namespace="graph")
+        await storage.upsert_node("A", {"length": 3, "loss": 0.5})
+        await storage.upsert_edge("A", "B", {"length": 2})
+        await storage.upsert_edge("C", "A", {"length": 1})
+
+        snapshot = await storage.get_snapshot()
+        assert await storage.get_snapshot() is snapshot
+        assert snapshot.node_ids == ["A", "B", "C"]
+        a = snapshot.node_index["A"]
+        neighbors, edges = snapshot.neighbors(a)
+        assert [snapshot.node_ids[n] for n in neighbors] == ["B", "C"]
+        assert [snapshot.edge_pair(e) for e in edges] == [("A", "B"), ("A", "C")]
+        assert snapshot.unit_length.tolist() == [3, 0, 0, 2, 1]
+        assert snapshot.node_loss[a] == 0.5 and np.isnan(snapshot.edge_loss).all()
+
+        await storage.update_edge("A", "B", {"loss": 1.0})
+        assert (await storage.get_snapshot()) is not snapshot
+        assert (await storage.get_snapshot()).edge_loss[0] == 1.0
@@ -0,0 +1,181 @@
+import tempfile
+
+import numpy as np
+import pytest
+
+from graphgen.bases import GraphSnapshot
+from graphgen.models import NetworkXStorage, SQLiteGraphStorage, SQLiteKVStorage
+
+
+@pytest.mark.asyncio
+async def test_upsert_keeps_existing_values_and_persists():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        storage = SQLiteKVStorage(tmpdir, namespace="chunks")
+        left = await storage.upsert({"a": {"content": "a"}, "b": {"content": "b"}})
+        assert set(left) == {"a", "b"}
+        left = await storage.upsert({"a": {"content": "new"}, "c": {"content": "c"}})
+        assert set(left) == {"c"}
+        await storage.index_done_callback()
+
+        reloaded = SQLiteKVStorage(tmpdir, namespace="chunks")
+        assert sorted(await reloaded.all_keys()) == ["a", "b", "c"]
+        assert await reloaded.get_by_id("a") == {"content": "a"}
+        assert await reloaded.filter_keys(["a", "d"]) == {"d"}
+
+        await reloaded.drop()
+        assert await reloaded.all_keys() == []
+
+
+@pytest.mark.asyncio
+async def test_get_by_ids_projects_fields():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        storage = SQLiteKVStorage(tmpdir, namespace="docs")
+        await storage.upsert(
+            {
+                f"doc-{i}": {
+                    "content": f"text {i}",
+                    "length": i,
+                    "meta": {"tags": ["x", i]},
+                    "flag": i % 2 == 0,
+                }
+                for i in range(2000)
+            }
+        )
+        ids = ["doc-1999", "missing", "doc-0"]
+        assert await storage.get_by_ids(
+            ids, fields={"length", "meta", "flag", "nope"}
+        ) == [
+            {"length": 1999, "meta": {"tags": ["x", 1999]}, "flag": False},
+            None,
+            {"length": 0, "meta": {"tags": ["x", 0]}, "flag": True},
+        ]
+        full = await storage.get_by_ids([f"doc-{i}" for i in range(2000)])
+        assert len(full) == 2000 and full[5]["content"] == "text 5"
+
+
+@pytest.mark.asyncio
+async def test_graph_storage_matches_networkx_semantics():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        storage = SQLiteGraphStorage(tmpdir, namespace="graph")
+        await storage.upsert_node("A", {"entity_type": "person", "length": 3})
+        await storage.upsert_edge("A", "B", {"description": "knows"})
+        await storage.upsert_edge("C", "A", {"description": "likes"})
+        # undirected: the reversed pair hits the same edge and merges its attributes
+        await storage.upsert_edge("B", "A", {"length": 5})
+        await storage.update_node("A", {"loss": 0.5})
+
+        assert await storage.has_node("B")
+        assert await storage.has_edge("B", "A")
+        assert await storage.get_edge("A", "B") == {"description": "knows", "length": 5}
+        assert await storage.get_node("A") == {
+            "entity_type": "person",
+            "length": 3,
+            "loss": 0.5,
+        }
+        assert await storage.node_degree("A") == 2
+        assert await storage.edge_degree("A", "C") == 3
+        assert sorted(e[1] for e in await storage.get_node_edges("A")) == ["B", "C"]
+        assert await storage.get_node_edges("missing") is None
+        await storage.index_done_callback()
+
+        reloaded = SQLiteGraphStorage(tmpdir, namespace="graph")
+        assert [n for n, _ in await reloaded.get_all_nodes()] == ["A", "B", "C"]
+        assert len(await reloaded.get_all_edges()) == 2
+
+        await reloaded.delete_node("A")
+        assert await reloaded.get_all_edges() == []
+        assert await reloaded.node_degree("B") == 0
+        await reloaded.clear()
+        assert await reloaded.get_all_nodes() == []
+
+
+@pytest.mark.asyncio
+async def test_graph_batch_apis_match_networkx():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        backends = [
+            NetworkXStorage(tmpdir, namespace="nx"),
+            SQLiteGraphStorage(tmpdir, namespace="sql"),
+        ]
+        results = []
+        for storage in backends:
+            await storage.upsert_nodes({f"n{i}": {"length": i} for i in range(1000)})
+            await storage.upsert_edges(
+                {(f"n{i}", f"n{i + 1}"): {"description": f"e{i}"} for i in range(999)}
+            )
+            await storage.update_nodes_batch({"n0": {"loss": 1.0}, "ghost": {}})
+            await storage.update_edges_batch({("n1", "n0"): {"loss": 2.0}})
+            results.append(
+                (
+                    await storage.get_nodes(["n0", "n999", "ghost"]),
+                    await storage.get_edges([("n0", "n1"), ("n5", "n4"), ("n0", "n5")]),
+                )
+            )
+        assert results[0] == results[1]
+        nodes, edges = results[1]
+        assert nodes == [{"length": 0, "loss": 1.0}, {"length": 999}, None]
+        assert edges == [
+            {"description": "e0", "loss": 2.0},
+            {"description": "e4"},
+            None,
+        ]
+
+
+@pytest.mark.asyncio
+async def test_graph_writes_merge_shallowly_like_networkx():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        results = []
+        for storage in (
+            NetworkXStorage(tmpdir, namespace="nx"),
+            SQLiteGraphStorage(tmpdir, namespace="sql"),
+        ):
+            await storage.upsert_node("A", {"loss": 1.0, "meta": {"x": 1}})
+            await storage.upsert_node("A", {"loss": None, "meta": {"y": 2}})
+            await storage.upsert_nodes({"B": {"description": "b", "loss": 0.5}})
+            await storage.update_node("B", {"loss": None})
+            await storage.update_nodes_batch({"A": {"meta": None}})
+            await storage.upsert_edge("A", "B", {"loss": 2.0, "meta": {"x": 1}})
+            await storage.upsert_edges({("B", "A"): {"meta": {"y": 2}}})
+            await storage.update_edge("A", "B", {"loss": None})
+            await storage.update_edges_batch({("B", "A"): {"weight": 3}})
+            results.append(
+                (
+                    await storage.get_nodes(["A", "B"]),
+                    await storage.get_edge("A", "B"),
+                )
+            )
+        assert results[0] == results[1]
+        assert results[1] == (
+            [{"loss": None, "meta": None}, {"description": "b", "loss": None}],
+            {"loss": None, "meta": {"y": 2}, "weight": 3},
+        )
+
+
+@pytest.mark.asyncio
+async def test_graph_snapshot_and_streaming_follow_the_full_lists():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        storage = SQLiteGraphStorage(tmpdir, namespace="graph")
+        await storage.upsert_nodes(
+            {f"n{i}": {"description": f"d{i}", "length": i} for i in range(50)}
+        )
+        await storage.upsert_edges(
+            {(f"n{i}", f"n{(i * 7) % 50}"): {"length": i} for i in range(1, 50)}
+        )
+        await storage.update_nodes_batch({"n3": {"loss": 0.5}, "n4": {"loss": None}})
+        await storage.update_edge("n2", "n14", {"loss": 1.5})
+        nodes, edges = await storage.get_all_nodes(), await storage.get_all_edges()
+
+        # streamed from the table columns, equal to the snapshot of the decoded lists
+        actual = await storage.get_snapshot()
+        expected = GraphSnapshot.from_lists(nodes, edges)
+        assert actual.node_ids == expected.node_ids
+        for name in ("edge_src", "edge_tgt", "indptr", "indices", "edge_ids"):
+            assert np.array_equal(getattr(actual, name), getattr(expected, name))
+        for name in ("node_length", "node_loss", "edge_length", "edge_loss"):
+            assert np.array_equal(
+                getattr(actual, name), getattr(expected, name), equal_nan=True
+            )
+        assert actual.node_loss[3] == 0.5 and np.isnan(actual.node_loss[4])
+
+        assert [n async for n in storage.iter_nodes(batch_size=7)] == nodes
+        assert [e async for e in storage.iter_edges(batch_size=7)] == edges
+        assert (await storage.count_nodes(), await storage.count_edges()) == (50, 49)
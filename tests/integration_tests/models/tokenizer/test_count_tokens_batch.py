@@ -0,0 +1,37 @@
+from graphgen.bases import BaseTokenizer
+
+
+class _WordTokenizer(BaseTokenizer):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.batches = []
+
+    def encode(self, text):
+        return [len(word) for word in text.split()]
+
+    def decode(self, token_ids):
+        return " ".join("x" * n for n in token_ids)
+
+    def encode_batch(self, texts):
+        self.batches.append(list(texts))
+        return super().encode_batch(texts)
+
+
+def test_count_tokens_batch_encodes_each_new_text_once():
+    tokenizer = _WordTokenizer()
+    assert tokenizer.count_tokens_batch(["a b", "c", "a b"]) == [2, 1, 2]
+    assert tokenizer.count_tokens_batch(["c", "d e f"]) == [1, 3]
+    assert tokenizer.count_tokens("a b") == 2
+
+    assert tokenizer.batches == [["a b", "c"], ["d e f"]]
+
+
+def test_count_cache_evicts_least_recently_used():
+    tokenizer = _WordTokenizer(count_cache_size=2)
+    tokenizer.count_tokens_batch(["a", "b"])
+    tokenizer.count_tokens("a")
+    tokenizer.count_tokens("c")
+    tokenizer.batches.clear()
+
+    tokenizer.count_tokens_batch(["a", "b", "c"])
+    assert tokenizer.batches == [["b"]]
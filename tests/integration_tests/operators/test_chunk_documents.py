@@ -0,0 +1,47 @@
+import pytest
+
+from graphgen.bases import BaseTokenizer
+from graphgen.operators import chunk_documents
+
+
+class _WordTokenizer(BaseTokenizer):
+    def encode(self, text):
+        return [len(word) for word in text.split()]
+
+    def decode(self, token_ids):
+        return " ".join("x" * n for n in token_ids)
+
+
+def _docs(n):
+    docs = {
+        f"doc-{i}": {
+            "type": "text",
+            "content": "\n\n".join(
+                f"Paragraph {j} of document {i} talks about topic {i * j}."
+                for j in range(30)
+            ),
+        }
+        for i in range(n)
+    }
+    docs["doc-image"] = {"type": "image", "content": "an image", "img_path": "x.png"}
+    return docs
+
+
+@pytest.mark.asyncio
+async def test_process_pool_chunking_matches_serial_chunking():
+    docs = _docs(20)
+    progress = []
+    serial = await chunk_documents(docs, 200, 20, _WordTokenizer())
+    parallel = await chunk_documents(
+        docs,
+        200,
+        20,
+        _WordTokenizer(),
+        progress_bar=lambda ratio, _: progress.append(ratio),
+        max_workers=2,
+        docs_per_shard=3,
+    )
+
+    assert list(parallel.items()) == list(serial.items())
+    assert "image-image" in parallel
+    assert progress[-1] == 1
@@ -0,0 +1,117 @@
+import asyncio
+import tempfile
+
+import pytest
+
+from graphgen.bases import BaseKGBuilder
+from graphgen.models import NetworkXStorage
+from graphgen.operators.build_kg.merge_kg import merge_extractions, merge_kg
+from graphgen.utils import KeyedLock, TaskResult
+
+
+class _ConcatBuilder(BaseKGBuilder):
+    async def extract(self, chunk):
+        raise NotImplementedError
+
+    async def merge_nodes(self, node_data, existing=None):
+        _, records = node_data
+        descriptions = [r["description"] for r in records]
+        if existing is not None:
+            descriptions.insert(0, existing["description"])
+        return {"entity_type": "T", "description": "|".join(descriptions)}
+
+    async def merge_edges(self, edges_data, existing=None):
+        if edges_data[0] == ("A", "X"):
+            raise RuntimeError("boom")
+        return {
+            "source_id": "chunk-1",
+            "description": "|".join(r["description"] for r in edges_data[1]),
+        }
+
+
+@pytest.mark.asyncio
+async def test_merge_kg_batches_reads_and_writes():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        storage = NetworkXStorage(tmpdir, namespace="graph")
+        await storage.upsert_node("A", {"entity_type": "T", "description": "old"})
+
+        await merge_kg(
+            _ConcatBuilder(llm_client=None),
+            storage,
+            nodes={"A": [{"description": "a"}], "B": [{"description": "b"}]},
+            edges={
+                ("A", "B"): [{"description": "ab"}],
+                ("B", "C"): [{"description": "bc"}],
+                ("A", "X"): [{"description": "ax"}],
+            },
+            batch_size=1,
+        )
+
+        assert (await storage.get_node("A"))["description"] == "old|a"
+        assert await storage.get_node("C") == {
+            "source_id": "chunk-1",
+            "description": "bc",
+            "entity_type": "UNKNOWN",
+        }
+        assert await storage.get_edge("B", "A") == {
+            "source_id": "chunk-1",
+            "description": "ab",
+        }
+        # a failed merge is skipped without writing anything
+        assert not await storage.has_node("X")
+
+
+@pytest.mark.asyncio
+async def test_merge_extractions_merges_windows_in_order():
+    async def _extractions():
+        for i in range(5):
+            yield TaskResult(
+                index=i,
+                item=i,
+                result=({"A": [{"description": str(i)}]}, {}),
+            )
+        yield TaskResult(index=5, item=5, error=RuntimeError("boom"))
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        storage = NetworkXStorage(tmpdir, namespace="graph")
+        failures = await merge_extractions(
+            _ConcatBuilder(llm_client=None), storage, _extractions(), window_size=2
+        )
+
+        # windows {0, 1}, {2, 3}, {4} are merged one after another
+        assert (await storage.get_node("A"))["description"] == "0|1|2|3|4"
+        assert [f.index for f in failures] == [5]
+
+
+class _SlowConcatBuilder(_ConcatBuilder):  # pylint: disable=abstract-method
+    async def merge_nodes(self, node_data, existing=None):
+        await asyncio.sleep(0.01)
+        return await super().merge_nodes(node_data, existing)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_merges_of_the_same_key_do_not_lose_updates():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        storage = NetworkXStorage(tmpdir, namespace="graph")
+        locks = KeyedLock()
+        builder = _SlowConcatBuilder(llm_client=None)
+
+        await asyncio.gather(
+            *(
+                merge_kg(
+                    builder,
+                    storage,
+                    nodes={
+                        "A": [{"description": str(i)}],
+                        f"N{i}": [{"description": "n"}],
+                    },
+                    edges={},
+                    locks=locks,
+                )
+                for i in range(4)
+            )
+        )
+
+        pieces = (await storage.get_node("A"))["description"].split("|")
+        assert sorted(pieces) == ["0", "1", "2", "3"]
+        assert locks.metrics["contended"] >= 3
@@ -0,0 +1,69 @@
+import tempfile
+
+import pytest
+
+from graphgen.bases import BaseTokenizer
+from graphgen.models import NetworkXStorage
+from graphgen.operators.partition.pre_tokenize import pre_tokenize
+
+
+class _WordTokenizer(BaseTokenizer):
+    def encode(self, text):
+        return [len(word) for word in text.split()]
+
+    def decode(self, token_ids):
+        return " ".join("x" * n for n in token_ids)
+
+
+class _RecordingStorage(NetworkXStorage):
+    def __post_init__(self):
+        super().__post_init__()
+        self.written_nodes = []
+        self.written_edges = []
+        self.commits = 0
+
+    async def update_nodes_batch(self, nodes):
+        self.written_nodes.append(sorted(nodes))
+        await super().update_nodes_batch(nodes)
+
+    async def update_edges_batch(self, edges):
+        self.written_edges.append(sorted(edges))
+        await super().update_edges_batch(edges)
+
+    async def index_done_callback(self):
+        self.commits += 1
+
+
+@pytest.mark.asyncio
+async def test_pre_tokenize_writes_back_only_patched_items():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        storage = _RecordingStorage(tmpdir, namespace="graph")
+        nodes = [
+            ("A", {"description": "one two three"}),
+            ("B", {"description": "four", "length": 1}),
+        ]
+        edges = [("A", "B", {"description": "five six", "length": 2})]
+
+        new_edges, new_nodes = await pre_tokenize(
+            storage, _WordTokenizer(), edges, nodes
+        )
+
+        assert new_nodes[0][1]["length"] == 3
+        assert new_edges == edges
+        assert storage.written_nodes == [["A"]]
+        assert not storage.written_edges
+        assert storage.commits == 1
+
+
+@pytest.mark.asyncio
+async def test_pre_tokenize_skips_write_when_nothing_is_missing():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        storage = _RecordingStorage(tmpdir, namespace="graph")
+        nodes = [("A", {"description": "one", "length": 1})]
+        edges = [("A", "B", {"description": "two", "length": 1})]
+
+        await pre_tokenize(storage, _WordTokenizer(), edges, nodes)
+
+        assert not storage.written_nodes
+        assert not storage.written_edges
+        assert storage.commits == 0
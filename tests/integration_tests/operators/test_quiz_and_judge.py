@@ -0,0 +1,40 @@
+import tempfile
+
+import pytest
+
+from graphgen.bases import Token
+from graphgen.models import SQLiteGraphStorage, SQLiteKVStorage
+from graphgen.operators import judge_statement, quiz
+
+
+class _FakeClient:
+    async def generate_answer(self, prompt, temperature=0):
+        return f"rephrased {len(prompt)}"
+
+    async def generate_topk_per_token(self, prompt):
+        return [Token(text="x", prob=1.0, top_candidates=[Token("yes", 0.8)])]
+
+
+@pytest.mark.asyncio
+async def test_quiz_and_judge_stream_the_sqlite_graph():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        graph = SQLiteGraphStorage(tmpdir, namespace="graph")
+        rephrase = SQLiteKVStorage(tmpdir, namespace="rephrase")
+        await graph.upsert_nodes(
+            {f"n{i}": {"description": f"node {i}"} for i in range(30)}
+        )
+        await graph.upsert_edges(
+            {(f"n{i}", f"n{i + 1}"): {"description": f"edge {i}"} for i in range(29)}
+        )
+        await graph.update_node("n0", {"loss": 0.25})
+        client = _FakeClient()
+
+        await quiz(client, graph, rephrase, max_samples=2, max_concurrent=8)
+        samples = await rephrase.get_by_id("edge 3")
+        assert sorted(gt for _, gt in samples) == ["no", "yes", "yes"]
+        assert len(await rephrase.all_keys()) == 59
+
+        await judge_statement(client, graph, rephrase, max_concurrent=4)
+        assert (await graph.get_node("n0"))["loss"] == 0.25
+        assert all(data["loss"] > 0 for _, _, data in await graph.get_all_edges())
+        assert all(data["loss"] > 0 for _, data in await graph.get_all_nodes())
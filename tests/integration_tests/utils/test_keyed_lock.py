@@ -0,0 +1,43 @@
+import asyncio
+
+import pytest
+
+from graphgen.utils import KeyedLock
+
+
+@pytest.mark.asyncio
+async def test_same_key_serializes_and_distinct_keys_overlap():
+    locks = KeyedLock(n_stripes=1024)
+    active = {}
+    peak = {}
+
+    async def _hold(key):
+        async with locks.hold(key):
+            active[key] = active.get(key, 0) + 1
+            peak[key] = max(peak.get(key, 0), active[key])
+            await asyncio.sleep(0.01)
+            active[key] -= 1
+
+    await asyncio.gather(*(_hold(k) for k in ["a", "a", "a", "b", "c"]))
+    assert peak["a"] == 1
+
+    metrics = locks.metrics
+    assert metrics["acquisitions"] == 5
+    assert metrics["contended"] == 2
+    assert metrics["held"] == 0
+    assert metrics["max_wait_seconds"] > 0
+
+
+@pytest.mark.asyncio
+async def test_overlapping_key_sets_do_not_deadlock():
+    locks = KeyedLock(n_stripes=8)
+
+    async def _hold(*keys):
+        async with locks.hold(*keys):
+            await asyncio.sleep(0.001)
+
+    await asyncio.wait_for(
+        asyncio.gather(*(_hold(f"k{i}", f"k{(i + 1) % 5}") for i in range(20))),
+        timeout=5,
+    )
+    assert locks.metrics["held"] == 0
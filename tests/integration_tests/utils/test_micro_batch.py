@@ -0,0 +1,35 @@
+import asyncio
+
+import pytest
+
+from graphgen.utils import MicroBatcher
+
+
+@pytest.mark.asyncio
+async def test_items_are_packed_up_to_the_budget():
+    batches = []
+
+    async def _flush(key, items):
+        batches.append((key, items))
+        return [f"{key}:{it}" for it in items]
+
+    batcher = MicroBatcher(_flush, budget=3, max_wait=0.01)
+    results = await asyncio.gather(
+        *(batcher.submit(i, key="en" if i % 2 else "zh") for i in range(8))
+    )
+
+    assert results == [f"{'en' if i % 2 else 'zh'}:{i}" for i in range(8)]
+    assert sorted(len(items) for _, items in batches) == [1, 1, 3, 3]
+    assert all(len({i % 2 for i in items}) == 1 for _, items in batches)
+
+
+@pytest.mark.asyncio
+async def test_flush_error_reaches_every_caller():
+    async def _flush(key, items):
+        raise RuntimeError("boom")
+
+    batcher = MicroBatcher(_flush, budget=10, max_wait=0.01)
+    results = await asyncio.gather(
+        batcher.submit(1), batcher.submit(2), return_exceptions=True
+    )
+    assert all(isinstance(r, RuntimeError) for r in results)
@@ -0,0 +1,89 @@
+import asyncio
+import random
+
+import pytest
+
+from graphgen.utils import iter_concurrent, prefetch, run_concurrent
+
+
+@pytest.mark.asyncio
+async def test_max_in_flight_is_respected():
+    in_flight = 0
+    peak = 0
+
+    async def _work(x):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(random.random() / 100)
+        in_flight -= 1
+        return x * 2
+
+    results = await run_concurrent(_work, range(50), max_in_flight=4)
+    assert sorted(results) == [x * 2 for x in range(50)]
+    assert peak <= 4
+
+
+@pytest.mark.asyncio
+async def test_ordered_results_from_async_iterable():
+    async def _items():
+        for i in range(20):
+            yield i
+
+    async def _work(x):
+        await asyncio.sleep((20 - x) / 1000)
+        return x
+
+    results = await run_concurrent(_work, _items(), max_in_flight=5, ordered=True)
+    assert results == list(range(20))
+
+
+@pytest.mark.asyncio
+async def test_failures_are_reported():
+    async def _work(x):
+        if x % 3 == 0:
+            raise ValueError(f"bad {x}")
+        return x
+
+    outcomes = [r async for r in iter_concurrent(_work, range(9), ordered=True)]
+    assert [r.index for r in outcomes] == list(range(9))
+    failed = [r for r in outcomes if not r.ok]
+    assert [r.item for r in failed] == [0, 3, 6]
+    assert all(isinstance(r.error, ValueError) for r in failed)
+
+    failures = []
+    results = await run_concurrent(_work, range(9), failures=failures)
+    assert sorted(results) == [1, 2, 4, 5, 7, 8]
+    assert len(failures) == 3
+
+
+@pytest.mark.asyncio
+async def test_prefetch_is_bounded_and_ordered():
+    produced = 0
+
+    async def _items():
+        nonlocal produced
+        for i in range(10):
+            produced += 1
+            yield i
+
+    consumed = []
+    async for it in prefetch(_items(), maxsize=3):
+        await asyncio.sleep(0.001)
+        # the queue holds at most 3 items, one more may wait on put
+        assert produced - len(consumed) <= 5
+        consumed.append(it)
+    assert consumed == list(range(10))
+
+
+@pytest.mark.asyncio
+async def test_prefetch_reraises_producer_error():
+    async def _items():
+        yield 1
+        raise RuntimeError("boom")
+
+    consumed = []
+    with pytest.raises(RuntimeError, match="boom"):
+        async for it in prefetch(_items(), maxsize=2):
+            consumed.append(it)
+    assert consumed == [1]